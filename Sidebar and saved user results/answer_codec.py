@@ -0,0 +1,85 @@
+"""
+Compact encoding of an assessment's answers for the session cookie.
+
+Every answer is a score from 0 to 3, so the whole assessment packs into a
+few bytes instead of a dict of form fields plus a score list per segment:
+
+    byte 0     format version
+    byte 1     bitmask of the segments answered so far (bit 0 = segment 1)
+    bytes 2-   two bits per question, segment 1 question 1 first, in the
+               order given by the layout; unanswered segments are zeros
+
+The bytes are base64url-encoded without padding, which for the 42
+questions of the current assessment is an 18-character string.
+
+The layout (questions per segment) is part of the format: if the
+questionnaire changes, bump VERSION so that answers packed for the old
+layout are dropped instead of being read against the new questions.
+"""
+
+import base64
+
+VERSION = 1
+BITS_PER_ANSWER = 2
+MAX_SCORE = (1 << BITS_PER_ANSWER) - 1
+
+
+class AnswerFormatError(ValueError):
+    """The packed string is not answers in this version and layout"""
+
+
+def packed_size(layout):
+    """Bytes in a packed assessment for the given {segment: question count} layout"""
+    return 2 + (sum(layout.values()) * BITS_PER_ANSWER + 7) // 8
+
+
+def encode(answers, layout):
+    """
+    Pack {segment: [scores]} into a base64 string. Segments missing from
+    ``answers`` are stored as unanswered; a short score list is padded with
+    zeros, as an unanswered question scores 0.
+    """
+    answered = 0
+    value = 0
+    position = 0
+    for bit, (segment, count) in enumerate(sorted(layout.items())):
+        scores = answers.get(segment)
+        if scores is not None:
+            if len(scores) > count:
+                raise ValueError(f"segment {segment} has {count} questions, got {len(scores)} scores")
+            answered |= 1 << bit
+            for score in scores:
+                score = int(score)
+                if not 0 <= score <= MAX_SCORE:
+                    raise ValueError(f"score {score} in segment {segment} is outside 0-{MAX_SCORE}")
+                value |= score << (position * BITS_PER_ANSWER)
+                position += 1
+            position += count - len(scores)
+        else:
+            position += count
+    body = value.to_bytes(packed_size(layout) - 2, 'little')
+    return base64.urlsafe_b64encode(bytes([VERSION, answered]) + body).rstrip(b'=').decode('ascii')
+
+
+def decode(packed, layout):
+    """Unpack a string from encode() into {segment: [scores]} for the answered segments"""
+    if not packed:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(packed + '=' * (-len(packed) % 4))
+    except (ValueError, TypeError) as e:
+        raise AnswerFormatError(f"packed answers are not base64: {e}")
+    if len(raw) != packed_size(layout) or raw[0] != VERSION:
+        raise AnswerFormatError(f"packed answers are version {raw[:1].hex() or '?'}, {len(raw)} bytes; "
+                                f"expected version {VERSION}, {packed_size(layout)} bytes")
+    answered = raw[1]
+    value = int.from_bytes(raw[2:], 'little')
+    answers = {}
+    position = 0
+    for bit, (segment, count) in enumerate(sorted(layout.items())):
+        if answered & (1 << bit):
+            answers[segment] = [
+                (value >> ((position + q) * BITS_PER_ANSWER)) & MAX_SCORE for q in range(count)
+            ]
+        position += count
+    return answers
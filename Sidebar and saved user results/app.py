@@ -1,8 +1,7 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file, send_from_directory
-from weasyprint import HTML
+from flask import Flask, render_template as flask_render_template, request, redirect, url_for, session, flash, send_file, send_from_directory, g
+from flask.sessions import SecureCookieSessionInterface
 from io import BytesIO
 import os
-import requests
 from datetime import datetime
 import logging
 import uuid
@@ -10,6 +9,24 @@ import hashlib
 import re
 import time
 import json
+import hmac
+import sys
+import random
+import threading
+import answer_codec
+import batch_intake
+import circuit_breaker
+import compression
+import idempotency
+import metrics
+import oauth_cache
+import pdf_direct
+import rate_limit
+import sheets_routing
+import sheets_spool
+import template_cache
+from profiling import RequestProfiler, current_thread_id
+from itsdangerous import BadSignature, URLSafeTimedSerializer
 
 # Load Google OAuth credentials
 try:
@@ -23,9 +40,6 @@ except (FileNotFoundError, KeyError) as e:
         'redirect_uri': 'http://127.0.0.1:5000/authorize'
     }
 
-# Import OAuth library
-from authlib.integrations.flask_client import OAuth
-
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 # Set a shorter session lifetime (30 minutes)
@@ -51,27 +65,408 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# OAuth Setup
-oauth = OAuth(app)
-google = oauth.register(
-    name='google',
-    client_id=secrets.get('client_id'),
-    client_secret=secrets.get('client_secret'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile',
-        'access_type': 'offline',
-        'prompt': 'consent'
-    },
-    redirect_uri=secrets.get('redirect_uri': 'https://classification-risk-assessment.onrender.com/authorize')
+# Metrics: /metrics and /internal/sheets_status answer only requests bearing
+# METRICS_TOKEN; without one they are off
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN', '')
+
+def metrics_token_status():
+    """None if the request carries METRICS_TOKEN, else the status to refuse it with"""
+    expected = app.config.get('METRICS_TOKEN')
+    if not expected:
+        # Not configured: behave as if the endpoint didn't exist
+        return 404
+    presented = request.headers.get('Authorization', '')
+    if not hmac.compare_digest(presented.encode(), f"Bearer {expected}".encode()):
+        return 401
+    return None
+
+class MeteredSessionInterface(SecureCookieSessionInterface):
+    """Cookie session that records the size of every session cookie it writes"""
+    def save_session(self, app, session, response):
+        super().save_session(app, session, response)
+        cookie_name = app.config['SESSION_COOKIE_NAME']
+        for header in response.headers.getlist('Set-Cookie'):
+            if header.startswith(cookie_name + '='):
+                metrics.SESSION_COOKIE_BYTES.observe(len(header.split(';', 1)[0]) - len(cookie_name) - 1)
+
+app.session_interface = MeteredSessionInterface()
+
+def render_template(template_name, **context):
+    """Render a template and record how long Jinja took"""
+    with metrics.TEMPLATE_RENDER_SECONDS.time(template=template_name):
+        return flask_render_template(template_name, **context)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop('request_started', None)
+    if started is not None and request.endpoint != 'metrics_endpoint':
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            route=request.endpoint or 'unmatched',
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+# Sampling profiler: off unless PROFILE_SAMPLE_RATE > 0 or PROFILE_ADMIN_TOKEN is set.
+# Admins can force a profile for one request with the X-Profile-Request header.
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+app.config['PROFILE_ADMIN_TOKEN'] = os.environ.get('PROFILE_ADMIN_TOKEN', '')
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', 'profiles')
+app.config['PROFILE_INTERVAL'] = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+app.config['PROFILE_ENDPOINTS'] = set(
+    os.environ.get('PROFILE_ENDPOINTS', 'segment,generate_pdf,direct_pdf_download').split(',')
+)
+
+def should_profile_request():
+    """Decide whether the current request gets a sampling profile"""
+    admin_token = app.config['PROFILE_ADMIN_TOKEN']
+    if admin_token:
+        header = request.headers.get('X-Profile-Request')
+        if header and hmac.compare_digest(header, admin_token):
+            return True
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    if sample_rate > 0 and request.endpoint in app.config['PROFILE_ENDPOINTS']:
+        if request.endpoint == 'segment' and request.method != 'POST':
+            return False
+        return random.random() < sample_rate
+    return False
+
+@app.before_request
+def start_request_profiler():
+    if not app.config['PROFILE_SAMPLE_RATE'] and not app.config['PROFILE_ADMIN_TOKEN']:
+        return
+    if should_profile_request():
+        g.profiler = RequestProfiler(current_thread_id(), app.config['PROFILE_INTERVAL']).start()
+
+@app.teardown_request
+def stop_request_profiler(exc=None):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return
+    try:
+        profiler.stop()
+        label = f"{request.endpoint or 'unmatched'}-{request.method}"
+        path = profiler.write_folded(app.config['PROFILE_DIR'], label)
+        logger.info(f"Wrote request profile ({sum(profiler.samples.values())} samples, {profiler.duration:.3f}s) to {path}")
+    except Exception as e:
+        logger.error(f"Error writing request profile: {str(e)}")
+
+# OAuth Setup - the Google client is built on first use, from the on-disk
+# discovery/JWKS cache when it is available, so a cold worker can serve
+# requests without importing authlib or calling Google
+app.config['OAUTH_CACHE_PATH'] = os.environ.get(
+    'OAUTH_CACHE_PATH', os.path.join(app.instance_path, 'google_openid_cache.json')
+)
+app.config['OAUTH_CACHE_TTL'] = int(os.environ.get('OAUTH_CACHE_TTL', oauth_cache.DEFAULT_TTL))
+_google_client = None
+_google_client_lock = threading.Lock()
+
+def get_google_client():
+    """Return the registered Google OAuth client, creating it on first call"""
+    global _google_client
+    if _google_client is None:
+        with _google_client_lock:
+            if _google_client is None:
+                from authlib.integrations.flask_client import OAuth
+                cached_metadata = oauth_cache.load(
+                    app.config['OAUTH_CACHE_PATH'], app.config['OAUTH_CACHE_TTL']
+                ) or {}
+                oauth = OAuth(app)
+                _google_client = oauth.register(
+                    name='google',
+                    client_id=secrets.get('client_id'),
+                    client_secret=secrets.get('client_secret'),
+                    server_metadata_url=oauth_cache.GOOGLE_METADATA_URL,
+                    client_kwargs={
+                        'scope': 'openid email profile',
+                        'access_type': 'offline',
+                        'prompt': 'consent'
+                    },
+                    redirect_uri=secrets.get('redirect_uri', 'https://classification-risk-assessment.onrender.com/authorize'),
+                    **cached_metadata
+                )
+    return _google_client
+
+# PDF backend: 'weasyprint' lays out pdf_template.html, 'direct' draws the
+# fixed report layout straight from the computed results (pdf_direct.py)
+app.config['PDF_BACKEND'] = os.environ.get('PDF_BACKEND', 'weasyprint')
+
+def gevent_is_active():
+    """True when running under gunicorn's gevent worker (SERVING_MODE=gevent)"""
+    if 'gevent' not in sys.modules:
+        return False
+    from gevent import monkey
+    return monkey.is_module_patched('socket')
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Run CPU-bound work without stalling other requests.
+
+    Under green threads a long computation blocks every greenlet in the
+    worker, so it is handed to the gevent hub's pool of real OS threads;
+    otherwise it simply runs inline.
+    """
+    if gevent_is_active():
+        import gevent
+        return gevent.get_hub().threadpool.apply(func, args, kwargs)
+    return func(*args, **kwargs)
+
+# PDF admission control (per worker): each user gets PDF_USER_PER_MINUTE
+# renders with a burst of PDF_USER_BURST, all users together get
+# PDF_GLOBAL_PER_MINUTE, and at most PDF_MAX_CONCURRENT render at once.
+# Anything over is refused straight away with 429 and Retry-After.
+app.config['PDF_USER_PER_MINUTE'] = float(os.environ.get('PDF_USER_PER_MINUTE', '6'))
+app.config['PDF_USER_BURST'] = int(os.environ.get('PDF_USER_BURST', '3'))
+app.config['PDF_GLOBAL_PER_MINUTE'] = float(os.environ.get('PDF_GLOBAL_PER_MINUTE', '120'))
+app.config['PDF_GLOBAL_BURST'] = int(os.environ.get('PDF_GLOBAL_BURST', '10'))
+app.config['PDF_MAX_CONCURRENT'] = int(os.environ.get('PDF_MAX_CONCURRENT', '2'))
+pdf_admission = rate_limit.AdmissionController(
+    user_rate=app.config['PDF_USER_PER_MINUTE'] / 60,
+    user_burst=app.config['PDF_USER_BURST'],
+    global_rate=app.config['PDF_GLOBAL_PER_MINUTE'] / 60,
+    global_burst=app.config['PDF_GLOBAL_BURST'],
+    max_concurrent=app.config['PDF_MAX_CONCURRENT']
 )
 
-# Google Sheets integration
-GOOGLE_SCRIPT_URL = "https://script.google.com/macros/s/AKfycbwJQOCb4ow-54vKYhvhne3PC-TERIosb7LYMXKeqQP9kiOPMejuvZGXNtxEdnroc-E8/exec"
+# Browser-printed reports: print_report serves pdf_template.html as a page
+# the browser prints to PDF itself. Users can choose it for every report
+# (the report_mode cookie), and with PRINT_REPORT_FALLBACK on, PDF requests
+# refused because the server's render capacity is used up are sent there
+# instead of getting a 429.
+app.config['DEFAULT_REPORT_MODE'] = os.environ.get('DEFAULT_REPORT_MODE', 'server')
+app.config['PRINT_REPORT_FALLBACK'] = os.environ.get('PRINT_REPORT_FALLBACK', '1') == '1'
+REPORT_MODES = ('server', 'browser')
+REPORT_MODE_COOKIE = 'report_mode'
+# PDF routes whose report print_report can produce instead
+PRINTABLE_PDF_ROUTES = {'generate_pdf', 'direct_pdf_download'}
+
+def report_mode():
+    """'browser' if this user prints reports from the browser, 'server' for rendered PDFs"""
+    mode = request.cookies.get(REPORT_MODE_COOKIE)
+    return mode if mode in REPORT_MODES else app.config['DEFAULT_REPORT_MODE']
+
+def html_to_pdf(html):
+    """Convert rendered HTML to PDF bytes - WeasyPrint is imported on first use"""
+    from weasyprint import HTML
+    return run_blocking(lambda: HTML(string=html).write_pdf())
+
+# Google Sheets integration - set GOOGLE_SCRIPT_URL to post elsewhere, e.g. to
+# the local stand-in (sheets_standin.py) for offline load tests
+GOOGLE_SCRIPT_URL = os.environ.get(
+    'GOOGLE_SCRIPT_URL',
+    "https://script.google.com/macros/s/AKfycbwJQOCb4ow-54vKYhvhne3PC-TERIosb7LYMXKeqQP9kiOPMejuvZGXNtxEdnroc-E8/exec"
+)
+
+# Per-office routing: SHEETS_ROUTES points at a JSON file mapping offices to
+# their own Apps Script endpoints and limits (see sheets_routing.py). Without
+# it every submission goes to GOOGLE_SCRIPT_URL with no rate or concurrency limit.
+app.config['SHEETS_ROUTES'] = os.environ.get('SHEETS_ROUTES', '')
+app.config['SHEETS_MAX_WAIT'] = float(os.environ.get('SHEETS_MAX_WAIT', sheets_routing.DEFAULT_MAX_WAIT))
+# Submissions that can't be posted (circuit open, throttled, endpoint failing)
+# are kept here and replayed once the endpoint recovers
+app.config['SHEETS_SPOOL_DIR'] = os.environ.get(
+    'SHEETS_SPOOL_DIR', os.path.join(app.instance_path, 'sheets_spool')
+)
+CIRCUIT_STATE_VALUES = {circuit_breaker.CLOSED: 0, circuit_breaker.HALF_OPEN: 1, circuit_breaker.OPEN: 2}
+
+def sheets_circuit_changed(breaker, previous, state):
+    metrics.SHEETS_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES[state], office=breaker.name)
+    log = logger.info if state == circuit_breaker.CLOSED else logger.warning
+    log(f"Sheets circuit for office {breaker.name} {previous} -> {state} (last failure: {breaker.last_failure})")
+
+sheets_router = sheets_routing.SheetsRouter.from_file(
+    app.config['SHEETS_ROUTES'], GOOGLE_SCRIPT_URL, app.config['SHEETS_MAX_WAIT'],
+    on_state_change=sheets_circuit_changed
+)
+submission_spool = sheets_spool.Spool(app.config['SHEETS_SPOOL_DIR'])
+_spool_replay_lock = threading.Lock()
+
+# Idempotent final submission: a repeated segment 8 POST with the same answers
+# (double-click, browser retry) reuses the first request's outcome instead of
+# posting another Sheets row
+app.config['SUBMISSION_KEYS_DIR'] = os.environ.get(
+    'SUBMISSION_KEYS_DIR', os.path.join(app.instance_path, 'submissions')
+)
+app.config['SUBMISSION_KEYS_TTL'] = int(os.environ.get('SUBMISSION_KEYS_TTL', idempotency.DEFAULT_TTL))
+submissions = idempotency.IdempotencyStore(app.config['SUBMISSION_KEYS_DIR'], app.config['SUBMISSION_KEYS_TTL'])
+
+def submission_key():
+    """Idempotency key of the current assessment: the session plus every segment's scores"""
+    payload = json.dumps(
+        [session.get('session_id', ''), [segment_scores(i) for i in range(1, 9)]],
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def sheets_post_failed(response):
+    """Responses that count against the endpoint's circuit breaker"""
+    return response.status_code >= 500 or response.status_code == 429
+
+def post_to_sheets(ordered_data, email):
+    """
+    Post one submission to the officer's office endpoint and return the response.
+
+    Raises circuit_breaker.CircuitOpen when the office's endpoint is failing,
+    sheets_routing.EndpointBusy when it is at its rate or concurrency limit,
+    or the requests exception if the post itself fails.
+    """
+    import requests
+    try:
+        with sheets_router.slot(email) as endpoint:
+            metrics.SHEETS_IN_FLIGHT.inc(office=endpoint.office)
+            post_started = time.perf_counter()
+            try:
+                response = requests.post(
+                    endpoint.url,
+                    json=ordered_data,
+                    headers={'Content-Type': 'application/json'},
+                    timeout=15
+                )
+            except Exception as e:
+                elapsed = time.perf_counter() - post_started
+                endpoint.latencies.observe(elapsed)
+                endpoint.breaker.record_failure(type(e).__name__)
+                metrics.SHEETS_POST_SECONDS.observe(elapsed, office=endpoint.office, outcome='error')
+                raise
+            finally:
+                metrics.SHEETS_IN_FLIGHT.dec(office=endpoint.office)
+            elapsed = time.perf_counter() - post_started
+            endpoint.latencies.observe(elapsed)
+            if sheets_post_failed(response):
+                endpoint.breaker.record_failure(f"HTTP {response.status_code}")
+            else:
+                endpoint.breaker.record_success()
+            metrics.SHEETS_POST_SECONDS.observe(elapsed, office=endpoint.office, outcome=str(response.status_code))
+            return response
+    except sheets_routing.EndpointBusy as e:
+        metrics.SHEETS_THROTTLED.inc(office=e.office, reason=e.reason)
+        raise
+    except circuit_breaker.CircuitOpen as e:
+        metrics.SHEETS_THROTTLED.inc(office=e.name, reason='circuit_open')
+        raise
+
+def submit_to_sheets(ordered_data, email):
+    """
+    Post a completed assessment, spooling it if the endpoint is unavailable.
+
+    Returns 'sent', 'spooled', or 'failed' when it was neither sent nor
+    spooled (rejected by the script, or timed out after it may have been
+    written - replaying that could add a duplicate row).
+    """
+    import requests
+    office = sheets_router.office_for(email)
+    try:
+        response = post_to_sheets(ordered_data, email)
+    except requests.exceptions.ReadTimeout as e:
+        logger.error(f"Google Sheets Error: {str(e)} - not spooled, the row may have been written")
+        return 'failed'
+    except Exception as e:
+        logger.error(f"Google Sheets Error: {str(e)} - spooling the submission")
+        reason = type(e).__name__
+    else:
+        if response.status_code == 200:
+            replay_sheets_spool_in_background()
+            return 'sent'
+        logger.error(f"Google Sheets Error: Status {response.status_code}")
+        if not sheets_post_failed(response):
+            return 'failed'
+        reason = f"HTTP {response.status_code}"
+    submission_spool.add(email, ordered_data, reason)
+    metrics.SHEETS_SPOOLED.inc(office=office)
+    return 'spooled'
+
+def replay_sheets_spool():
+    """Post spooled submissions oldest first; returns (sent, still spooled)"""
+    submission_spool.recover()
+    sent = 0
+    unavailable = set()
+    seen = set()
+    while True:
+        # Entries queued while a pass runs (a batch) are picked up by the next one
+        names = [name for name in submission_spool.names() if name not in seen]
+        if not names:
+            break
+        seen.update(names)
+        for name in names:
+            sent += replay_spool_entry(name, unavailable)
+    if sent:
+        logger.info(f"Replayed {sent} spooled Sheets submission(s)")
+    return sent, len(submission_spool)
+
+def replay_spool_entry(name, unavailable):
+    """Post one spooled entry unless its office is in ``unavailable``; returns 1 if it was sent"""
+    claimed = submission_spool.claim(name)
+    if claimed is None:
+        return 0
+    entry = submission_spool.read(claimed)
+    office = sheets_router.office_for(entry['email'])
+    if office in unavailable:
+        submission_spool.unclaim(claimed)
+        return 0
+    try:
+        response = post_to_sheets(entry['data'], entry['email'])
+    except Exception as e:
+        logger.warning(f"Spool replay for office {office} stopped: {str(e)}")
+        submission_spool.unclaim(claimed)
+        unavailable.add(office)
+        return 0
+    if response.status_code == 200:
+        submission_spool.remove(claimed)
+        return 1
+    if sheets_post_failed(response):
+        # The endpoint is failing; keep the entry and leave the office until the next replay
+        logger.error(f"Spool replay for office {office} got status {response.status_code}")
+        submission_spool.unclaim(claimed)
+        unavailable.add(office)
+        return 0
+    # Rejected outright: posting it again would get the same answer and, first
+    # in line, hold up every entry behind it
+    logger.error(f"Spool replay for office {office}: entry rejected with status {response.status_code}, "
+                 f"moved to {submission_spool.dead_letter_path}")
+    submission_spool.dead_letter(claimed, f"HTTP {response.status_code}")
+    metrics.SHEETS_DEAD_LETTERED.inc(office=office)
+    return 0
+
+def replay_sheets_spool_in_background():
+    """Start draining the spool after a successful post, unless it's empty or already draining"""
+    if not len(submission_spool) or not _spool_replay_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            replay_sheets_spool()
+        except Exception as e:
+            logger.error(f"Spool replay failed: {str(e)}")
+        finally:
+            _spool_replay_lock.release()
+
+    threading.Thread(target=run, name='sheets-spool-replay', daemon=True).start()
 
 # Add zip to Jinja environment
 app.jinja_env.globals.update(zip=zip)
 
+# Template caching: {% cache %} fragments are rendered once per process, and
+# compiled templates are kept on disk so new workers skip recompiling them
+app.config['TEMPLATE_FRAGMENT_CACHE'] = os.environ.get('TEMPLATE_FRAGMENT_CACHE', '1') == '1'
+app.config['JINJA_BYTECODE_CACHE_DIR'] = os.environ.get(
+    'JINJA_BYTECODE_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache')
+)
+template_cache.init_app(app)
+
+# Response compression (gzip, or brotli when installed) for pages and JSON;
+# a response is sent uncompressed if compressing it would take more than
+# COMPRESS_CPU_BUDGET_MS of CPU
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', '512'))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+app.config['COMPRESS_BROTLI_LEVEL'] = int(os.environ.get('COMPRESS_BROTLI_LEVEL', '5'))
+app.config['COMPRESS_CPU_BUDGET_MS'] = float(os.environ.get('COMPRESS_CPU_BUDGET_MS', '25'))
+compression.init_app(app)
+
 # Helper function to generate secure URL tokens
 def generate_secure_token(text, salt=None):
     """Generate a secure token for URL based on text and optional salt"""
@@ -101,16 +496,72 @@ def session_required(f):
     decorated_function.__name__ = f.__name__
     return decorated_function
 
+def pdf_admission_required(f):
+    """Decorator that refuses a PDF render with 429 when the user or the worker is over its limits"""
+    def decorated_function(*args, **kwargs):
+        route = request.endpoint
+        try:
+            ticket = pdf_admission.admit(session.get('email') or request.remote_addr)
+        except rate_limit.Rejected as e:
+            metrics.PDF_ADMISSION.inc(route=route, outcome=e.reason)
+            if (e.reason != 'user_rate' and route in PRINTABLE_PDF_ROUTES
+                    and app.config['PRINT_REPORT_FALLBACK']):
+                # The server's render capacity is used up, not this user's share:
+                # let the browser print the same report
+                logger.info(f"PDF request on {route} sent to the browser-printed report ({e.reason})")
+                return redirect(url_for('print_report', fallback=1))
+            logger.warning(f"PDF request on {route} rejected ({e.reason}), retry after {e.retry_after}s")
+            return (
+                f"Too many PDF requests right now. Please try again in {e.retry_after} seconds.",
+                429,
+                {'Retry-After': str(e.retry_after), 'Content-Type': 'text/plain; charset=utf-8'}
+            )
+        metrics.PDF_ADMISSION.inc(route=route, outcome='admitted')
+        metrics.PDF_RENDERS_IN_FLIGHT.inc()
+        try:
+            with ticket:
+                return f(*args, **kwargs)
+        finally:
+            metrics.PDF_RENDERS_IN_FLIGHT.dec()
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def pdf_token_required(f):
+    """Decorator refusing a generate_pdf request whose token doesn't validate, before it takes a render slot"""
+    def decorated_function(*args, **kwargs):
+        token = request.args.get('token', '')
+        expected_token = generate_secure_token(session.get('session_id', '') + 'generate_pdf')
+        logger.debug(f"PDF Generation - Token: {token}, Expected: {expected_token}")
+        if not validate_token(token, expected_token):
+            logger.error(f"Token validation failed for PDF generation. Got {token}, expected {expected_token}")
+            flash("Invalid or expired session. Please try again.")
+            return redirect(url_for('results'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
+def print_report_preferred(f):
+    """Decorator sending users who chose browser-printed reports to print_report instead of rendering a PDF"""
+    def decorated_function(*args, **kwargs):
+        if report_mode() == 'browser':
+            return redirect(url_for('print_report'))
+        return f(*args, **kwargs)
+    decorated_function.__name__ = f.__name__
+    return decorated_function
+
 # Wrapper for url_for to add token
 def secure_url_for(endpoint, **kwargs):
     """Add a secure token to a URL"""
     if 'session_id' in session:
-        # Generate a unique token for the endpoint
-        token = generate_secure_token(session['session_id'] + endpoint)
-        # Store the tokens in session for later verification
         if 'endpoint_tokens' not in session:
             session['endpoint_tokens'] = {}
-        session['endpoint_tokens'][endpoint] = token
+        # Reuse the token already issued for the endpoint, so a page served
+        # from the browser cache (304) still carries links that validate
+        token = session['endpoint_tokens'].get(endpoint)
+        if not token:
+            # Generate a unique token for the endpoint and store it for later verification
+            token = generate_secure_token(session['session_id'] + endpoint)
+            session['endpoint_tokens'][endpoint] = token
         kwargs['token'] = token
     return url_for(endpoint, **kwargs)
 
@@ -421,6 +872,33 @@ segment_answers_data = {
     }
 }
 
+# Questions per segment, the layout of the packed answers in session['answers']
+ANSWER_LAYOUT = {i: len(questions) for i, questions in segment_questions.items()}
+
+def session_answers():
+    """The assessment's answers as {segment: [scores]}, unpacked at most once per request"""
+    packed = session.get('answers', '')
+    cached = g.get('_session_answers')
+    if cached is None or cached[0] != packed:
+        try:
+            answers = answer_codec.decode(packed, ANSWER_LAYOUT)
+        except answer_codec.AnswerFormatError as e:
+            # Packed by a different version of the questionnaire; start over
+            logger.warning(f"Discarding session answers: {str(e)}")
+            answers = {}
+        cached = (packed, answers)
+        g._session_answers = cached
+    return cached[1]
+
+def segment_scores(segment_id):
+    """Scores of one segment in question order, or an empty list if it hasn't been answered"""
+    return session_answers().get(segment_id, [])
+
+def store_segment_scores(segment_id, scores):
+    answers = dict(session_answers())
+    answers[segment_id] = scores
+    session['answers'] = answer_codec.encode(answers, ANSWER_LAYOUT)
+
 # Segment titles
 segment_titles = {
     1: "CRIMINAL HISTORY",
@@ -470,9 +948,16 @@ mandatory_programs = [
     "Spiritual/Moral Formation/Reformation activities"
 ]
 
+# Highest total score in the Low, Medium and High risk bands; anything above
+# the last cutoff is Very High
+risk_cutoffs = (17, 28, 39)
+
+# Risk level names in band order
+risk_levels = ["Low Risk (Level 1)", "Medium Risk (Level 2)", "High Risk (Level 3)", "Very High Risk (Level 4)"]
+
 def assess_risk_level(total_score, length_of_sentence):
     """Enhanced risk assessment that includes both probation types"""
-    if total_score <= 17:
+    if total_score <= risk_cutoffs[0]:
         return {
             "level": "Low Risk (Level 1)",
             "probation_sentenced": "6 months",
@@ -480,7 +965,7 @@ def assess_risk_level(total_score, length_of_sentence):
             "probation": "6 months" if length_of_sentence == "2-years-or-less" else "1 year",
             "supervision": "Once in 2 months"
         }
-    elif total_score <= 28:
+    elif total_score <= risk_cutoffs[1]:
         return {
             "level": "Medium Risk (Level 2)",
             "probation_sentenced": "6 months",
@@ -488,7 +973,7 @@ def assess_risk_level(total_score, length_of_sentence):
             "probation": "6 months" if length_of_sentence == "2-years-or-less" else "1 year",
             "supervision": "Once a month"
         }
-    elif total_score <= 39:
+    elif total_score <= risk_cutoffs[2]:
         return {
             "level": "High Risk (Level 3)",
             "probation_sentenced": "1 year",
@@ -545,9 +1030,10 @@ def index():
                 'officer_name': request.form.get('officer_name', ''),
                 'chief_name': request.form.get('chief_name', '')
             }
-            token = generate_secure_token(session['session_id'] + 'segment')
-            # Store this token for fallback validation later
-            session['current_segment_token'] = token
+            # The assessment's segment token; it is kept in the token history
+            # too, so the first segment still validates when the clock ticks
+            # over between POST and GET
+            token = session_token('segment')
             return redirect(url_for('segment', segment_id=1, token=token))
         except Exception as e:
             logger.error(f"Error in index: {str(e)}")
@@ -562,15 +1048,45 @@ def login():
 @app.route('/login_google')
 def login_google():
     redirect_uri = url_for('authorize', _external=True)  # _external=True generates full URL
-    return google.authorize_redirect(redirect_uri)
+    return get_google_client().authorize_redirect(redirect_uri)
+
+# Profile claims kept in the session, whether they come from the ID token or
+# the userinfo endpoint
+PROFILE_CLAIMS = ('sub', 'email', 'email_verified', 'name', 'given_name', 'family_name', 'picture', 'locale', 'hd')
+
+def profile_from_id_token(token):
+    """
+    Profile claims from the ID token, or None if it has no usable email.
+
+    authorize_access_token() has already verified the token's signature
+    (against the cached JWKS), issuer, audience, expiry and nonce, and put the
+    claims in token['userinfo'].
+    """
+    claims = token.get('userinfo')
+    if not claims or not claims.get('email') or claims.get('email_verified') is False:
+        return None
+    return {key: claims[key] for key in PROFILE_CLAIMS if key in claims}
 
 @app.route('/authorize')
 def authorize():
     try:
-        token = google.authorize_access_token()
-        print("Token request details: ", token)
-        resp = google.get('https://openidconnect.googleapis.com/v1/userinfo', token=token)
-        user_info = resp.json()
+        google = get_google_client()
+        with metrics.OAUTH_EXCHANGE_SECONDS.time(step='token'):
+            token = google.authorize_access_token()
+        # Field names only - the token's values are credentials
+        logger.debug(f"Token received with fields {sorted(token)}, expires at {token.get('expires_at')}")
+        user_info = profile_from_id_token(token)
+        if user_info is not None:
+            metrics.LOGIN_PROFILE_SOURCE.inc(source='id_token')
+        else:
+            # No ID token, or no email claim in it - ask the userinfo endpoint
+            with metrics.OAUTH_EXCHANGE_SECONDS.time(step='userinfo'):
+                resp = google.get('https://openidconnect.googleapis.com/v1/userinfo', token=token)
+            user_info = resp.json()
+            metrics.LOGIN_PROFILE_SOURCE.inc(source='userinfo')
+        # Authlib re-fetches the JWKS when Google has rotated its signing key
+        oauth_cache.remember_jwks(app.config['OAUTH_CACHE_PATH'], google.server_metadata.get('jwks'))
+        token.pop('userinfo', None)
 
         logger.debug(f"User Info: {user_info}")
 
@@ -594,7 +1110,7 @@ def logout():
 
 @app.before_request
 def require_login():
-    allowed_routes = {'login', 'login_google', 'authorize', 'static'}
+    allowed_routes = {'login', 'login_google', 'authorize', 'static', 'metrics_endpoint', 'sheets_status', 'score_api'}
     endpoint = request.endpoint
 
     # Skip check for static resources or unknown endpoints
@@ -630,17 +1146,6 @@ def segment(segment_id):
                 flash("Security token is invalid or expired. Please start over for your security.")
                 return redirect(url_for('index'))
             
-            # Store the token in session for use in the form submission
-            session['current_segment_token'] = token
-            
-            # Also keep a history of tokens for this endpoint
-            if 'token_history' not in session:
-                session['token_history'] = {}
-            if 'segment' not in session['token_history']:
-                session['token_history']['segment'] = []
-            if token not in session['token_history']['segment']:
-                session['token_history']['segment'].append(token)
-            
         # For POST requests, we need to be more lenient with token validation
         elif request.method == 'POST':
             token = request.form.get('token', '')
@@ -661,41 +1166,55 @@ def segment(segment_id):
             return redirect(url_for('index'))
             
         if request.method == 'POST':
-            # Save scores from the current segment
-            scores = []
-            form_data = [k for k in request.form.keys() if k.startswith(f'seg{segment_id}_q')]
-            question_count = len(form_data)
-            
-            # Extract scores in order
-            for i in range(1, question_count + 1):
-                score = int(request.form.get(f'seg{segment_id}_q{i}', 0))
-                scores.append(score)
-            
-            session[f'segment{segment_id}_scores'] = scores
-            # Also store complete form data for Google Sheets
-            session[f'segment{segment_id}'] = request.form.to_dict()
+            # Save scores from the current segment, in question order
+            scores = [
+                int(request.form.get(f'seg{segment_id}_q{i}', 0))
+                for i in range(1, ANSWER_LAYOUT[segment_id] + 1)
+            ]
+            store_segment_scores(segment_id, scores)
             
             # If we've completed all segments, submit to Google Sheets and go to results
             if segment_id == 8:
-                try:
-                    ordered_data = prepare_google_sheets_data()
-                    response = requests.post(
-                        GOOGLE_SCRIPT_URL,
-                        json=ordered_data,
-                        headers={'Content-Type': 'application/json'},
-                        timeout=15
-                    )
-                    
-                    if response.status_code != 200:
-                        logger.error(f"Google Sheets Error: Status {response.status_code}")
-                        flash("Failed to save responses to Google Sheets, but continuing to results.")
-                    
-                except Exception as e:
-                    logger.error(f"Google Sheets Error: {str(e)}")
-                    flash("Failed to save to Google Sheets, but continuing to results.")
-                
-                # Generate a new token for results
-                token = generate_secure_token(session['session_id'] + 'results')
+                key = submission_key()
+                if submissions.claim(key):
+                    try:
+                        try:
+                            ordered_data = prepare_google_sheets_data()
+                            outcome = submit_to_sheets(ordered_data, session.get('email', ''))
+                            
+                            if outcome == 'spooled':
+                                flash("Google Sheets is unavailable right now. Your responses were saved "
+                                      "and will be sent automatically.")
+                            elif outcome == 'failed':
+                                flash("Failed to save responses to Google Sheets, but continuing to results.")
+                            
+                        except Exception as e:
+                            logger.error(f"Google Sheets Error: {str(e)}")
+                            flash("Failed to save to Google Sheets, but continuing to results.")
+                            outcome = 'failed'
+                        
+                        # The session's results token
+                        token = session_token('results')
+                        if outcome == 'failed':
+                            # Nothing was recorded, so submitting again should retry
+                            submissions.release(key)
+                        else:
+                            submissions.complete(key, {'results_token': token})
+                    except Exception:
+                        submissions.release(key)
+                        raise
+                    metrics.ASSESSMENT_SUBMISSIONS.inc(outcome='failed' if outcome == 'failed' else 'submitted')
+                else:
+                    # Already submitted, or being submitted by the first click:
+                    # send this request to the same results page
+                    outcome = submissions.wait(key, timeout=20)
+                    if outcome is not None:
+                        token = outcome['results_token']
+                        metrics.ASSESSMENT_SUBMISSIONS.inc(outcome='duplicate')
+                    else:
+                        token = session_token('results')
+                        metrics.ASSESSMENT_SUBMISSIONS.inc(outcome='duplicate_unresolved')
+                    logger.info(f"Repeated final submission {key[:12]} redirected to results without posting")
                 session['current_results_token'] = token
                 
                 # Store token in history
@@ -703,42 +1222,30 @@ def segment(segment_id):
                     session['token_history'] = {}
                 if 'results' not in session['token_history']:
                     session['token_history']['results'] = []
-                session['token_history']['results'].append(token)
+                if token not in session['token_history']['results']:
+                    session['token_history']['results'].append(token)
                 
                 return redirect(url_for('results', token=token))
             
-            # Generate new token for next segment
-            next_token = generate_secure_token(session['session_id'] + 'segment')
-            # Store this token for the next segment
-            session['current_segment_token'] = next_token
-            
-            # Add to token history
-            if 'token_history' not in session:
-                session['token_history'] = {}
-            if 'segment' not in session['token_history']:
-                session['token_history']['segment'] = []
-            if next_token not in session['token_history']['segment']:
-                session['token_history']['segment'].append(next_token)
-                
+            # The next segment uses the same token, so its URL is the one the
+            # sidebar links to as well
+            next_token = session_token('segment')
             return redirect(url_for('segment', segment_id=segment_id+1, token=next_token))
                 
-        # Render the template with the current token
-        token = session.get('current_segment_token', generate_secure_token(session['session_id'] + 'segment'))
-        # Add to token history
-        if 'token_history' not in session:
-            session['token_history'] = {}
-        if 'segment' not in session['token_history']:
-            session['token_history']['segment'] = []
-        if token not in session['token_history']['segment']:
-            session['token_history']['segment'].append(token)
+        # Render the template with the session's token, whichever valid one the URL had
+        token = session_token('segment')
             
-        return render_template(
+        # The form's token and the Previous link's are fixed for the session
+        # (session_token, secure_url_for), and a new assessment clears the
+        # session, which also changes the CSRF token
+        etag = page_etag('segment', segment_id, csrf_token(), segment_scores(segment_id))
+        return conditional_page(etag, lambda: render_template(
             'segment.html', 
             segment_id=segment_id, 
             title=segment_titles[segment_id],
             next_segment=segment_id + 1,
             token=token
-        )
+        ))
     except Exception as e:
         logger.error(f"Error in segment {segment_id}: {str(e)}")
         flash("An error occurred processing your request. Please start over.")
@@ -762,113 +1269,255 @@ def save_notes():
         logger.error(f"Error saving notes: {str(e)}")
         return 'Error saving notes', 500
 
-def prepare_google_sheets_data():
-    """Prepare data for Google Sheets submission"""
+def compute_subtotals(segment_scores):
+    """
+    Subtotals keyed the way segment_thresholds and the report expect them:
+    segment 5 splits into education (5) and employment (6), and segments
+    6-8 move up to 7-9. Returns (subtotals, total_score).
+    """
+    subtotals = {}
+    total_score = 0
+    for i in range(1, 9):
+        scores = segment_scores.get(i, [])
+        if i == 5:  # Handle split segment
+            subtotals[5] = sum(scores[:3]) if len(scores) >= 3 else 0
+            subtotals[6] = sum(scores[3:]) if len(scores) > 3 else 0
+            total_score += sum(scores)
+        elif i < 5:
+            subtotals[i] = sum(scores)
+            total_score += subtotals[i]
+        else:
+            subtotals[i+1] = sum(scores)
+            total_score += subtotals[i+1]
+    return subtotals, total_score
+
+def program_label(segment_id, data):
+    """Program name as listed in the results, e.g. 'ICARE (CRIMINAL HISTORY)'"""
+    return f"{data.get('program', 'Unknown')} ({data.get('name', segment_titles.get(segment_id, ''))})"
+
+def recommend_programs(subtotals, thresholds=None):
+    """Programs for every factor whose subtotal reaches its threshold"""
+    recommended_programs = []
+    for segment_id, data in (thresholds or segment_thresholds).items():
+        if subtotals.get(segment_id, 0) >= data.get("threshold", 0):
+            recommended_programs.append(program_label(segment_id, data))
+    return recommended_programs
+
+def probation_sentence_length():
+    """The length of sentence the single Probation Period is read against, as results() always has"""
+    return session.get('length_of_sentence', '2-years-or-less')
+
+def score_assessment(answers, length_of_sentence=None):
+    """
+    Subtotals, total score, risk assessment and programs for one client's
+    {segment: [scores]} - the scoring of the results page, which batch
+    intake, the Sheets row and the scoring API all go through. The single
+    Probation Period is read against ``length_of_sentence`` when the client's
+    own is known (a batch row, an API item), else probation_sentence_length().
+    """
+    if length_of_sentence is None:
+        length_of_sentence = probation_sentence_length()
+    subtotals, total_score = compute_subtotals(answers)
+    return {
+        'subtotals': subtotals,
+        'total_score': total_score,
+        'risk_assessment': assess_risk_level(total_score, length_of_sentence),
+        'recommended_programs': recommend_programs(subtotals)
+    }
+
+def build_scoring_tables():
+    """
+    The scoring rules as JSON for live scoring in the browser: answer values
+    per question, which questions make up each factor subtotal (the same
+    split as compute_subtotals), factor thresholds and programs, and the risk
+    cutoffs. Returns (version, body); the version is a hash of the body.
+    """
+    questions = {}
+    factors = []
+    for i in range(1, 9):
+        names = [f'seg{i}_q{q + 1}' for q in range(len(segment_questions.get(i, [])))]
+        for q, name in enumerate(names):
+            questions[name] = sorted({answer['value'] for answer in segment_answers_data.get(i, {}).get(q, [])})
+        if i == 5:
+            factors.append({'key': 5, 'questions': [names[q] for q in segment_thresholds[5]['education']['questions']]})
+            factors.append({'key': 6, 'questions': [names[q] for q in segment_thresholds[5]['employment']['questions']]})
+        else:
+            factors.append({'key': i if i < 5 else i + 1, 'questions': names})
+    tables = {
+        'questions': questions,
+        'factors': factors,
+        'thresholds': {
+            str(segment_id): {'threshold': data['threshold'], 'program': program_label(segment_id, data)}
+            for segment_id, data in segment_thresholds.items()
+        },
+        'risk_cutoffs': list(risk_cutoffs),
+        'risk_levels': risk_levels,
+        # Probation periods and supervision of each band, as assess_risk_level() gives them
+        'risk_outcomes': [
+            {key: outcome[key] for key in ('probation_sentenced', 'probation_other', 'supervision')}
+            for outcome in (assess_risk_level(score, None) for score in [*risk_cutoffs, risk_cutoffs[-1] + 1])
+        ],
+        'mandatory_programs': mandatory_programs
+    }
+    body = json.dumps(tables, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(body.encode()).hexdigest()[:16], body
+
+SCORING_TABLES_VERSION, SCORING_TABLES_JSON = build_scoring_tables()
+app.jinja_env.globals.update(scoring_tables_version=SCORING_TABLES_VERSION)
+
+# Conditional GET for the segment and results pages: the ETag is a hash of
+# everything the page is rendered from, so a matching If-None-Match gets a
+# 304 without rendering the template
+_template_sources_digest = None
+
+def template_sources_digest():
+    """Hash of the template sources, so a deploy that changes a template changes every ETag"""
+    global _template_sources_digest
+    if _template_sources_digest is None or app.jinja_env.auto_reload:
+        digest = hashlib.sha256()
+        for root, _, files in sorted(os.walk(os.path.join(app.root_path, app.template_folder))):
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as f:
+                    digest.update(name.encode() + b'\0' + f.read())
+        _template_sources_digest = digest.hexdigest()
+    return _template_sources_digest
+
+def page_etag(*parts):
+    """Strong ETag over the page's inputs"""
+    payload = json.dumps([template_sources_digest(), SCORING_TABLES_VERSION, *parts],
+                         sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+def client_has(etag):
+    """True when If-None-Match names the ETag, as sent with or without a content coding"""
+    return any(tag in request.if_none_match for tag in compression.etag_variants(etag))
+
+def conditional_page(etag, render):
+    """Answer If-None-Match with 304, otherwise render the page and tag it"""
+    if client_has(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.make_response(render())
+    response.set_etag(etag)
+    # Let the browser keep the page but revalidate it on every visit
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+# Google Sheets column for each segment0 field
+SHEETS_METADATA_COLUMNS = {
+    'email': "Email Address",
+    'client_name': "Name of Petitioner/Probation/Parole",
+    'length_of_sentence': "Length of Sentence",
+    'officer_name': "Name & Position of Inv/Supvg Officer",
+    'chief_name': "Chief Probation Officer/Officer-in-Charge"
+}
+
+# Google Sheets column for each question, by segment - bulk re-scoring
+# (rescore_csv.py) and the analytics export read exports back by these names
+SHEETS_ANSWER_COLUMNS = {
+    # Criminal History
+    1: [
+        "Age at First Misconduct",
+        "Number of Previous Misconduct(s)",
+        "Extent of Involvement in Organized Crimes",
+        "Derogatory Record",
+        "Type of Offender",
+        "History of Violence"
+    ],
+    # Pro-Criminal Companions
+    2: [
+        "Type of Companions",
+        "Type of Activities with Companions",
+        "Friends' Support"
+    ],
+    # Pro-Criminal Attitudes
+    3: [
+        "It is okay to break the rules/laws as long as I can help my family.",
+        "It is okay to break the rules/laws because I don't know it.",
+        "It is okay to break the rules/laws when nobody sees me or I don't get caught.",
+        "It is okay to commit a crime if you're a victim of social injustice/inequality.",
+        "It is okay to commit a crime when you are in a desperate situation/crisis."
+    ],
+    # Anti-Social Personality
+    4: [
+        "I find it hard to follow rules.",
+        "I lie and cheat to get what I want.",
+        "I act without thinking of the consequences of my actions.",
+        "I easily get irritated or angry.",
+        "I don't care who gets hurt as long as I get what I want.",
+        "I find it hard to follow through with responsibilities/assigned tasks."
+    ],
+    # Education and Employment
+    5: [
+        "Educational Attainment",
+        "Educational Attachment",
+        "Overall Conduct in School",
+        "Employment Status at the Time of Arrest",
+        "Employable Skills",
+        "Employment History"
+    ],
+    # Family and Marital
+    6: [
+        "Quality of Family/Marital Relationships",
+        "Parental Guidance and Supervision",
+        "Family Acceptability in the Community",
+        "Spirituality/Religiosity"
+    ],
+    # Substance Abuse
+    7: [
+        "History of Drug Abuse",
+        "Frequency of Drug Use",
+        "History of Alcohol Abuse",
+        "Frequency of Alcohol Use",
+        "Desire/Urge for Substance Use",
+        "Cut Down on Substance Use (Reverse Coded)",
+        "Family History of Substance Use"
+    ],
+    # Mental Health
+    8: [
+        "I can perform my daily activities with minimal support from others",
+        "I can easily make good decisions on my own",
+        "I have experienced sadness for 14 days over the last 6 months",
+        "I have received consultation/treatment/counseling for a psychological/psychiatric problem",
+        "I sometimes hear or see things not normally seen or heard by others"
+    ]
+}
+
+def prepare_google_sheets_data(segment0=None, answers=None):
+    """
+    Prepare data for Google Sheets submission: the session's assessment, as
+    results() scores it, or the one passed in, scored with its own length of
+    sentence
+    """
     try:
+        length_of_sentence = None
+        if segment0 is None:
+            segment0 = session.get('segment0', {})
+        else:
+            length_of_sentence = segment0.get('length_of_sentence')
+        if answers is None:
+            answers = session_answers()
         ordered_data = {
-            "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "Email Address": session.get('segment0', {}).get('email', ''),
-            "Name of Petitioner/Probation/Parole": session.get('segment0', {}).get('client_name', ''),
-            "Length of Sentence": session.get('segment0', {}).get('length_of_sentence', ''),
-            "Name & Position of Inv/Supvg Officer": session.get('segment0', {}).get('officer_name', ''),
-            "Chief Probation Officer/Officer-in-Charge": session.get('segment0', {}).get('chief_name', '')
+            "Timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
+        for key, column in SHEETS_METADATA_COLUMNS.items():
+            ordered_data[column] = segment0.get(key, '')
 
-        # Add segment scores with error handling
+        # Add segment answers and totals with error handling
         for i in range(1, 9):
-            segment_scores = session.get(f'segment{i}_scores', [])
-            segment_data = session.get(f'segment{i}', {})
-            
-            # Criminal History (Segment 1)
-            if i == 1:
-                ordered_data.update({
-                    "Age at First Misconduct": segment_data.get('seg1_q1', '0'),
-                    "Number of Previous Misconduct(s)": segment_data.get('seg1_q2', '0'),
-                    "Extent of Involvement in Organized Crimes": segment_data.get('seg1_q3', '0'),
-                    "Derogatory Record": segment_data.get('seg1_q4', '0'),
-                    "Type of Offender": segment_data.get('seg1_q5', '0'),
-                    "History of Violence": segment_data.get('seg1_q6', '0')
-                })
-            
-            # Pro-Criminal Companions (Segment 2)
-            elif i == 2:
-                ordered_data.update({
-                    "Type of Companions": segment_data.get('seg2_q1', '0'),
-                    "Type of Activities with Companions": segment_data.get('seg2_q2', '0'),
-                    "Friends' Support": segment_data.get('seg2_q3', '0')
-                })
-            
-            # Pro-Criminal Attitudes (Segment 3)
-            elif i == 3:
-                ordered_data.update({
-                    "It is okay to break the rules/laws as long as I can help my family.": segment_data.get('seg3_q1', '0'),
-                    "It is okay to break the rules/laws because I don't know it.": segment_data.get('seg3_q2', '0'),
-                    "It is okay to break the rules/laws when nobody sees me or I don't get caught.": segment_data.get('seg3_q3', '0'),
-                    "It is okay to commit a crime if you're a victim of social injustice/inequality.": segment_data.get('seg3_q4', '0'),
-                    "It is okay to commit a crime when you are in a desperate situation/crisis.": segment_data.get('seg3_q5', '0')
-                })
-            
-            # Anti-Social Personality (Segment 4)
-            elif i == 4:
-                ordered_data.update({
-                    "I find it hard to follow rules.": segment_data.get('seg4_q1', '0'),
-                    "I lie and cheat to get what I want.": segment_data.get('seg4_q2', '0'),
-                    "I act without thinking of the consequences of my actions.": segment_data.get('seg4_q3', '0'),
-                    "I easily get irritated or angry.": segment_data.get('seg4_q4', '0'),
-                    "I don't care who gets hurt as long as I get what I want.": segment_data.get('seg4_q5', '0'),
-                    "I find it hard to follow through with responsibilities/assigned tasks.": segment_data.get('seg4_q6', '0')
-                })
-            
-            # Education and Employment (Segment 5)
-            elif i == 5:
-                ordered_data.update({
-                    "Educational Attainment": segment_data.get('seg5_q1', '0'),
-                    "Educational Attachment": segment_data.get('seg5_q2', '0'),
-                    "Overall Conduct in School": segment_data.get('seg5_q3', '0'),
-                    "Employment Status at the Time of Arrest": segment_data.get('seg5_q4', '0'),
-                    "Employable Skills": segment_data.get('seg5_q5', '0'),
-                    "Employment History": segment_data.get('seg5_q6', '0')
-                })
-            
-            # Family and Marital (Segment 6)
-            elif i == 6:
-                ordered_data.update({
-                    "Quality of Family/Marital Relationships": segment_data.get('seg6_q1', '0'),
-                    "Parental Guidance and Supervision": segment_data.get('seg6_q2', '0'),
-                    "Family Acceptability in the Community": segment_data.get('seg6_q3', '0'),
-                    "Spirituality/Religiosity": segment_data.get('seg6_q4', '0')
-                })
-            
-            # Substance Abuse (Segment 7)
-            elif i == 7:
-                ordered_data.update({
-                    "History of Drug Abuse": segment_data.get('seg7_q1', '0'),
-                    "Frequency of Drug Use": segment_data.get('seg7_q2', '0'),
-                    "History of Alcohol Abuse": segment_data.get('seg7_q3', '0'),
-                    "Frequency of Alcohol Use": segment_data.get('seg7_q4', '0'),
-                    "Desire/Urge for Substance Use": segment_data.get('seg7_q5', '0'),
-                    "Cut Down on Substance Use (Reverse Coded)": segment_data.get('seg7_q6', '0'),
-                    "Family History of Substance Use": segment_data.get('seg7_q7', '0')
-                })
-            
-            # Mental Health (Segment 8)
-            elif i == 8:
-                ordered_data.update({
-                    "I can perform my daily activities with minimal support from others": segment_data.get('seg8_q1', '0'),
-                    "I can easily make good decisions on my own": segment_data.get('seg8_q2', '0'),
-                    "I have experienced sadness for 14 days over the last 6 months": segment_data.get('seg8_q3', '0'),
-                    "I have received consultation/treatment/counseling for a psychological/psychiatric problem": segment_data.get('seg8_q4', '0'),
-                    "I sometimes hear or see things not normally seen or heard by others": segment_data.get('seg8_q5', '0')
-                })
+            scores = answers.get(i, [])
+            for q, column in enumerate(SHEETS_ANSWER_COLUMNS[i]):
+                ordered_data[column] = str(scores[q]) if q < len(scores) else '0'
 
             # Add segment total score
-            ordered_data[f"Segment {i} Total"] = str(sum(int(score) for score in segment_scores))
+            ordered_data[f"Segment {i} Total"] = str(sum(scores))
 
         # Add final calculations
-        total_score = sum(sum(int(score) for score in session.get(f'segment{i}_scores', [])) for i in range(1, 9))
-        ordered_data["Total Risk Score"] = str(total_score)
+        scored = score_assessment(answers, length_of_sentence)
+        ordered_data["Total Risk Score"] = str(scored['total_score'])
         
-        risk_assessment = assess_risk_level(total_score, session.get('length_of_sentence', '2-years-or-less'))
+        risk_assessment = scored['risk_assessment']
         ordered_data["Risk Level"] = risk_assessment["level"]
         ordered_data["Probation Period"] = risk_assessment["probation"]
         ordered_data["Supervision Intensity"] = risk_assessment["supervision"]
@@ -901,39 +1550,21 @@ def results():
     if token and 'token_history' in session and 'results' in session['token_history'] and token not in session['token_history']['results']:
         session['token_history']['results'].append(token)
     
-    subtotals = {}
-    total_score = 0
-    
-    for i in range(1, 9):
-        segment_scores = session.get(f'segment{i}_scores', [])
-        if i == 5:  # Handle split segment
-            subtotals[5] = sum(segment_scores[:3]) if len(segment_scores) >= 3 else 0
-            subtotals[6] = sum(segment_scores[3:]) if len(segment_scores) > 3 else 0
-            total_score += sum(segment_scores)
-        elif i < 5:
-            subtotal = sum(segment_scores)
-            subtotals[i] = subtotal
-            total_score += subtotal
-        else:
-            subtotal = sum(segment_scores)
-            subtotals[i+1] = subtotal
-            total_score += subtotal
-    
-    length_of_sentence = session.get('length_of_sentence', '2-years-or-less')
-    risk_assessment = assess_risk_level(total_score, length_of_sentence)
-    
-    # Determine recommended programs
-    recommended_programs = []
-    for segment_id, data in segment_thresholds.items():
-        threshold_met = subtotals.get(segment_id, 0) >= data.get("threshold", 0)
-        if threshold_met:
-            program_name = f"{data.get('program', 'Unknown')} ({data.get('name', segment_titles.get(segment_id, ''))})"
-            recommended_programs.append(program_name)
+    scored = score_assessment({i: segment_scores(i) for i in range(1, 9)})
+    subtotals = scored['subtotals']
+    total_score = scored['total_score']
+    risk_assessment = scored['risk_assessment']
+    recommended_programs = scored['recommended_programs']
     
     # Store the current results token for potential future use
     session['current_results_token'] = token
     
-    return render_template(
+    etag = page_etag(
+        'results', session.get('answers', ''),
+        probation_sentence_length(), session.get('segment0', {}), session.get('email', ''),
+        session.get('notes', ''), csrf_token(), report_mode()
+    )
+    return conditional_page(etag, lambda: render_template(
         'results.html',
         subtotals=subtotals,
         total_score=total_score,
@@ -942,8 +1573,10 @@ def results():
         mandatory_programs=mandatory_programs,
         segment_titles=segment_titles,
         segment_thresholds=segment_thresholds,
-        notes=session.get('notes', '')
-    )
+        risk_cutoffs=risk_cutoffs,
+        notes=session.get('notes', ''),
+        report_mode=report_mode()
+    ))
 
 def calculate_split_scores(segment_answers, segment_id=5):
     """Calculate separate scores for education and employment sections"""
@@ -962,130 +1595,130 @@ def calculate_split_scores(segment_answers, segment_id=5):
     
     return education_score, employment_score
 
+def build_pdf_context(length_of_sentence, client_name, officer_name, chief_name, answers=None, notes=None):
+    """Collect the scores in the session (or ``answers``) into the variables the PDF report needs"""
+    if answers is None:
+        answers = session_answers()
+    subtotals = {}
+    segment_answers = {}
+    segment_data = {}  # New dictionary to store remapped data
+    total_score = 0
+    
+    # First, collect all scores
+    for i in range(1, 9):
+        scores = answers.get(i, [])
+        if not scores:
+            logger.warning(f"No scores found for segment {i}, using default empty list")
+            scores = [0] * len(segment_questions.get(i, []))
+            
+        if i == 5:  # Split segment
+            # Education (stays as segment 5)
+            subtotals[5] = sum(scores[:3]) if len(scores) >= 3 else 0
+            segment_answers[5] = {
+                'questions': segment_questions[5][:3] if len(segment_questions.get(5, [])) >= 3 else [],
+                'scores': scores[:3] if len(scores) >= 3 else []
+            }
+            segment_data[5] = segment_answers_data.get(5, {})  # Education data
+            
+            # Employment (becomes segment 6)
+            subtotals[6] = sum(scores[3:]) if len(scores) > 3 else 0
+            segment_answers[6] = {
+                'questions': segment_questions[5][3:] if len(segment_questions.get(5, [])) > 3 else [],
+                'scores': scores[3:] if len(scores) > 3 else []
+            }
+            # Create new employment data from second half of segment 5
+            segment_data[6] = {
+                k-3: segment_answers_data.get(5, {}).get(k, {}) 
+                for k in range(3, 6) if k in segment_answers_data.get(5, {})
+            }
+            
+            total_score += sum(scores)
+        elif i < 5:  # Segments 1-4 stay the same
+            subtotal = sum(scores)
+            subtotals[i] = subtotal
+            total_score += subtotal
+            segment_answers[i] = {
+                'questions': segment_questions.get(i, []),
+                'scores': scores
+            }
+            segment_data[i] = segment_answers_data.get(i, {})
+        else:  # Segments 6-8 become 7-9
+            subtotal = sum(scores)
+            subtotals[i+1] = subtotal
+            total_score += subtotal
+            segment_answers[i+1] = {
+                'questions': segment_questions.get(i, []),
+                'scores': scores
+            }
+            segment_data[i+1] = segment_answers_data.get(i, {})
+    
+    risk_assessment = assess_risk_level(total_score, length_of_sentence)
+    
+    recommended_programs = recommend_programs(subtotals)
+    
+    # Calculate education and employment scores
+    try:
+        education_score, employment_score = calculate_split_scores(segment_answers)
+    except Exception as split_error:
+        logger.error(f"Error calculating split scores: {str(split_error)}")
+        education_score, employment_score = 0, 0
+    
+    return dict(
+        subtotals=subtotals,
+        total_score=total_score,
+        risk_assessment=risk_assessment,
+        recommended_programs=recommended_programs,
+        mandatory_programs=mandatory_programs,
+        segment_titles=segment_titles,
+        segment_answers=segment_answers,
+        segment_thresholds=segment_thresholds,
+        length_of_sentence=length_of_sentence,
+        client_name=client_name,
+        officer_name=officer_name,
+        chief_name=chief_name,
+        date=datetime.now().strftime("%B %d, %Y"),
+        segment_answers_data=segment_data,  # Pass the remapped data
+        education_score=education_score,
+        employment_score=employment_score,
+        notes=session.get('notes', '') if notes is None else notes,
+        session_id=session.get('session_id', '')  # Pass session ID for added security
+    )
+
+def render_report_pdf(context, route):
+    """Produce the risk report PDF bytes with the configured PDF_BACKEND"""
+    backend = app.config['PDF_BACKEND']
+    if backend == 'direct':
+        with metrics.PDF_RENDER_SECONDS.time(route=route, backend=backend):
+            return pdf_direct.render_report(context)
+    html = render_template('pdf_template.html', **context)
+    with metrics.PDF_RENDER_SECONDS.time(route=route, backend=backend):
+        return html_to_pdf(html)
+
 @app.route('/generate_pdf')
 @session_required
+@print_report_preferred
+@pdf_token_required
+@pdf_admission_required
 def generate_pdf():
     try:
-        # Validate token
-        token = request.args.get('token', '')
         session_id = session.get('session_id', '')
-        expected_token = generate_secure_token(session_id + 'generate_pdf')
-        
-        logger.debug(f"PDF Generation - Token: {token}, Expected: {expected_token}")
-        
-        if not validate_token(token, expected_token):
-            logger.error(f"Token validation failed for PDF generation. Got {token}, expected {expected_token}")
-            flash("Invalid or expired session. Please try again.")
-            return redirect(url_for('results'))
-            
-        subtotals = {}
-        segment_answers = {}
-        segment_data = {}  # New dictionary to store remapped data
-        total_score = 0
-        
-        # First, collect all scores
-        for i in range(1, 9):
-            segment_scores = session.get(f'segment{i}_scores', [])
-            if not segment_scores:
-                logger.warning(f"No scores found for segment {i}, using default empty list")
-                segment_scores = [0] * len(segment_questions.get(i, []))
-                
-            if i == 5:  # Split segment
-                # Education (stays as segment 5)
-                subtotals[5] = sum(segment_scores[:3]) if len(segment_scores) >= 3 else 0
-                segment_answers[5] = {
-                    'questions': segment_questions[5][:3] if len(segment_questions.get(5, [])) >= 3 else [],
-                    'scores': segment_scores[:3] if len(segment_scores) >= 3 else []
-                }
-                segment_data[5] = segment_answers_data.get(5, {})  # Education data
-                
-                # Employment (becomes segment 6)
-                subtotals[6] = sum(segment_scores[3:]) if len(segment_scores) > 3 else 0
-                segment_answers[6] = {
-                    'questions': segment_questions[5][3:] if len(segment_questions.get(5, [])) > 3 else [],
-                    'scores': segment_scores[3:] if len(segment_scores) > 3 else []
-                }
-                # Create new employment data from second half of segment 5
-                segment_data[6] = {
-                    k-3: segment_answers_data.get(5, {}).get(k, {}) 
-                    for k in range(3, 6) if k in segment_answers_data.get(5, {})
-                }
-                
-                total_score += sum(segment_scores)
-            elif i < 5:  # Segments 1-4 stay the same
-                subtotal = sum(segment_scores)
-                subtotals[i] = subtotal
-                total_score += subtotal
-                segment_answers[i] = {
-                    'questions': segment_questions.get(i, []),
-                    'scores': segment_scores
-                }
-                segment_data[i] = segment_answers_data.get(i, {})
-            else:  # Segments 6-8 become 7-9
-                subtotal = sum(segment_scores)
-                subtotals[i+1] = subtotal
-                total_score += subtotal
-                segment_answers[i+1] = {
-                    'questions': segment_questions.get(i, []),
-                    'scores': segment_scores
-                }
-                segment_data[i+1] = segment_answers_data.get(i, {})
-        
-        length_of_sentence = session.get('length_of_sentence', '2-years-or-less')
-        risk_assessment = assess_risk_level(total_score, length_of_sentence)
-        
-        # Determine recommended programs
-        recommended_programs = []
-        for segment_id, data in segment_thresholds.items():
-            if subtotals.get(segment_id, 0) >= data.get("threshold", 0):
-                program_name = f"{data.get('program', 'Unknown')} ({data.get('name', segment_titles.get(segment_id, ''))})"
-                recommended_programs.append(program_name)
-        
-        # Calculate education and employment scores
-        try:
-            education_score, employment_score = calculate_split_scores(segment_answers)
-        except Exception as split_error:
-            logger.error(f"Error calculating split scores: {str(split_error)}")
-            education_score, employment_score = 0, 0
-        
-        client_name = session.get('client_name', '')
-        officer_name = session.get('officer_name', '')
-        chief_name = session.get('chief_name', '')
-        
-        logger.debug(f"Rendering PDF template with: client={client_name}, total_score={total_score}")
-        
-        # Render the PDF template
-        html = render_template(
-            'pdf_template.html',
-            subtotals=subtotals,
-            total_score=total_score,
-            risk_assessment=risk_assessment,
-            recommended_programs=recommended_programs,
-            mandatory_programs=mandatory_programs,
-            segment_titles=segment_titles,
-            segment_answers=segment_answers,
-            segment_thresholds=segment_thresholds,
-            length_of_sentence=length_of_sentence,
-            client_name=client_name,
-            officer_name=officer_name,
-            chief_name=chief_name,
-            date=datetime.now().strftime("%B %d, %Y"),
-            segment_answers_data=segment_data,  # Pass the remapped data
-            education_score=education_score,
-            employment_score=employment_score,
-            session_id=session_id  # Pass session ID for added security
+        context = build_pdf_context(
+            length_of_sentence=session.get('length_of_sentence', '2-years-or-less'),
+            client_name=session.get('client_name', ''),
+            officer_name=session.get('officer_name', ''),
+            chief_name=session.get('chief_name', '')
         )
         
+        logger.debug(f"Rendering PDF report with: client={context['client_name']}, total_score={context['total_score']}")
+        
         # Set a unique filename with timestamp and session hash for additional security
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         session_hash = hashlib.md5(session_id.encode()).hexdigest()[:8]
         filename = f"risk_assessment_{timestamp}_{session_hash}.pdf"
         
-        logger.debug("Converting HTML to PDF with WeasyPrint...")
-        
         try:
-            # Convert the HTML to a PDF
-            pdf = HTML(string=html).write_pdf()
+            # Convert the report to a PDF
+            pdf = render_report_pdf(context, 'generate_pdf')
             logger.debug(f"PDF generated successfully, size: {len(pdf)} bytes")
             
             # Create byte stream
@@ -1110,8 +1743,8 @@ def generate_pdf():
             return response
             
         except Exception as pdf_error:
-            logger.error(f"Error in WeasyPrint PDF generation: {str(pdf_error)}")
-            flash("Error generating PDF with WeasyPrint. Please try again.")
+            logger.error(f"Error in PDF generation: {str(pdf_error)}")
+            flash("Error generating PDF. Please try again.")
             return redirect(url_for('results'))
         
     except Exception as e:
@@ -1123,116 +1756,32 @@ def generate_pdf():
 
 @app.route('/direct_pdf_download')
 @session_required
+@print_report_preferred
+@pdf_admission_required
 def direct_pdf_download():
     """Generate a PDF without token verification - simpler approach for direct download"""
     try:
         logger.debug("Direct PDF download requested")
         
-        subtotals = {}
-        segment_answers = {}
-        segment_data = {}
-        total_score = 0
-        
-        # First, collect all scores
-        for i in range(1, 9):
-            segment_scores = session.get(f'segment{i}_scores', [])
-            if not segment_scores:
-                logger.warning(f"No scores found for segment {i}, using default empty list")
-                segment_scores = [0] * len(segment_questions.get(i, []))
-                
-            if i == 5:  # Split segment
-                subtotals[5] = sum(segment_scores[:3]) if len(segment_scores) >= 3 else 0
-                segment_answers[5] = {
-                    'questions': segment_questions[5][:3] if len(segment_questions.get(5, [])) >= 3 else [],
-                    'scores': segment_scores[:3] if len(segment_scores) >= 3 else []
-                }
-                segment_data[5] = segment_answers_data.get(5, {})
-                
-                subtotals[6] = sum(segment_scores[3:]) if len(segment_scores) > 3 else 0
-                segment_answers[6] = {
-                    'questions': segment_questions[5][3:] if len(segment_questions.get(5, [])) > 3 else [],
-                    'scores': segment_scores[3:] if len(segment_scores) > 3 else []
-                }
-                segment_data[6] = {
-                    k-3: segment_answers_data.get(5, {}).get(k, {}) 
-                    for k in range(3, 6) if k in segment_answers_data.get(5, {})
-                }
-                
-                total_score += sum(segment_scores)
-            elif i < 5:
-                subtotal = sum(segment_scores)
-                subtotals[i] = subtotal
-                total_score += subtotal
-                segment_answers[i] = {
-                    'questions': segment_questions.get(i, []),
-                    'scores': segment_scores
-                }
-                segment_data[i] = segment_answers_data.get(i, {})
-            else:
-                subtotal = sum(segment_scores)
-                subtotals[i+1] = subtotal
-                total_score += subtotal
-                segment_answers[i+1] = {
-                    'questions': segment_questions.get(i, []),
-                    'scores': segment_scores
-                }
-                segment_data[i+1] = segment_answers_data.get(i, {})
-        
-        length_of_sentence = session.get('segment0', {}).get('length_of_sentence', '2-years-or-less')
-        risk_assessment = assess_risk_level(total_score, length_of_sentence)
-        
-        # Determine recommended programs
-        recommended_programs = []
-        for segment_id, data in segment_thresholds.items():
-            if subtotals.get(segment_id, 0) >= data.get("threshold", 0):
-                program_name = f"{data.get('program', 'Unknown')} ({data.get('name', segment_titles.get(segment_id, ''))})"
-                recommended_programs.append(program_name)
-        
-        # Calculate education and employment scores
-        try:
-            education_score, employment_score = calculate_split_scores(segment_answers)
-        except Exception as split_error:
-            logger.error(f"Error calculating split scores: {str(split_error)}")
-            education_score, employment_score = 0, 0
-        
-        client_name = session.get('segment0', {}).get('client_name', '')
-        officer_name = session.get('segment0', {}).get('officer_name', '')
-        chief_name = session.get('segment0', {}).get('chief_name', '')
-        
-        logger.debug(f"Rendering PDF template with direct download: client={client_name}, total_score={total_score}")
-        
-        # Render the PDF template
-        html = render_template(
-            'pdf_template.html',
-            subtotals=subtotals,
-            total_score=total_score,
-            risk_assessment=risk_assessment,
-            recommended_programs=recommended_programs,
-            mandatory_programs=mandatory_programs,
-            segment_titles=segment_titles,
-            segment_answers=segment_answers,
-            segment_thresholds=segment_thresholds,
-            length_of_sentence=length_of_sentence,
-            client_name=client_name,
-            officer_name=officer_name,
-            chief_name=chief_name,
-            date=datetime.now().strftime("%B %d, %Y"),
-            segment_answers_data=segment_data,
-            education_score=education_score,
-            employment_score=employment_score,
-            session_id=session.get('session_id', '')
+        segment0 = session.get('segment0', {})
+        context = build_pdf_context(
+            length_of_sentence=segment0.get('length_of_sentence', '2-years-or-less'),
+            client_name=segment0.get('client_name', ''),
+            officer_name=segment0.get('officer_name', ''),
+            chief_name=segment0.get('chief_name', '')
         )
+        client_name = context['client_name']
+        
+        logger.debug(f"Rendering PDF report with direct download: client={client_name}, total_score={context['total_score']}")
         
         # Set a unique filename with timestamp and client name for easier identification
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         safe_client_name = "".join([c if c.isalnum() else "_" for c in client_name])[:30]
         filename = f"risk_assessment_{safe_client_name}_{timestamp}.pdf"
         
-        logger.debug("Converting HTML to PDF with WeasyPrint for direct download...")
-        
         try:
-            # Convert the HTML to a PDF
-            pdf = HTML(string=html).write_pdf()
+            # Convert the report to a PDF
+            pdf = render_report_pdf(context, 'direct_pdf_download')
             logger.debug(f"Direct PDF generated successfully, size: {len(pdf)} bytes")
             
             # Create byte stream
@@ -1258,8 +1807,8 @@ def direct_pdf_download():
             return response
             
         except Exception as pdf_error:
-            logger.error(f"Error in WeasyPrint PDF generation for direct download: {str(pdf_error)}")
-            flash("Error generating PDF with WeasyPrint. Please try again.")
+            logger.error(f"Error in PDF generation for direct download: {str(pdf_error)}")
+            flash("Error generating PDF. Please try again.")
             return redirect(url_for('results'))
         
     except Exception as e:
@@ -1269,6 +1818,44 @@ def direct_pdf_download():
         flash("Error generating PDF. Please try again.")
         return redirect(url_for('results'))
 
+@app.route('/print_report')
+@session_required
+def print_report():
+    """The PDF report as a page for the browser to print (or save as PDF) itself, with no server-side render"""
+    segment0 = session.get('segment0', {})
+    context = build_pdf_context(
+        length_of_sentence=segment0.get('length_of_sentence', '2-years-or-less'),
+        client_name=segment0.get('client_name', ''),
+        officer_name=segment0.get('officer_name', ''),
+        chief_name=segment0.get('chief_name', '')
+    )
+    fallback = request.args.get('fallback') == '1'
+    metrics.PRINT_REPORTS.inc(reason='fallback' if fallback else report_mode())
+    response = app.make_response(render_template(
+        'pdf_template.html', print_mode=True, print_fallback=fallback, **context
+    ))
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response
+
+@app.route('/report_mode', methods=['POST'])
+@session_required
+def set_report_mode():
+    """Remember whether this user's reports are rendered by the server or printed by the browser"""
+    received_token = request.headers.get('X-CSRFToken')
+    if not received_token or received_token != session.get('csrf_token'):
+        logger.warning("CSRF token validation failed for report_mode")
+        return 'CSRF validation failed', 403
+    mode = request.form.get('mode', '')
+    if mode not in REPORT_MODES:
+        return 'Unknown report mode', 400
+    response = app.response_class(status=204)
+    # Outlives the 30-minute session so the choice sticks across assessments
+    response.set_cookie(
+        REPORT_MODE_COOKIE, mode, max_age=365 * 24 * 60 * 60,
+        secure=app.config['SESSION_COOKIE_SECURE'], httponly=True, samesite='Lax'
+    )
+    return response
+
 @app.route('/get_pdf_token')
 @session_required
 def get_pdf_token():
@@ -1283,6 +1870,7 @@ def get_pdf_token():
         return {"error": "Failed to generate token"}, 500
 
 @app.route('/test_pdf')
+@pdf_admission_required
 def test_pdf():
     """Generate a simple test PDF to check if WeasyPrint is working correctly"""
     try:
@@ -1310,7 +1898,8 @@ def test_pdf():
         """
         
         # Convert the HTML to a PDF
-        pdf = HTML(string=html_content).write_pdf()
+        with metrics.PDF_RENDER_SECONDS.time(route='test_pdf', backend='weasyprint'):
+            pdf = html_to_pdf(html_content)
         logger.debug(f"Test PDF generated successfully, size: {len(pdf)} bytes")
         
         # Create byte stream
@@ -1347,6 +1936,67 @@ def test_pdf():
 def favicon():
     return send_from_directory('static', 'favicon.ico', mimetype='image/vnd.microsoft.icon')
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose request and dependency timings in Prometheus text format"""
+    refused = metrics_token_status()
+    if refused:
+        return ('Not Found' if refused == 404 else 'Unauthorized'), refused
+    return metrics.REGISTRY.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+@app.route('/internal/sheets_status')
+def sheets_status():
+    """Circuit breaker state, recent post latencies and spool depth per office endpoint"""
+    refused = metrics_token_status()
+    if refused:
+        return ('Not Found' if refused == 404 else 'Unauthorized'), refused
+    offices = {}
+    for office, endpoint in sheets_router.endpoints.items():
+        offices[office] = {
+            **endpoint.breaker.snapshot(),
+            'in_flight': endpoint.in_flight,
+            'latency': endpoint.latencies.percentiles()
+        }
+    return {'offices': offices, 'spooled': len(submission_spool), 'rejected': len(submission_spool.dead_letters())}
+
+@app.route('/scoring_tables/<version>.json')
+def scoring_tables(version):
+    """Scoring tables for live scoring in main.js; the URL changes whenever the rules do"""
+    if version != SCORING_TABLES_VERSION:
+        # A page rendered before a deploy asks for old tables - send it the current ones
+        return redirect(url_for('scoring_tables', version=SCORING_TABLES_VERSION))
+    if client_has(SCORING_TABLES_VERSION):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(SCORING_TABLES_JSON, mimetype='application/json')
+    response.set_etag(SCORING_TABLES_VERSION)
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
+def session_token(endpoint):
+    """
+    The token for an endpoint ('segment' or 'results') in this assessment:
+    issued once, then reused like secure_url_for's, so revisits land on the
+    same URL and page and the browser's cached copy (304) stays valid
+    """
+    token = session.get(f'current_{endpoint}_token')
+    if not token:
+        token = generate_secure_token(session['session_id'] + endpoint)
+        # Store token for fallback validation
+        session[f'current_{endpoint}_token'] = token
+    
+    # Also store in token history
+    if 'token_history' not in session:
+        session['token_history'] = {}
+    if endpoint not in session['token_history']:
+        session['token_history'][endpoint] = []
+    if token not in session['token_history'][endpoint]:
+        session['token_history'][endpoint].append(token)
+        session.modified = True
+    return token
+
 @app.route('/navigate/<target>')
 @session_required
 def navigate(target):
@@ -1369,18 +2019,7 @@ def navigate(target):
             try:
                 segment_id = int(target.split('_')[1])
                 if 1 <= segment_id <= 8:
-                    token = generate_secure_token(session_id + 'segment')
-                    # Store token for fallback validation
-                    session['current_segment_token'] = token
-                    
-                    # Also store in token history
-                    if 'token_history' not in session:
-                        session['token_history'] = {}
-                    if 'segment' not in session['token_history']:
-                        session['token_history']['segment'] = []
-                    if token not in session['token_history']['segment']:
-                        session['token_history']['segment'].append(token)
-                        
+                    token = session_token('segment')
                     logger.debug(f"Navigating to segment {segment_id} with token {token}")
                     return redirect(url_for('segment', segment_id=segment_id, token=token))
                 else:
@@ -1391,17 +2030,7 @@ def navigate(target):
                 return redirect(url_for('index'))
                 
         if target == 'results':
-            token = generate_secure_token(session_id + 'results')
-            # Store in session and token history
-            session['current_results_token'] = token
-            
-            if 'token_history' not in session:
-                session['token_history'] = {}
-            if 'results' not in session['token_history']:
-                session['token_history']['results'] = []
-            if token not in session['token_history']['results']:
-                session['token_history']['results'].append(token)
-                
+            token = session_token('results')
             return redirect(url_for('results', token=token))
             
         # Default case - redirect to index
@@ -1416,5 +2045,347 @@ def navigate(target):
         flash("An error occurred during navigation. Please try again.")
         return redirect(url_for('index'))
 
+@app.route('/navigate/<target>/fragment')
+@session_required
+def navigate_fragment(target):
+    """
+    In-place sidebar navigation for main.js: the form of the requested segment
+    with the session's segment token, as JSON, in one request instead of navigate()'s
+    redirect and a full page load. Targets other than segments get a 404 and
+    main.js falls back to /navigate/<target>.
+    """
+    match = re.fullmatch(r'segment_([1-8])', target)
+    if not match:
+        return {'error': 'partial navigation is only available for segments'}, 404
+    segment_id = int(match.group(1))
+    token = session_token('segment')
+    logger.debug(f"Partial navigation to segment {segment_id} with token {token}")
+    response = app.make_response({
+        'segment_id': segment_id,
+        'title': segment_titles[segment_id],
+        'url': url_for('segment', segment_id=segment_id, token=token),
+        'action': url_for('segment', segment_id=segment_id),
+        'html': render_template('segment_form.html', segment_id=segment_id, token=token)
+    })
+    response.cache_control.no_store = True
+    return response
+
+# Batch intake: many clients scored from one grid or CSV upload, queued for
+# Sheets through the spool, each with a signed link to its PDF report
+app.config['BATCH_MAX_ROWS'] = int(os.environ.get('BATCH_MAX_ROWS', batch_intake.DEFAULT_MAX_ROWS))
+# Empty grid rows on a fresh /batch page (?rows=N asks for more)
+app.config['BATCH_GRID_ROWS'] = int(os.environ.get('BATCH_GRID_ROWS', 10))
+# Seconds a batch PDF link stays valid
+app.config['BATCH_PDF_LINK_MAX_AGE'] = int(os.environ.get('BATCH_PDF_LINK_MAX_AGE', 24 * 60 * 60))
+batch_rules = batch_intake.BatchIntake(
+    {i: [[answer['value'] for answer in segment_answers_data[i][q]] for q in range(len(segment_questions[i]))]
+     for i in segment_questions},
+    app.config['BATCH_MAX_ROWS']
+)
+batch_pdf_links = URLSafeTimedSerializer(app.secret_key, salt='batch-pdf')
+
+def batch_submission_key(email, rows):
+    """Idempotency key of a batch: the officer plus every client's fields and answers"""
+    payload = json.dumps(
+        [email, [[row.fields, [row.answers[i] for i in sorted(row.answers)]] for row in rows]],
+        sort_keys=True, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def render_batch_page(grid_rows=None, rows=None, results=None, status=200):
+    if grid_rows is None:
+        count = request.args.get('rows', type=int) or app.config['BATCH_GRID_ROWS']
+        grid_rows = [{} for _ in range(max(1, min(count, app.config['BATCH_MAX_ROWS'])))]
+    return render_template(
+        'batch.html',
+        grid_rows=grid_rows,
+        rows=rows,
+        results=results,
+        answer_columns=batch_rules.answer_columns,
+        segment_questions=segment_questions,
+        segment_titles=segment_titles,
+        sentence_lengths=batch_intake.SENTENCE_LENGTHS,
+        max_rows=app.config['BATCH_MAX_ROWS']
+    ), status
+
+@app.route('/batch', methods=['GET', 'POST'])
+@session_required
+def batch():
+    """Score many clients at once from the grid or an uploaded CSV"""
+    if request.method == 'GET':
+        return render_batch_page()
+
+    if request.form.get('csrf_token') != session.get('csrf_token'):
+        logger.warning("CSRF token validation failed for batch intake")
+        return 'CSRF validation failed', 403
+
+    email = session.get('email', '')
+    # Officer and chief typed once above the grid fill rows that leave them blank
+    defaults = {field: request.form.get(field, '').strip() for field in ('officer_name', 'chief_name')}
+    upload = request.files.get('csv_file')
+    try:
+        if upload and upload.filename:
+            raw_rows = batch_rules.rows_from_csv(upload.read().decode('utf-8-sig'))
+        else:
+            raw_rows = batch_rules.rows_from_form(request.form, request.form.get('row_count', 0, type=int))
+    except UnicodeDecodeError:
+        flash("The CSV file must be saved as UTF-8.")
+        return render_batch_page(status=400)
+    except batch_intake.BatchError as e:
+        flash(str(e))
+        return render_batch_page(status=400)
+    for raw in raw_rows:
+        for field, value in defaults.items():
+            if value and not (raw.get(field) or '').strip():
+                raw[field] = value
+
+    rows = batch_rules.validate(raw_rows)
+    invalid = [row for row in rows if not row.valid]
+    if invalid:
+        metrics.BATCH_INTAKE_ROWS.inc(len(rows), outcome='refused')
+        flash(f"{len(invalid)} of {len(rows)} client(s) have errors. Nothing was scored or saved; "
+              "correct them and submit the batch again.")
+        return render_batch_page(grid_rows=raw_rows, rows=invalid, status=400)
+
+    # Score every client in one pass; the Sheets rows and PDF links come from the same answers
+    results = []
+    sheet_rows = []
+    for row in rows:
+        segment0 = dict(row.fields, email=email)
+        sheet_rows.append(prepare_google_sheets_data(segment0, row.answers))
+        link = batch_pdf_links.dumps({
+            'email': email,
+            'fields': row.fields,
+            'answers': answer_codec.encode(row.answers, ANSWER_LAYOUT)
+        })
+        results.append(dict(score_assessment(row.answers, row.fields['length_of_sentence']), row=row, pdf_url=url_for('batch_pdf', link=link)))
+    metrics.BATCH_INTAKE_ROWS.inc(len(rows), outcome='scored')
+
+    counts = queue_batch_rows(batch_submission_key(email, rows), sheet_rows, email)
+    if counts['queued']:
+        flash(f"{counts['queued']} client(s) were saved and are being sent to Google Sheets.")
+    if counts['failed']:
+        flash(f"Failed to save {counts['failed']} of {len(rows)} client(s) for Google Sheets. Submit the batch "
+              "again to retry them; clients already saved are not sent twice.")
+    if counts['pending']:
+        flash(f"{counts['pending']} client(s) are still being saved by an earlier submission of this batch. "
+              "Submit it again if they don't appear in the sheet.")
+    if counts['duplicate']:
+        flash(f"{counts['duplicate']} client(s) were already saved by an earlier submission of this batch "
+              "and were not sent again.")
+    logger.info(f"Batch of {len(rows)} client(s) queued for Sheets: {counts}")
+
+    return render_batch_page(grid_rows=[], results=results)
+
+def queue_batch_rows(key, sheet_rows, email):
+    """
+    Queue each client's row in the Sheets spool and start the background
+    replay, which posts them one at a time as the interactive flow does;
+    posting up to BATCH_MAX_ROWS rows inside the request would hold the
+    worker far past any proxy timeout. Every row has its own idempotency
+    key, so a repeated batch skips the rows already queued. Returns a count
+    per outcome: queued, or failed when the spool couldn't be written, for
+    rows handled now; duplicate for rows an earlier submission queued,
+    pending for rows an earlier submission is still queueing.
+    """
+    counts = dict.fromkeys(('queued', 'failed', 'duplicate', 'pending'), 0)
+    for number, ordered_data in enumerate(sheet_rows, start=1):
+        row_key = f"{key}-{number}"
+        if submissions.claim(row_key):
+            try:
+                submission_spool.add(email, ordered_data, 'batch')
+            except OSError as e:
+                logger.error(f"Could not spool batch row {number}: {str(e)}")
+                # Nothing was recorded, so submitting the batch again should retry this row
+                submissions.release(row_key)
+                outcome = 'failed'
+            else:
+                submissions.complete(row_key, {'outcome': 'queued'})
+                outcome = 'queued'
+        else:
+            # Queueing takes a file write, so an unfinished claim is a request
+            # that is still running or died; don't hold this one up for it
+            outcome = 'duplicate' if submissions.outcome(row_key) is not None else 'pending'
+            if outcome == 'duplicate':
+                logger.info(f"Batch row {row_key[:12]}-{number} already queued, not queued again")
+        counts[outcome] += 1
+        metrics.BATCH_SUBMISSIONS.inc(outcome=outcome)
+    if counts['queued']:
+        replay_sheets_spool_in_background()
+    return counts
+
+@app.route('/batch/template.csv')
+@session_required
+def batch_csv_template():
+    """An empty CSV with the header row batch intake expects"""
+    response = app.response_class(','.join(batch_rules.columns) + '\r\n', mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=batch_intake_template.csv'
+    return response
+
+@app.route('/batch/pdf/<link>')
+@pdf_admission_required
+def batch_pdf(link):
+    """PDF report for one client of a batch, from the signed answers in the link"""
+    try:
+        payload = batch_pdf_links.loads(link, max_age=app.config['BATCH_PDF_LINK_MAX_AGE'])
+        answers = answer_codec.decode(payload['answers'], ANSWER_LAYOUT)
+    except (BadSignature, answer_codec.AnswerFormatError) as e:
+        logger.warning(f"Rejected batch PDF link: {str(e)}")
+        flash("This PDF link is invalid or has expired. Please submit the batch again.")
+        return redirect(url_for('batch'))
+    if payload['email'] != session.get('email', ''):
+        logger.warning("Batch PDF link used by a different user")
+        return 'Forbidden', 403
+
+    fields = payload['fields']
+    context = build_pdf_context(
+        length_of_sentence=fields['length_of_sentence'],
+        client_name=fields['client_name'],
+        officer_name=fields['officer_name'],
+        chief_name=fields['chief_name'],
+        answers=answers,
+        notes=''
+    )
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    safe_client_name = "".join([c if c.isalnum() else "_" for c in fields['client_name']])[:30]
+    filename = f"risk_assessment_{safe_client_name}_{timestamp}.pdf"
+    try:
+        pdf = render_report_pdf(context, 'batch_pdf')
+    except Exception as pdf_error:
+        logger.error(f"Error in PDF generation for batch client: {str(pdf_error)}")
+        flash("Error generating PDF. Please try again.")
+        return redirect(url_for('batch'))
+
+    response = send_file(BytesIO(pdf), download_name=filename, as_attachment=True, mimetype='application/pdf')
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response
+
+# JSON scoring API for case-management systems: the scoring results() does,
+# on posted answers or the session's stored assessment, without rendering
+# anything. Other systems authenticate with a bearer token from
+# SCORING_API_TOKENS (comma-separated); a logged-in officer's session works too.
+app.config['SCORING_API_TOKENS'] = [
+    token.strip() for token in os.environ.get('SCORING_API_TOKENS', '').split(',') if token.strip()
+]
+app.config['SCORING_API_MAX_BATCH'] = int(os.environ.get('SCORING_API_MAX_BATCH', 500))
+
+def scoring_api_authorized():
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        presented = authorization[len('Bearer '):]
+        return any(hmac.compare_digest(presented, token) for token in app.config['SCORING_API_TOKENS'])
+    return 'google_token' in session
+
+def scoring_api_result(answers, length_of_sentence=None):
+    """
+    The computed outcome of one assessment as the API returns it -
+    score_assessment(), as results() shows it; "probation" is read against
+    ``length_of_sentence`` when given, as for a batch row
+    """
+    scored = score_assessment(answers, length_of_sentence)
+    risk_assessment = scored['risk_assessment']
+    return {
+        'subtotals': {str(key): value for key, value in scored['subtotals'].items()},
+        'total_score': scored['total_score'],
+        'risk_level': risk_assessment['level'],
+        'probation': risk_assessment['probation'],
+        'probation_sentenced': risk_assessment['probation_sentenced'],
+        'probation_other': risk_assessment['probation_other'],
+        'supervision': risk_assessment['supervision'],
+        'programs': scored['recommended_programs']
+    }
+
+def score_api_item(item):
+    """Score one posted assessment; returns (result, errors)"""
+    if not isinstance(item, dict):
+        return None, ["an assessment must be a JSON object"]
+
+    # The index page's Length of Sentence; without it only the two explicit
+    # probation periods are returned, since a caller without an assessment
+    # session has no length for "probation" to be read against
+    length_of_sentence = item.get('length_of_sentence')
+    if length_of_sentence is not None and length_of_sentence not in batch_intake.SENTENCE_LENGTHS:
+        return None, [f"length_of_sentence {length_of_sentence!r} is not one of "
+                      f"{', '.join(batch_intake.SENTENCE_LENGTHS)}"]
+
+    # Answers by question name ({"seg1_q1": 1, ...}), by segment ({"1": [1, 0, ...], ...}),
+    # or packed the way the session stores them
+    if 'packed' in item:
+        try:
+            decoded = answer_codec.decode(str(item['packed']), ANSWER_LAYOUT)
+        except answer_codec.AnswerFormatError as e:
+            return None, [str(e)]
+        raw = {f'seg{i}_q{q}': score for i, scores in decoded.items() for q, score in enumerate(scores, start=1)}
+    else:
+        raw = item.get('answers')
+        if not isinstance(raw, dict):
+            return None, ["answers must be an object of question names or segment numbers"]
+        if raw and all(isinstance(value, list) for value in raw.values()):
+            raw = {f'seg{i}_q{q}': score for i, scores in raw.items() for q, score in enumerate(scores, start=1)}
+    answers, errors = batch_rules.validate_answers(raw)
+    if errors:
+        return None, errors
+    result = scoring_api_result(answers, length_of_sentence)
+    if length_of_sentence is None:
+        del result['probation']
+    return result, []
+
+@app.route('/api/score', methods=['GET', 'POST'])
+def score_api():
+    """
+    GET: the outcome of the assessment stored in the caller's session.
+    POST: score {"answers": ...}, or a batch as {"assessments": [...]},
+    where each assessment may carry an "id" that is echoed back. A batch
+    reports invalid assessments per item. Both probation periods are
+    returned; "probation", the one recorded in Sheets, is read against the
+    session's assessment for GET (as results() does) and against an
+    assessment's "length_of_sentence" for POST, and left out without one.
+    """
+    if not scoring_api_authorized():
+        return {'error': 'unauthorized'}, 401
+    response = {'scoring_tables_version': SCORING_TABLES_VERSION, 'mandatory_programs': mandatory_programs}
+
+    if request.method == 'GET':
+        answers = session_answers()
+        if any(i not in answers for i in ANSWER_LAYOUT):
+            return {'error': 'no completed assessment in this session'}, 404
+        response.update(scoring_api_result(answers))
+        metrics.SCORING_API_ASSESSMENTS.inc(outcome='scored')
+        return response
+
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return {'error': 'expected a JSON object'}, 400
+
+    if 'assessments' not in body:
+        result, errors = score_api_item(body)
+        if errors:
+            metrics.SCORING_API_ASSESSMENTS.inc(outcome='invalid')
+            return {'errors': errors}, 400
+        metrics.SCORING_API_ASSESSMENTS.inc(outcome='scored')
+        response.update(result)
+        return response
+
+    items = body['assessments']
+    if not isinstance(items, list):
+        return {'error': 'assessments must be a list'}, 400
+    if len(items) > app.config['SCORING_API_MAX_BATCH']:
+        return {'error': f"at most {app.config['SCORING_API_MAX_BATCH']} assessments per call"}, 413
+    results = []
+    invalid = 0
+    for item in items:
+        result, errors = score_api_item(item)
+        entry = {'id': item.get('id')} if isinstance(item, dict) and 'id' in item else {}
+        if errors:
+            invalid += 1
+            entry['errors'] = errors
+        else:
+            entry.update(result)
+        results.append(entry)
+    metrics.SCORING_API_ASSESSMENTS.inc(len(items) - invalid, outcome='scored')
+    metrics.SCORING_API_ASSESSMENTS.inc(invalid, outcome='invalid')
+    response['results'] = results
+    return response
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,164 @@
+"""
+Batch intake: many clients' answers at once, from the grid on /batch or a
+CSV upload.
+
+Each row is one client: the four fields of the index page followed by the
+answers to every question, in the question order of segment_questions
+(seg1_q1, seg1_q2, ... seg8_q5). Answers are the point values shown on the
+segment pages. A CSV may start with a header row of those column names, in
+which case columns are matched by name; without one they are read by
+position.
+
+Every row is checked against the values each question allows before any row
+is scored. A batch with an invalid row is refused as a whole, with the
+errors listed per row, so it is never half-submitted.
+"""
+
+import csv
+import io
+
+METADATA_FIELDS = ('client_name', 'length_of_sentence', 'officer_name', 'chief_name')
+
+# Values of the index page's Length of Sentence select, plus the two the
+# results page also recognises
+SENTENCE_LENGTHS = {
+    'less-than-1': "Less than 1 Year",
+    '1-year': "1 Year",
+    '2-years': "2 Years",
+    '3-years': "3 Years",
+    '4-years': "4 Years",
+    '5-years': "5 Years",
+    '6-years': "6 Years",
+    '2-years-or-less': "2 Years or Less",
+    'above-2-years': "Above 2 Years"
+}
+
+DEFAULT_MAX_ROWS = 200
+# Errors listed per row before the rest are summarised
+MAX_ERRORS_PER_ROW = 5
+
+
+class BatchError(ValueError):
+    """The batch as a whole can't be read (no rows, too many rows, unreadable CSV)"""
+
+
+class IntakeRow:
+    """One client of a batch: the index fields, the answers by segment, and any errors"""
+
+    def __init__(self, number, fields, answers, errors):
+        self.number = number
+        self.fields = fields
+        self.answers = answers
+        self.errors = errors
+
+    @property
+    def valid(self):
+        return not self.errors
+
+
+class BatchIntake:
+    """Reads and validates batch rows for a questionnaire"""
+
+    def __init__(self, allowed_values, max_rows=DEFAULT_MAX_ROWS):
+        """``allowed_values`` is {segment: [allowed scores of each question, in order]}"""
+        self.allowed_values = {
+            segment: [frozenset(values) for values in questions]
+            for segment, questions in sorted(allowed_values.items())
+        }
+        self.max_rows = max_rows
+        self.answer_columns = [
+            f'seg{segment}_q{q}'
+            for segment, questions in self.allowed_values.items()
+            for q in range(1, len(questions) + 1)
+        ]
+        self.columns = list(METADATA_FIELDS) + self.answer_columns
+
+    def rows_from_csv(self, text):
+        """Raw rows ({column: text}) from CSV text, with or without a header row"""
+        try:
+            records = [record for record in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in record)]
+        except csv.Error as e:
+            raise BatchError(f"The CSV file could not be read: {e}")
+        if not records:
+            raise BatchError("The CSV file has no rows.")
+
+        header = [cell.strip() for cell in records[0]]
+        if 'client_name' in header:
+            missing = [column for column in self.columns if column not in header]
+            if missing:
+                raise BatchError(f"The CSV header is missing {len(missing)} column(s): {', '.join(missing[:5])}")
+            positions = [header.index(column) for column in self.columns]
+            records = records[1:]
+        else:
+            positions = list(range(len(self.columns)))
+
+        width = max(positions) + 1
+        rows = []
+        for record in records:
+            if len(record) < width:
+                # Short rows are reported by validate() as missing answers
+                record = record + [''] * (width - len(record))
+            rows.append({column: record[position] for column, position in zip(self.columns, positions)})
+        self._check_size(rows)
+        return rows
+
+    def rows_from_form(self, form, row_count):
+        """Raw rows from the grid's row-<n>-<column> fields, skipping rows left blank"""
+        rows = []
+        for n in range(row_count):
+            row = {column: form.get(f'row-{n}-{column}', '') for column in self.columns}
+            if any(value.strip() for value in row.values()):
+                rows.append(row)
+        self._check_size(rows)
+        return rows
+
+    def _check_size(self, rows):
+        if not rows:
+            raise BatchError("Enter at least one client.")
+        if len(rows) > self.max_rows:
+            raise BatchError(f"A batch can have at most {self.max_rows} clients; this one has {len(rows)}.")
+
+    def validate(self, raw_rows):
+        """IntakeRow for every raw row, numbered from 1"""
+        return [self._validate_row(number, raw) for number, raw in enumerate(raw_rows, start=1)]
+
+    def validate_answers(self, raw):
+        """
+        ({segment: [scores]}, errors) from answers keyed by column name
+        (seg1_q1 ...), given as text or numbers; invalid answers score 0
+        """
+        errors = []
+        answers = {}
+        for segment, questions in self.allowed_values.items():
+            scores = []
+            for q, allowed in enumerate(questions, start=1):
+                column = f'seg{segment}_q{q}'
+                value = raw.get(column)
+                value = '' if value is None else str(value).strip()
+                try:
+                    score = int(value)
+                except ValueError:
+                    score = None
+                if score is None or score not in allowed:
+                    problem = "is missing" if not value else f"is {value!r}, expected one of {sorted(allowed)}"
+                    errors.append(f"{column} {problem}")
+                    score = 0
+                scores.append(score)
+            answers[segment] = scores
+        return answers, errors
+
+    def _validate_row(self, number, raw):
+        errors = []
+        fields = {field: (raw.get(field) or '').strip() for field in METADATA_FIELDS}
+        if not fields['client_name']:
+            errors.append("client name is missing")
+        if fields['length_of_sentence'] not in SENTENCE_LENGTHS:
+            errors.append(f"length of sentence {fields['length_of_sentence']!r} is not one of "
+                          f"{', '.join(SENTENCE_LENGTHS)}")
+
+        answers, answer_errors = self.validate_answers(raw)
+        errors += answer_errors
+
+        if len(errors) > MAX_ERRORS_PER_ROW:
+            errors = errors[:MAX_ERRORS_PER_ROW] + [f"and {len(errors) - MAX_ERRORS_PER_ROW} more"]
+        return IntakeRow(number, fields, answers, errors)
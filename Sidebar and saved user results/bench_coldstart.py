@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Measure time to first byte after a cold boot.
+
+Starts a fresh server process (gunicorn if installed, otherwise the Flask
+development server), polls GET /login until the first byte of a response
+arrives and reports the elapsed time from process start. Repeats the
+measurement several times and prints min/median/max.
+
+Usage:
+    python bench_coldstart.py --runs 5
+    python bench_coldstart.py --path /login --server flask
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(server, port):
+    if server == 'gunicorn':
+        return [sys.executable, '-m', 'gunicorn', '--workers', '1', '--bind', f'127.0.0.1:{port}', 'app:app']
+    return [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, debug=False)"]
+
+
+def first_byte(port, path):
+    """Send one request and return True once a response byte arrives"""
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=1) as s:
+            s.sendall(f"GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n".encode())
+            return bool(s.recv(1))
+    except OSError:
+        return False
+
+
+def measure(server, path, timeout):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        server_command(server, port),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with status {process.returncode}")
+            if first_byte(port, path):
+                return time.perf_counter() - start
+            time.sleep(0.005)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-boot time to first byte")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--path', default='/login')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--server', choices=['gunicorn', 'flask'], default=None,
+                        help="defaults to gunicorn when it is installed")
+    args = parser.parse_args()
+
+    server = args.server
+    if server is None:
+        try:
+            import gunicorn  # noqa: F401
+            server = 'gunicorn'
+        except ImportError:
+            server = 'flask'
+
+    timings = [measure(server, args.path, args.timeout) for _ in range(args.runs)]
+    print(f"{server} cold boot to first byte of GET {args.path} over {args.runs} runs: "
+          f"min {min(timings) * 1000:.0f} ms, median {statistics.median(timings) * 1000:.0f} ms, "
+          f"max {max(timings) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
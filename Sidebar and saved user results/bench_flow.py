@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+In-process load benchmark of the full assessment flow.
+
+Drives the app through the Flask test client, so no server needs to be
+running and no network access is required:
+1. Google login is stubbed by writing the OAuth session keys directly
+2. The Apps Script endpoint is stubbed with a fake response (optional delay),
+   or with --live-sheets really posted to GOOGLE_SCRIPT_URL - point that at
+   sheets_standin.py to include the HTTP round trip and injected faults
+3. Each simulated officer runs index POST, segments 1-8, results and the
+   PDF download, and many officers run concurrently in threads
+4. The app's log file, Sheets spool and idempotency keys go to a scratch
+   directory (--state-dir, or a temporary one removed afterwards), so a run
+   leaves app.log and instance/ untouched
+
+PDF admission, the Sheets rate and concurrency limits and submission
+idempotency are off unless asked for, so the timings are of the flow itself.
+Use --pdf-backend direct on a machine without WeasyPrint's native libraries.
+
+Usage:
+    python bench_flow.py --flows 200 --concurrency 16
+    python bench_flow.py --flows 50 --sheets-latency 0.2 --json
+    python bench_flow.py --pdf-backend direct
+    GOOGLE_SCRIPT_URL=http://127.0.0.1:8765/exec python bench_flow.py --live-sheets
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import app as app_module
+import idempotency
+import rate_limit
+import sheets_routing
+import sheets_spool
+
+TOKEN_PATTERN = re.compile(r'name="token" value="([^"]+)"')
+
+
+class FakeSheetsResponse:
+    status_code = 200
+    text = '{"result":"success"}'
+
+    def json(self):
+        return {"result": "success"}
+
+
+def make_sheets_stub(latency):
+    """Replacement for requests.post that never leaves the process"""
+    def fake_post(url, json=None, headers=None, timeout=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+        return FakeSheetsResponse()
+    return fake_post
+
+
+class NoIdempotency:
+    """IdempotencyStore stand-in that lets every submission through"""
+
+    def claim(self, key):
+        return True
+
+    def complete(self, key, outcome):
+        pass
+
+    def release(self, key):
+        pass
+
+    def outcome(self, key):
+        return None
+
+    def wait(self, key, timeout):
+        return None
+
+
+def isolate_state(directory, keep_idempotency):
+    """Point the app's log file, Sheets spool and idempotency keys into ``directory``"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.FileHandler):
+            root.removeHandler(handler)
+            handler.close()
+            scratch = logging.FileHandler(os.path.join(directory, 'app.log'))
+            scratch.setFormatter(handler.formatter)
+            root.addHandler(scratch)
+    app_module.submission_spool = sheets_spool.Spool(os.path.join(directory, 'sheets_spool'))
+    if keep_idempotency:
+        app_module.submissions = idempotency.IdempotencyStore(os.path.join(directory, 'submissions'))
+    else:
+        app_module.submissions = NoIdempotency()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+class Recorder:
+    """Thread-safe collection of per-step latencies and failures"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.failures = defaultdict(int)
+        # Per-thread flag so concurrent flows don't see each other's failures
+        self.local = threading.local()
+        self._lock = threading.Lock()
+
+    def timed(self, step, call, expected_status):
+        start = time.perf_counter()
+        response = call()
+        elapsed = time.perf_counter() - start
+        failed = response.status_code not in expected_status
+        with self._lock:
+            self.latencies[step].append(elapsed)
+            if failed:
+                self.failures[step] += 1
+        if failed:
+            self.local.failed = True
+        return response
+
+
+def login(client):
+    with client.session_transaction() as sess:
+        sess['google_token'] = {'access_token': 'bench-token', 'token_type': 'Bearer'}
+        sess['email'] = 'bench.officer@example.gov.ph'
+        sess['user'] = {'email': 'bench.officer@example.gov.ph', 'name': 'Bench Officer'}
+
+
+def random_answers(segment_id):
+    """Pick a valid answer value for every question in a segment"""
+    answers = []
+    for question_index in range(len(app_module.segment_questions[segment_id])):
+        options = app_module.segment_answers_data[segment_id][question_index]
+        answers.append(random.choice(options)['value'])
+    return answers
+
+
+def run_flow(recorder):
+    """Run one complete assessment and return True when every step succeeded"""
+    client = app_module.app.test_client()
+    login(client)
+
+    recorder.local.failed = False
+    response = recorder.timed('index POST', lambda: client.post('/', data={
+        'client_name': 'Bench Client',
+        'length_of_sentence': random.choice(['1-year', '2-years', '3-years']),
+        'officer_name': 'Bench Officer',
+        'chief_name': 'Bench Chief'
+    }), (302,))
+    location = response.headers.get('Location', '')
+
+    for segment_id in range(1, 9):
+        response = recorder.timed(f'segment {segment_id} GET', lambda: client.get(location), (200,))
+        match = TOKEN_PATTERN.search(response.get_data(as_text=True))
+        form = {'token': match.group(1) if match else ''}
+        for i, value in enumerate(random_answers(segment_id), start=1):
+            form[f'seg{segment_id}_q{i}'] = str(value)
+        response = recorder.timed(
+            f'segment {segment_id} POST',
+            lambda: client.post(f'/segment/{segment_id}', data=form),
+            (302,)
+        )
+        location = response.headers.get('Location', '')
+
+    recorder.timed('results GET', lambda: client.get(location), (200,))
+    recorder.timed('pdf download', lambda: client.get('/direct_pdf_download'), (200,))
+    return not recorder.local.failed
+
+
+def report(recorder, wall_time, flows, as_json=False):
+    steps = []
+    total_requests = 0
+    for step, values in recorder.latencies.items():
+        values = sorted(values)
+        total_requests += len(values)
+        steps.append({
+            'step': step,
+            'count': len(values),
+            'failures': recorder.failures.get(step, 0),
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'max_ms': values[-1] * 1000 if values else 0.0
+        })
+    summary = {
+        'flows': flows,
+        'wall_time_s': wall_time,
+        'flows_per_s': flows / wall_time if wall_time else 0.0,
+        'requests_per_s': total_requests / wall_time if wall_time else 0.0,
+        'steps': steps
+    }
+    if as_json:
+        print(json.dumps(summary, indent=2))
+        return summary
+
+    print(f"\n{flows} flows in {wall_time:.2f}s - "
+          f"{summary['flows_per_s']:.1f} flows/s, {summary['requests_per_s']:.1f} requests/s\n")
+    print(f"{'step':<20}{'count':>7}{'fail':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for row in steps:
+        print(f"{row['step']:<20}{row['count']:>7}{row['failures']:>6}"
+              f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['max_ms']:>10.2f}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load benchmark of the assessment flow")
+    parser.add_argument('--flows', type=int, default=100, help="number of complete assessments to run")
+    parser.add_argument('--concurrency', type=int, default=8, help="number of simulated officers at once")
+    parser.add_argument('--sheets-latency', type=float, default=0.0,
+                        help="seconds the stubbed Apps Script endpoint waits before answering")
+    parser.add_argument('--live-sheets', action='store_true',
+                        help="post to GOOGLE_SCRIPT_URL (e.g. sheets_standin.py) instead of stubbing the post")
+    parser.add_argument('--pdf-admission', action='store_true',
+                        help="keep the PDF admission limits (every simulated officer shares one login)")
+    parser.add_argument('--pdf-backend', choices=('weasyprint', 'direct'),
+                        default=app_module.app.config['PDF_BACKEND'],
+                        help="PDF backend for the download step (default: PDF_BACKEND)")
+    parser.add_argument('--sheets-limits', action='store_true',
+                        help="keep the Sheets rate and concurrency limits from SHEETS_ROUTES")
+    parser.add_argument('--idempotency', action='store_true',
+                        help="keep idempotent submission (keys are stored in the state directory)")
+    parser.add_argument('--state-dir', default=None,
+                        help="keep the app's log, spool and idempotency keys here instead of a temporary directory")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for reproducible answers")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    parser.add_argument('--verbose', action='store_true', help="keep the app's debug logging enabled")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    if not args.verbose:
+        # The app logs every request at DEBUG, which would dominate the timings
+        logging.disable(logging.WARNING)
+
+    if args.live_sheets:
+        if app_module.GOOGLE_SCRIPT_URL.startswith('https://script.google.com'):
+            parser.error("--live-sheets would post to the real sheet; set GOOGLE_SCRIPT_URL to the stand-in")
+    else:
+        requests.post = make_sheets_stub(args.sheets_latency)
+    app_module.app.config['TESTING'] = True
+    app_module.app.config['PDF_BACKEND'] = args.pdf_backend
+    if not args.sheets_limits:
+        app_module.sheets_router = sheets_routing.SheetsRouter.from_config(None, app_module.GOOGLE_SCRIPT_URL)
+    state_dir = args.state_dir or tempfile.mkdtemp(prefix='bench_flow_')
+    os.makedirs(state_dir, exist_ok=True)
+    isolate_state(state_dir, args.idempotency)
+    if not args.pdf_admission:
+        # All flows log in as the same officer, so the per-user PDF limit
+        # would reject most downloads and the benchmark would measure 429s
+        unlimited = float('inf')
+        app_module.pdf_admission = rate_limit.AdmissionController(
+            unlimited, unlimited, unlimited, unlimited, max_concurrent=args.concurrency + 1
+        )
+
+    try:
+        # Warm up template compilation so the first flows aren't outliers
+        run_flow(Recorder())
+
+        recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            outcomes = list(pool.map(lambda _: run_flow(recorder), range(args.flows)))
+        wall_time = time.perf_counter() - start
+    finally:
+        logging.shutdown()
+        if not args.state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+    report(recorder, wall_time, args.flows, as_json=args.json)
+    if not all(outcomes):
+        print(f"\n{outcomes.count(False)} flows had failing steps", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for scoring, template rendering and PDF generation.
+
+Each benchmark is timed over several rounds and the fastest per-call time is
+kept, which is the most stable figure on a shared machine. Results are
+compared with a stored baseline and the script exits with status 1 when any
+benchmark is more than --threshold percent slower, so it can gate a deploy.
+
+Usage:
+    python bench_micro.py --save-baseline          # record bench_baseline.json
+    python bench_micro.py                          # compare, fail on >25% regression
+    python bench_micro.py --threshold 10 --only pdf
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import answer_codec
+import app as app_module
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+# A representative completed assessment: medium risk, several programs triggered
+SAMPLE_SCORES = {
+    1: [1, 2, 0, 1, 1, 0],
+    2: [1, 1, 2],
+    3: [0, 2, 0, 2, 0],
+    4: [1, 0, 1, 1, 0, 1],
+    5: [1, 1, 0, 2, 1, 1],
+    6: [0, 1, 0, 1],
+    7: [1, 2, 0, 0, 1, 0, 1],
+    8: [0, 0, 1, 0, 0]
+}
+SAMPLE_SEGMENT0 = {
+    'email': 'bench.officer@example.gov.ph',
+    'client_name': 'Juan Dela Cruz',
+    'length_of_sentence': '2-years',
+    'officer_name': 'Maria Santos, Probation Officer II',
+    'chief_name': 'Jose Reyes, Chief Probation Officer'
+}
+
+BENCHMARKS = {}
+
+
+def benchmark(name, number=1000):
+    """Register a setup function that returns the callable to time"""
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+    return register
+
+
+def populate_session(sess):
+    sess['session_id'] = 'bench-session'
+    sess['email'] = SAMPLE_SEGMENT0['email']
+    sess['segment0'] = dict(SAMPLE_SEGMENT0)
+    sess['answers'] = answer_codec.encode(SAMPLE_SCORES, app_module.ANSWER_LAYOUT)
+
+
+def pdf_context():
+    """Template variables equivalent to what direct_pdf_download() builds"""
+    subtotals = {}
+    segment_answers = {}
+    segment_data = {}
+    for i in range(1, 9):
+        scores = SAMPLE_SCORES[i]
+        if i == 5:
+            subtotals[5] = sum(scores[:3])
+            subtotals[6] = sum(scores[3:])
+            segment_answers[5] = {'questions': app_module.segment_questions[5][:3], 'scores': scores[:3]}
+            segment_answers[6] = {'questions': app_module.segment_questions[5][3:], 'scores': scores[3:]}
+            segment_data[5] = app_module.segment_answers_data[5]
+            segment_data[6] = {k - 3: app_module.segment_answers_data[5][k] for k in range(3, 6)}
+        else:
+            key = i if i < 5 else i + 1
+            subtotals[key] = sum(scores)
+            segment_answers[key] = {'questions': app_module.segment_questions[i], 'scores': scores}
+            segment_data[key] = app_module.segment_answers_data[i]
+    total_score = sum(subtotals.values())
+    education_score, employment_score = app_module.calculate_split_scores(segment_answers)
+    return dict(
+        subtotals=subtotals,
+        total_score=total_score,
+        risk_assessment=app_module.assess_risk_level(total_score, SAMPLE_SEGMENT0['length_of_sentence']),
+        recommended_programs=['ICARE (CRIMINAL HISTORY)', 'LEAP (EDUCATION)'],
+        mandatory_programs=app_module.mandatory_programs,
+        segment_titles=app_module.segment_titles,
+        segment_answers=segment_answers,
+        segment_thresholds=app_module.segment_thresholds,
+        length_of_sentence=SAMPLE_SEGMENT0['length_of_sentence'],
+        client_name=SAMPLE_SEGMENT0['client_name'],
+        officer_name=SAMPLE_SEGMENT0['officer_name'],
+        chief_name=SAMPLE_SEGMENT0['chief_name'],
+        date='January 01, 2025',
+        segment_answers_data=segment_data,
+        education_score=education_score,
+        employment_score=employment_score,
+        session_id='bench-session'
+    )
+
+
+@benchmark('assess_risk_level', number=200000)
+def bench_assess_risk_level():
+    totals = list(range(0, 60, 3))
+    def run():
+        for total in totals:
+            app_module.assess_risk_level(total, '2-years-or-less')
+    return run
+
+
+@benchmark('calculate_split_scores', number=100000)
+def bench_calculate_split_scores():
+    answers = {5: {'scores': SAMPLE_SCORES[5]}}
+    return lambda: app_module.calculate_split_scores(answers)
+
+
+@benchmark('answer_codec round trip', number=20000)
+def bench_answer_codec():
+    layout = app_module.ANSWER_LAYOUT
+    return lambda: answer_codec.decode(answer_codec.encode(SAMPLE_SCORES, layout), layout)
+
+
+@benchmark('session cookie serialize', number=5000)
+def bench_session_cookie():
+    serializer = app_module.app.session_interface.get_signing_serializer(app_module.app)
+    sess = {}
+    populate_session(sess)
+    return lambda: serializer.dumps(sess)
+
+
+@benchmark('score_api_item', number=20000)
+def bench_score_api_item():
+    item = {'answers': {str(i): scores for i, scores in SAMPLE_SCORES.items()}}
+    return lambda: app_module.score_api_item(item)
+
+
+@benchmark('prepare_google_sheets_data', number=5000)
+def bench_prepare_google_sheets_data():
+    return app_module.prepare_google_sheets_data
+
+
+@benchmark('render results.html', number=300)
+def bench_render_results():
+    context = pdf_context()
+    return lambda: app_module.render_template(
+        'results.html',
+        subtotals=context['subtotals'],
+        total_score=context['total_score'],
+        risk_assessment=context['risk_assessment'],
+        recommended_programs=context['recommended_programs'],
+        mandatory_programs=context['mandatory_programs'],
+        segment_titles=context['segment_titles'],
+        segment_thresholds=context['segment_thresholds'],
+        risk_cutoffs=app_module.risk_cutoffs,
+        notes='Client was cooperative during the interview.'
+    )
+
+
+@benchmark('render segment.html', number=300)
+def bench_render_segment():
+    return lambda: app_module.render_template(
+        'segment.html',
+        segment_id=5,
+        title=app_module.segment_titles[5],
+        next_segment=6,
+        token='benchtoken01'
+    )
+
+
+@benchmark('render pdf_template.html', number=200)
+def bench_render_pdf_template():
+    context = pdf_context()
+    return lambda: app_module.render_template('pdf_template.html', **context)
+
+
+@benchmark('HTML.write_pdf', number=5)
+def bench_write_pdf():
+    from weasyprint import HTML
+    html = app_module.render_template('pdf_template.html', **pdf_context())
+    return lambda: HTML(string=html).write_pdf()
+
+
+@benchmark('pdf_direct.render_report', number=50)
+def bench_render_report_direct():
+    import pdf_direct
+    context = pdf_context()
+    return lambda: pdf_direct.render_report(context)
+
+
+def time_benchmark(run, number, rounds):
+    """Return the fastest mean time per call over several rounds"""
+    run()  # warm-up: template compilation, lazy imports
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def format_seconds(value):
+    if value >= 1:
+        return f"{value:.3f} s"
+    if value >= 1e-3:
+        return f"{value * 1e3:.3f} ms"
+    return f"{value * 1e6:.2f} us"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring, template and PDF micro-benchmarks")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=float(os.environ.get('BENCH_THRESHOLD', '25')),
+                        help="percent slowdown versus baseline that counts as a regression")
+    parser.add_argument('--rounds', type=int, default=5, help="timing rounds per benchmark")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiply iteration counts (e.g. 0.1 for a quick run)")
+    parser.add_argument('--only', action='append', default=[], help="run benchmarks whose name contains this text")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app_module.app.config['TESTING'] = True
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results', {})
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<30}{'per call':>14}{'baseline':>14}{'change':>10}")
+    for name, (setup, number) in BENCHMARKS.items():
+        if args.only and not any(text in name for text in args.only):
+            continue
+        # Every benchmark runs inside a request carrying the sample assessment
+        with app_module.app.test_request_context('/'):
+            populate_session(app_module.session)
+            try:
+                run = setup()
+            except (ImportError, OSError) as e:
+                # A missing optional backend, e.g. WeasyPrint itself or the pango it loads
+                print(f"{name:<30}{'skipped':>14}  ({e})")
+                continue
+            per_call = time_benchmark(run, max(1, int(number * args.scale)), args.rounds)
+        results[name] = per_call
+
+        previous = baseline.get(name)
+        if previous:
+            change = (per_call - previous) / previous * 100
+            marker = '  REGRESSION' if change > args.threshold else ''
+            if marker:
+                regressions.append((name, change))
+            print(f"{name:<30}{format_seconds(per_call):>14}{format_seconds(previous):>14}{change:>+9.1f}%{marker}")
+        else:
+            print(f"{name:<30}{format_seconds(per_call):>14}{'-':>14}{'-':>10}")
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        merged.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': sys.version.split()[0],
+                'results': merged
+            }, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:g}%:")
+        for name, change in regressions:
+            print(f"  {name}: {change:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
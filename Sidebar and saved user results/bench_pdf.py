@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Side-by-side benchmark of the PDF backends for the risk report.
+
+Renders the same sample assessment with WeasyPrint (render pdf_template.html,
+then HTML.write_pdf) and with the direct backend in pdf_direct.py, and
+reports wall time, CPU time, peak Python memory (tracemalloc) and output size
+for each. Backends whose libraries are missing are reported as skipped.
+
+Usage:
+    python bench_pdf.py
+    python bench_pdf.py --runs 50 --backend direct
+"""
+
+import argparse
+import logging
+import statistics
+import time
+import tracemalloc
+
+import app as app_module
+import pdf_direct
+from bench_micro import populate_session, SAMPLE_SEGMENT0
+
+
+def weasyprint_backend(context):
+    from weasyprint import HTML
+    html = app_module.render_template('pdf_template.html', **context)
+    return HTML(string=html).write_pdf()
+
+
+BACKENDS = {
+    'weasyprint': weasyprint_backend,
+    'direct': pdf_direct.render_report,
+}
+
+
+def measure(render, context, runs):
+    """Return per-run wall and CPU times, peak traced memory and output size"""
+    pdf = render(context)  # warm-up: imports, font loading, template compilation
+    walls, cpus = [], []
+    for _ in range(runs):
+        wall, cpu = time.perf_counter(), time.process_time()
+        render(context)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    # Tracing slows everything down, so peak memory gets its own run
+    tracemalloc.start()
+    render(context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return walls, cpus, peak, len(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WeasyPrint vs direct PDF backend")
+    parser.add_argument('--runs', type=int, default=20, help="timed renders per backend")
+    parser.add_argument('--backend', action='append', choices=list(BACKENDS), default=[],
+                        help="only run this backend (repeatable)")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    app_module.app.config['TESTING'] = True
+
+    with app_module.app.test_request_context('/'):
+        populate_session(app_module.session)
+        app_module.session['notes'] = 'Client was cooperative during the interview.'
+        context = app_module.build_pdf_context(
+            SAMPLE_SEGMENT0['length_of_sentence'], SAMPLE_SEGMENT0['client_name'],
+            SAMPLE_SEGMENT0['officer_name'], SAMPLE_SEGMENT0['chief_name']
+        )
+
+        print(f"{'backend':<12}{'wall p50':>12}{'wall max':>12}{'cpu p50':>12}{'peak mem':>12}{'size':>10}")
+        results = {}
+        for name in args.backend or list(BACKENDS):
+            try:
+                walls, cpus, peak, size = measure(BACKENDS[name], context, args.runs)
+            except (ImportError, OSError) as e:
+                # WeasyPrint raises OSError when Pango/Cairo are not installed
+                print(f"{name:<12}{'skipped':>12}  ({str(e).splitlines()[0]})")
+                continue
+            results[name] = statistics.median(cpus)
+            print(f"{name:<12}{statistics.median(walls) * 1e3:>10.2f}ms{max(walls) * 1e3:>10.2f}ms"
+                  f"{statistics.median(cpus) * 1e3:>10.2f}ms{peak / 1024:>9.0f}KB{size / 1024:>8.1f}KB")
+
+    if len(results) == 2 and results['direct'] > 0:
+        print(f"\ndirect backend uses {results['weasyprint'] / results['direct']:.0f}x less CPU per report")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Circuit breaker and latency window for calls to a remote dependency.
+
+closed     calls go through; ``failure_threshold`` failures in a row open it
+open       calls fail fast for ``reset_timeout`` seconds
+half-open  up to ``half_open_probes`` calls go through as probes; a success
+           closes the breaker, a failure opens it again
+
+Callers ask ``allow()`` before the call and report the result with
+``record_success()``, ``record_failure()`` or, if the call never happened,
+``record_skipped()``.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_WINDOW = 500
+
+
+class CircuitOpen(Exception):
+    """The breaker is open; the call was not attempted"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"circuit for {name!r} is open, next probe in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 half_open_probes=1, on_state_change=None):
+        self.name = name
+        self.failure_threshold = int(failure_threshold)
+        self.reset_timeout = float(reset_timeout)
+        self.half_open_probes = int(half_open_probes)
+        self.on_state_change = on_state_change
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.last_failure = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        # Called with the lock held
+        if state == self.state:
+            return None
+        previous, self.state = self.state, state
+        return previous
+
+    def _notify(self, previous):
+        if previous is not None and self.on_state_change:
+            self.on_state_change(self, previous, self.state)
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        """Whether a call may go ahead now; raises nothing, see check()"""
+        previous = None
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                previous = self._set_state(HALF_OPEN)
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    allowed = False
+                else:
+                    self._probes += 1
+                    allowed = True
+            else:
+                allowed = True
+        self._notify(previous)
+        return allowed
+
+    def check(self):
+        """Like allow(), but raises CircuitOpen instead of returning False"""
+        if not self.allow():
+            raise CircuitOpen(self.name, self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            previous = self._set_state(CLOSED)
+        self._notify(previous)
+
+    def record_failure(self, reason=None):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_failure = reason
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._probes = 0
+                previous = self._set_state(OPEN)
+            else:
+                previous = None
+        self._notify(previous)
+
+    def record_skipped(self):
+        """The allowed call never reached the dependency; free its probe slot"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+
+    def snapshot(self):
+        with self._lock:
+            retry_after = 0.0
+            if self.state == OPEN:
+                retry_after = max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'last_failure': self.last_failure,
+                'next_probe_in': round(retry_after, 1)
+            }
+
+
+class LatencyWindow:
+    """The most recent call durations, for percentiles on the status page"""
+
+    def __init__(self, size=DEFAULT_WINDOW):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentiles(self, points=(50, 90, 99)):
+        """Nearest-rank percentiles in milliseconds, plus the sample count"""
+        with self._lock:
+            samples = sorted(self._samples)
+        result = {'count': len(samples)}
+        for point in points:
+            if samples:
+                rank = max(1, -(-point * len(samples) // 100))
+                result[f'p{point}_ms'] = round(samples[rank - 1] * 1000, 1)
+            else:
+                result[f'p{point}_ms'] = None
+        return result
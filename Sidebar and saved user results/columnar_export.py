@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Columnar export of completed assessments for analytics.
+
+Converts a Google Sheets CSV export (the columns prepare_google_sheets_data()
+writes) into an Arrow dataset: a directory of part files that pyarrow,
+DuckDB, Polars or pandas scan directly. Parts are Arrow IPC files written
+uncompressed so readers can memory-map them, or Parquet with --format
+parquet for smaller files.
+
+Each append writes one new part holding only the rows newer than the last
+export. The newest Timestamp exported so far is kept in _export.json, so
+refreshing after the sheet grows only converts the new rows. "compact"
+merges the parts into one when many small appends have piled up.
+
+Columns:
+    timestamp, email, client_name, length_of_sentence, officer_name,
+    chief_name                             segment0 metadata
+    seg1_q1 ... seg8_q5                    int8 answer score per question
+    segment1_total ... segment8_total,
+    education_total, employment_total,
+    total_score                            int16 subtotals
+    risk_level, probation_period,
+    supervision_intensity                  strings (Parquet dictionary-encodes them)
+
+Requires pyarrow (pip install pyarrow); the web app itself does not.
+
+Usage:
+    python columnar_export.py append export.csv --dataset analytics/assessments
+    python columnar_export.py scan analytics/assessments
+    python columnar_export.py compact analytics/assessments
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import app as app_module
+
+STATE_FILE = '_export.json'
+EXTENSIONS = {'ipc': '.arrow', 'parquet': '.parquet'}
+
+RESULT_COLUMNS = {
+    "Risk Level": 'risk_level',
+    "Probation Period": 'probation_period',
+    "Supervision Intensity": 'supervision_intensity'
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+        import pyarrow.dataset
+        import pyarrow.fs
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        sys.exit("columnar_export.py needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def question_columns():
+    """(sheet column, export column) for every question in segment order"""
+    return [
+        (column, f'seg{i}_q{q}')
+        for i, columns in app_module.SHEETS_ANSWER_COLUMNS.items()
+        for q, column in enumerate(columns, start=1)
+    ]
+
+
+def schema(pa):
+    fields = [pa.field('timestamp', pa.timestamp('s'))]
+    fields += [pa.field(key, pa.string()) for key in app_module.SHEETS_METADATA_COLUMNS]
+    fields += [pa.field(name, pa.int8()) for _, name in question_columns()]
+    fields += [pa.field(f'segment{i}_total', pa.int16()) for i in app_module.SHEETS_ANSWER_COLUMNS]
+    fields += [pa.field(name, pa.int16()) for name in ('education_total', 'employment_total', 'total_score')]
+    fields += [pa.field(name, pa.string()) for name in RESULT_COLUMNS.values()]
+    return pa.schema(fields)
+
+
+def convert_batch(pa, batch, target):
+    """Turn one batch of sheet rows into the export schema"""
+    pc = pa.compute
+    columns = {'timestamp': batch.column('Timestamp')}
+    for key, column in app_module.SHEETS_METADATA_COLUMNS.items():
+        columns[key] = batch.column(column)
+    for column, name in question_columns():
+        # Blank answers are sent to the sheet as '0'
+        columns[name] = pc.fill_null(batch.column(column), 0).cast(pa.int8())
+
+    def total(names):
+        result = pa.array([0] * batch.num_rows, pa.int16())
+        for name in names:
+            result = pc.add(result, columns[name].cast(pa.int16()))
+        return result
+
+    for i, sheet_columns in app_module.SHEETS_ANSWER_COLUMNS.items():
+        columns[f'segment{i}_total'] = total(f'seg{i}_q{q}' for q in range(1, len(sheet_columns) + 1))
+    # Same education/employment split as compute_subtotals()
+    split = app_module.segment_thresholds[5]
+    columns['education_total'] = total(f'seg5_q{q + 1}' for q in split['education']['questions'])
+    columns['employment_total'] = total(f'seg5_q{q + 1}' for q in split['employment']['questions'])
+    columns['total_score'] = total(f'segment{i}_total' for i in app_module.SHEETS_ANSWER_COLUMNS)
+    for column, name in RESULT_COLUMNS.items():
+        columns[name] = batch.column(column)
+    return pa.record_batch([columns[field.name] for field in target], schema=target)
+
+
+def read_state(directory):
+    try:
+        with open(os.path.join(directory, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def part_files(directory, fmt):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith('part-') and name.endswith(EXTENSIONS[fmt])
+    )
+
+
+class PartWriter:
+    """Writes record batches to a new part file, visible only once closed"""
+
+    def __init__(self, pa, directory, fmt, target):
+        name = f"part-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}{EXTENSIONS[fmt]}"
+        self.path = os.path.join(directory, name)
+        self._tmp_path = os.path.join(directory, f".{name}.tmp")
+        self.rows = 0
+        if fmt == 'parquet':
+            self._writer = pa.parquet.ParquetWriter(self._tmp_path, target, compression='zstd')
+        else:
+            # Uncompressed so the file can be memory-mapped and read in place
+            self._writer = pa.ipc.new_file(self._tmp_path, target)
+
+    def write(self, batch):
+        if batch.num_rows:
+            self._writer.write_batch(batch)
+            self.rows += batch.num_rows
+
+    def close(self, discard=False):
+        self._writer.close()
+        if self.rows and not discard:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.remove(self._tmp_path)
+
+
+def open_dataset(pa, directory, fmt=None):
+    """Dataset over every part, memory-mapped when reading Arrow IPC"""
+    fmt = fmt or read_state(directory).get('format', 'ipc')
+    filesystem = pa.fs.LocalFileSystem(use_mmap=True)
+    return pa.dataset.dataset(part_files(directory, fmt), format=fmt, filesystem=filesystem)
+
+
+def append(args):
+    pa = _pyarrow()
+    os.makedirs(args.dataset, exist_ok=True)
+    state = read_state(args.dataset)
+    fmt = state.get('format') or args.format or 'ipc'
+    if args.format and args.format != fmt:
+        sys.exit(f"{args.dataset} holds {fmt} parts; append with --format {fmt}")
+    watermark = datetime.fromisoformat(state['watermark']) if state.get('watermark') else None
+    target = schema(pa)
+
+    convert = pa.csv.ConvertOptions(
+        column_types={
+            'Timestamp': pa.timestamp('s'),
+            **{column: pa.int8() for column, _ in question_columns()},
+            **{column: pa.string() for column in app_module.SHEETS_METADATA_COLUMNS.values()},
+            **{column: pa.string() for column in RESULT_COLUMNS}
+        },
+        include_columns=(['Timestamp'] + list(app_module.SHEETS_METADATA_COLUMNS.values()) +
+                         [column for column, _ in question_columns()] + list(RESULT_COLUMNS)),
+        timestamp_parsers=[pa.csv.ISO8601, '%m/%d/%Y %H:%M:%S'],
+        strings_can_be_null=False
+    )
+    start = time.perf_counter()
+    reader = pa.csv.open_csv(args.input, read_options=pa.csv.ReadOptions(block_size=args.block_size << 20),
+                             convert_options=convert)
+    writer = PartWriter(pa, args.dataset, fmt, target)
+    newest = None
+    skipped = 0
+    try:
+        for batch in reader:
+            batch = convert_batch(pa, batch, target)
+            if watermark is not None:
+                # Only rows the previous export did not include
+                newer = pa.compute.greater(batch.column('timestamp'), pa.scalar(watermark, pa.timestamp('s')))
+                keep = pa.compute.fill_null(newer, False)
+                before = batch.num_rows
+                batch = batch.filter(keep)
+                skipped += before - batch.num_rows
+            writer.write(batch)
+            batch_max = pa.compute.max(batch.column('timestamp')).as_py() if batch.num_rows else None
+            if batch_max is not None and (newest is None or batch_max > newest):
+                newest = batch_max
+    except BaseException:
+        writer.close(discard=True)
+        raise
+    writer.close()
+
+    if writer.rows:
+        state.update({
+            'format': fmt,
+            'watermark': (newest or watermark).isoformat(sep=' ') if (newest or watermark) else None,
+            'rows': state.get('rows', 0) + writer.rows
+        })
+        write_state(args.dataset, state)
+    print(f"appended {writer.rows} rows ({skipped} already exported) in {time.perf_counter() - start:.1f}s"
+          + (f" -> {writer.path}" if writer.rows else ""), file=sys.stderr)
+
+
+def scan(args):
+    pa = _pyarrow()
+    start = time.perf_counter()
+    dataset = open_dataset(pa, args.dataset)
+    table = dataset.to_table(columns=['risk_level', 'total_score'] +
+                             [f'segment{i}_total' for i in app_module.SHEETS_ANSWER_COLUMNS])
+    by_level = table.group_by('risk_level').aggregate([('total_score', 'count'), ('total_score', 'mean')])
+    elapsed = time.perf_counter() - start
+    print(f"{table.num_rows} assessments in {len(dataset.files)} part(s), scanned in {elapsed:.2f}s")
+    for row in sorted(by_level.to_pylist(), key=lambda r: str(r['risk_level'])):
+        print(f"  {str(row['risk_level']):<28}{row['total_score_count']:>10}  mean total {row['total_score_mean']:.1f}")
+    for i in app_module.SHEETS_ANSWER_COLUMNS:
+        mean = pa.compute.mean(table.column(f'segment{i}_total')).as_py()
+        print(f"  segment {i} mean subtotal {mean:.2f}")
+
+
+def compact(args):
+    pa = _pyarrow()
+    state = read_state(args.dataset)
+    fmt = state.get('format', 'ipc')
+    parts = part_files(args.dataset, fmt)
+    if len(parts) < 2:
+        print("nothing to compact", file=sys.stderr)
+        return
+    dataset = open_dataset(pa, args.dataset, fmt)
+    writer = PartWriter(pa, args.dataset, fmt, dataset.schema)
+    try:
+        for batch in dataset.to_batches():
+            writer.write(batch)
+    except BaseException:
+        writer.close(discard=True)
+        raise
+    writer.close()
+    for path in parts:
+        os.remove(path)
+    print(f"compacted {len(parts)} parts ({writer.rows} rows) into {writer.path}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Columnar analytics export of completed assessments")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    append_parser = commands.add_parser('append', help="append new rows from a Google Sheets CSV export")
+    append_parser.add_argument('input', help="CSV export")
+    append_parser.add_argument('--dataset', default='analytics/assessments', help="dataset directory")
+    append_parser.add_argument('--format', choices=list(EXTENSIONS), default=None,
+                               help="part file format for a new dataset (default ipc)")
+    append_parser.add_argument('--block-size', type=int, default=16, help="CSV read block size in MB")
+
+    scan_parser = commands.add_parser('scan', help="memory-map the dataset and summarise it")
+    scan_parser.add_argument('dataset')
+
+    compact_parser = commands.add_parser('compact', help="merge all parts into one")
+    compact_parser.add_argument('dataset')
+
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    if args.command == 'append':
+        append(args)
+    elif args.command == 'scan':
+        scan(args)
+    else:
+        compact(args)
+
+
+if __name__ == "__main__":
+    main()
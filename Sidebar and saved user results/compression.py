@@ -0,0 +1,138 @@
+"""
+Negotiated gzip/brotli compression of dynamic responses.
+
+Rendered pages and JSON responses are compressed in an after_request hook
+when the client accepts it. Brotli is used when the Brotli package is
+installed and the client prefers it, gzip otherwise. Skipped:
+
+- bodies under COMPRESS_MIN_SIZE bytes, where the headers cost more than
+  compression saves
+- types outside COMPRESSIBLE_TYPES, which includes PDFs: they are already
+  Flate-compressed and the download handlers expect the exact bytes
+- file and streamed responses, which are sent straight from their source
+
+Compression runs in chunks and stops once it has used COMPRESS_CPU_BUDGET_MS
+of CPU time; the response then goes out uncompressed, so an unusually large
+page can't tie up a worker.
+
+A compressed response gets its ETag suffixed with the encoding (as Apache
+does), so a cached gzip body is never confused with the identity one.
+"""
+
+import logging
+import time
+import zlib
+
+from flask import request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv',
+    'application/json', 'application/javascript', 'text/javascript'
+}
+ETAG_SUFFIXES = {'br': '-br', 'gzip': '-gzip'}
+CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class _BudgetExceeded(Exception):
+    pass
+
+
+def negotiate(accept_encodings, brotli_available=None):
+    """Pick 'br' or 'gzip' from the request's Accept-Encoding, or None for identity"""
+    if brotli_available is None:
+        brotli_available = brotli is not None
+    candidates = []
+    if brotli_available and accept_encodings.quality('br') > 0:
+        candidates.append((accept_encodings.quality('br'), 1, 'br'))
+    if accept_encodings.quality('gzip') > 0:
+        candidates.append((accept_encodings.quality('gzip'), 0, 'gzip'))
+    if not candidates:
+        return None
+    # Highest q wins; brotli on a tie since it compresses HTML noticeably better
+    return max(candidates)[2]
+
+
+def _compressor(encoding, config):
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_LEVEL'], mode=brotli.MODE_TEXT)
+        return compressor.process, compressor.finish
+    # wbits 31 writes the gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(config['COMPRESS_GZIP_LEVEL'], zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def compress(data, encoding, config):
+    """Compress in chunks; raise _BudgetExceeded once the CPU budget is spent"""
+    budget = config['COMPRESS_CPU_BUDGET_MS'] / 1000
+    started = time.thread_time()
+    process, finish = _compressor(encoding, config)
+    parts = []
+    for offset in range(0, len(data), CHUNK_SIZE):
+        parts.append(process(data[offset:offset + CHUNK_SIZE]))
+        if time.thread_time() - started > budget:
+            raise _BudgetExceeded()
+    parts.append(finish())
+    return b''.join(parts)
+
+
+def etag_variants(etag):
+    """The ETag as sent for each content coding, identity first"""
+    return [etag] + [etag + suffix for suffix in ETAG_SUFFIXES.values()]
+
+
+def init_app(app):
+    """Compress responses after every request, as configured by the COMPRESS_* settings"""
+    @app.after_request
+    def compress_response(response):
+        if response.status_code == 304:
+            # Echo the variant the client holds so the 304 matches its cache entry
+            etag, _ = response.get_etag()
+            if etag:
+                for tag in etag_variants(etag)[1:]:
+                    if tag in request.if_none_match:
+                        response.set_etag(tag)
+                        break
+            return response
+
+        if (response.status_code < 200 or response.status_code >= 300
+                or response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < app.config['COMPRESS_MIN_SIZE']:
+            return response
+
+        try:
+            compressed = compress(data, encoding, app.config)
+        except _BudgetExceeded:
+            metrics.RESPONSE_COMPRESSION.inc(encoding=encoding, outcome='cpu_budget')
+            logger.warning(f"Compression of {request.endpoint} ({len(data)} bytes) exceeded the CPU budget")
+            return response
+        if len(compressed) >= len(data):
+            metrics.RESPONSE_COMPRESSION.inc(encoding=encoding, outcome='no_gain')
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(etag + ETAG_SUFFIXES[encoding], weak)
+        metrics.RESPONSE_COMPRESSION.inc(encoding=encoding, outcome='compressed')
+        metrics.RESPONSE_COMPRESSION_SAVED_BYTES.inc(len(data) - len(compressed), encoding=encoding)
+        return response
+
@@ -0,0 +1,92 @@
+"""
+Shared setup for the pytest suite.
+
+app.py logs to app.log in the working directory and keeps idempotency keys,
+the Sheets spool and the Jinja bytecode cache under instance/, so the app is
+imported from a scratch directory with its state pointed there. The Apps
+Script post is never made: tests that reach submit_to_sheets replace it.
+"""
+
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRATCH_DIR = tempfile.mkdtemp(prefix='risk_assessment_tests_')
+
+sys.path.insert(0, APP_DIR)
+for name, default in (('SUBMISSION_KEYS_DIR', 'submissions'), ('SHEETS_SPOOL_DIR', 'sheets_spool'),
+                      ('JINJA_BYTECODE_CACHE_DIR', 'jinja_cache'),
+                      ('OAUTH_CACHE_PATH', 'google_openid_cache.json')):
+    os.environ.setdefault(name, os.path.join(SCRATCH_DIR, default))
+
+_cwd = os.getcwd()
+os.chdir(SCRATCH_DIR)
+try:
+    import app as app_module
+    import sheets_spool
+finally:
+    os.chdir(_cwd)
+
+app_module.app.config['TESTING'] = True
+
+OFFICER_EMAIL = 'officer@example.gov.ph'
+
+
+@pytest.fixture
+def client():
+    """Test client logged in as an officer"""
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['google_token'] = {'access_token': 'test-token', 'token_type': 'Bearer'}
+        sess['email'] = OFFICER_EMAIL
+        sess['user'] = {'email': OFFICER_EMAIL}
+    return client
+
+
+@pytest.fixture
+def sheets_posts(monkeypatch):
+    """Record Sheets submissions instead of posting them; every post is 'sent'"""
+    posts = []
+
+    def fake_submit(ordered_data, email):
+        posts.append(ordered_data)
+        return 'sent'
+
+    monkeypatch.setattr(app_module, 'submit_to_sheets', fake_submit)
+    return posts
+
+
+@pytest.fixture
+def spool(tmp_path, monkeypatch):
+    """An empty Sheets spool of the test's own; the background replay is left for the test to run"""
+    spool = sheets_spool.Spool(str(tmp_path / 'sheets_spool'))
+    monkeypatch.setattr(app_module, 'submission_spool', spool)
+    monkeypatch.setattr(app_module, 'replay_sheets_spool_in_background', lambda: None)
+    return spool
+
+
+class SheetsEndpoint:
+    """Stands in for post_to_sheets: records posts and answers each with the next of ``statuses``"""
+
+    def __init__(self):
+        self.posts = []
+        # HTTP status codes, or exceptions to raise; 200 once they run out
+        self.statuses = []
+
+    def post(self, ordered_data, email):
+        self.posts.append(ordered_data)
+        status = self.statuses.pop(0) if self.statuses else 200
+        if isinstance(status, Exception):
+            raise status
+        return types.SimpleNamespace(status_code=status)
+
+
+@pytest.fixture
+def sheets_endpoint(monkeypatch):
+    endpoint = SheetsEndpoint()
+    monkeypatch.setattr(app_module, 'post_to_sheets', endpoint.post)
+    return endpoint
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn app:app`.
+
+SERVING_MODE selects the worker profile:
+- sync:   one request per worker at a time (the previous behaviour)
+- gevent: green-thread workers; the Sheets POST, the Google token exchange
+          and other socket I/O yield to other requests while they wait, and
+          PDF rendering runs on the hub's OS thread pool
+- gthread: a fixed pool of OS threads per worker
+
+Bind address and worker count keep gunicorn's defaults ($PORT and
+$WEB_CONCURRENCY are honoured as usual).
+"""
+
+import os
+
+serving_mode = os.environ.get('SERVING_MODE', 'sync')
+
+if serving_mode == 'gevent':
+    worker_class = 'gevent'
+    # Concurrent requests per worker - each waiting officer costs one greenlet
+    worker_connections = int(os.environ.get('WORKER_CONNECTIONS', '500'))
+elif serving_mode == 'gthread':
+    worker_class = 'gthread'
+    threads = int(os.environ.get('GUNICORN_THREADS', '8'))
+else:
+    worker_class = 'sync'
@@ -0,0 +1,128 @@
+"""
+Idempotency keys for submissions that must happen once.
+
+The session lives in a signed cookie, so a double-click's second request
+carries the session from before the first one finished and can't tell a
+submission is already under way. Claims are therefore kept on disk, which
+every gunicorn worker on the host shares:
+
+    <key>.claim   created exclusively by the request that does the work
+    <key>.json    the outcome, written when that request finishes
+
+A repeat request for the same key waits for the outcome instead of
+repeating the work, or gets it at once if the first request has finished.
+Entries are removed after ``ttl`` seconds; a claim whose owner died without
+recording an outcome can be taken over after ``stale_after`` seconds.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+DEFAULT_TTL = 60 * 60
+DEFAULT_STALE_AFTER = 60
+POLL_INTERVAL = 0.1
+# Purge expired entries at most this often
+PURGE_INTERVAL = 5 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyStore:
+    """Claims and outcomes for idempotency keys, one pair of files per key"""
+
+    def __init__(self, directory, ttl=DEFAULT_TTL, stale_after=DEFAULT_STALE_AFTER):
+        self.directory = directory
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._last_purge = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key, suffix):
+        # Keys are hex digests, so they are safe as file names
+        return os.path.join(self.directory, key + suffix)
+
+    def claim(self, key):
+        """True if the caller now owns the key and must do the work, False if someone else does"""
+        self._maybe_purge()
+        path = self._path(key, '.claim')
+        for _ in range(2):
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.outcome(key) is not None or not self._is_stale(path):
+                    return False
+                # The owner died before finishing; take the key over
+                logger.warning(f"Taking over stale idempotency claim {key}")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            os.close(fd)
+            return True
+        return False
+
+    def _is_stale(self, path):
+        try:
+            return time.time() - os.path.getmtime(path) > self.stale_after
+        except FileNotFoundError:
+            return True
+
+    def complete(self, key, outcome):
+        """Record the outcome for repeat requests"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.outcome-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(outcome, f)
+            os.replace(tmp_path, self._path(key, '.json'))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def release(self, key):
+        """Give up a claim without an outcome, so a retry does the work again"""
+        try:
+            os.remove(self._path(key, '.claim'))
+        except FileNotFoundError:
+            pass
+
+    def outcome(self, key):
+        try:
+            with open(self._path(key, '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def wait(self, key, timeout):
+        """Outcome recorded by the owner, waiting up to ``timeout`` seconds; None if it never came"""
+        deadline = time.monotonic() + timeout
+        while True:
+            outcome = self.outcome(key)
+            if outcome is not None or time.monotonic() >= deadline:
+                return outcome
+            if not os.path.exists(self._path(key, '.claim')):
+                # The owner gave up without an outcome
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def _maybe_purge(self):
+        now = time.time()
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            os.makedirs(self.directory, exist_ok=True)
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,302 @@
+"""
+In-process request and dependency metrics exposed in Prometheus text format.
+
+Each gunicorn worker keeps its own registry, so a scrape reports the worker
+that answered it. Metric values are plain Python numbers guarded by a lock;
+recording an observation costs a few microseconds.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds - the Sheets POST times out at 15s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0, 30.0)
+
+# Byte-size buckets for the session cookie (browsers cap cookies at 4096 bytes)
+SIZE_BUCKETS = (256, 512, 1024, 1536, 2048, 2560, 3072, 3584, 4096)
+
+
+def _format_labels(labelnames, values, extra=None):
+    """Render a Prometheus label set such as {route="segment",status="200"}"""
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        return []
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # key -> [bucket counts..., sum, count]
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the wrapped block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._values.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together on /metrics"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Content type expected by Prometheus for the text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'http_request_duration_seconds',
+    'Time spent handling a request, by Flask endpoint',
+    ('route', 'method', 'status')
+)
+PDF_RENDER_SECONDS = REGISTRY.histogram(
+    'pdf_render_duration_seconds',
+    'Time spent producing a PDF, by route and PDF backend',
+    ('route', 'backend')
+)
+SHEETS_POST_SECONDS = REGISTRY.histogram(
+    'sheets_post_duration_seconds',
+    'Time spent posting a completed assessment to the Apps Script endpoint, by office',
+    ('office', 'outcome')
+)
+ASSESSMENT_SUBMISSIONS = REGISTRY.counter(
+    'assessment_submissions_total',
+    'Final segment submissions: posted to Sheets, not recorded (failed), or repeats answered from the first submission',
+    ('outcome',)
+)
+SHEETS_THROTTLED = REGISTRY.counter(
+    'sheets_post_throttled_total',
+    'Submissions not posted because an office endpoint was at its rate or concurrency limit or its circuit was open',
+    ('office', 'reason')
+)
+SHEETS_CIRCUIT_STATE = REGISTRY.gauge(
+    'sheets_circuit_state',
+    'Circuit breaker state per office endpoint: 0 closed, 1 half-open, 2 open',
+    ('office',)
+)
+SHEETS_SPOOLED = REGISTRY.counter(
+    'sheets_spooled_total',
+    'Submissions written to the local spool instead of being posted, by office',
+    ('office',)
+)
+SHEETS_DEAD_LETTERED = REGISTRY.counter(
+    'sheets_dead_lettered_total',
+    'Spooled submissions the endpoint rejected on replay, moved to the dead-letter file, by office',
+    ('office',)
+)
+SHEETS_IN_FLIGHT = REGISTRY.gauge(
+    'sheets_post_in_flight',
+    'Posts currently in progress, by office endpoint',
+    ('office',)
+)
+PDF_ADMISSION = REGISTRY.counter(
+    'pdf_admission_total',
+    'PDF requests admitted or rejected by admission control, by route and outcome',
+    ('route', 'outcome')
+)
+PDF_RENDERS_IN_FLIGHT = REGISTRY.gauge(
+    'pdf_renders_in_flight',
+    'PDF requests currently admitted and rendering'
+)
+OAUTH_EXCHANGE_SECONDS = REGISTRY.histogram(
+    'oauth_exchange_duration_seconds',
+    'Time spent on the Google token exchange and userinfo lookup',
+    ('step',)
+)
+RESPONSE_COMPRESSION = REGISTRY.counter(
+    'response_compression_total',
+    'Responses considered for compression, by encoding and outcome',
+    ('encoding', 'outcome')
+)
+RESPONSE_COMPRESSION_SAVED_BYTES = REGISTRY.counter(
+    'response_compression_saved_bytes_total',
+    'Bytes saved by compressing responses, by encoding',
+    ('encoding',)
+)
+LOGIN_PROFILE_SOURCE = REGISTRY.counter(
+    'login_profile_source_total',
+    'Logins by where the email and profile came from: the verified ID token or the userinfo endpoint',
+    ('source',)
+)
+TEMPLATE_RENDER_SECONDS = REGISTRY.histogram(
+    'template_render_duration_seconds',
+    'Time spent in render_template(), by template',
+    ('template',)
+)
+SESSION_COOKIE_BYTES = REGISTRY.histogram(
+    'session_cookie_size_bytes',
+    'Size of the Set-Cookie value written for the Flask session',
+    buckets=SIZE_BUCKETS
+)
+BATCH_INTAKE_ROWS = REGISTRY.counter(
+    'batch_intake_rows_total',
+    'Clients submitted through batch intake: scored, or refused because their batch had an invalid row',
+    ('outcome',)
+)
+BATCH_SUBMISSIONS = REGISTRY.counter(
+    'batch_submissions_total',
+    'Batch intake clients queued for Sheets by outcome: queued, or failed when the spool could not be '
+    'written, or not queued because an earlier submission of the batch queued them (duplicate) or is still '
+    'queueing them (pending)',
+    ('outcome',)
+)
+SCORING_API_ASSESSMENTS = REGISTRY.counter(
+    'scoring_api_assessments_total',
+    'Assessments scored or refused as invalid by the JSON scoring API',
+    ('outcome',)
+)
+PRINT_REPORTS = REGISTRY.counter(
+    'print_reports_total',
+    'Reports served for the browser to print: "browser" by preference, "server" picked once, "fallback" when PDF rendering was saturated',
+    ('reason',)
+)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of Google's OpenID Connect discovery document and JWKS.
+
+Authlib normally fetches the discovery document on the first login after
+every worker start, and the signing keys on the first ID-token check. With a
+fresh cache file the worker needs neither call. A stale cache is refreshed on
+first use; if Google can't be reached the stale copy is used rather than
+failing the login.
+
+Run this file directly to warm the cache, e.g. from the build command:
+    python oauth_cache.py --refresh
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+GOOGLE_METADATA_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+DEFAULT_CACHE_PATH = os.path.join('instance', 'google_openid_cache.json')
+DEFAULT_TTL = 24 * 60 * 60  # Google rotates signing keys roughly every two weeks
+
+logger = logging.getLogger(__name__)
+
+
+def read_cache(path):
+    """Return the cached entry, or None if there is no usable cache file"""
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or 'metadata' not in entry:
+        return None
+    return entry
+
+
+def write_cache(path, metadata, jwks):
+    """Atomically replace the cache file so concurrent workers never read half a file"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    entry = {'fetched_at': time.time(), 'metadata': metadata, 'jwks': jwks}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.oauth-cache-')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return entry
+
+
+def remember_jwks(path, jwks):
+    """
+    Store signing keys that Authlib re-fetched after seeing an unknown key ID,
+    so other workers verify ID tokens signed with the new key without fetching.
+    """
+    entry = read_cache(path)
+    if entry is None or not jwks or entry.get('jwks') == jwks:
+        return False
+    write_cache(path, entry['metadata'], jwks)
+    logger.info(f"Stored rotated Google signing keys in {path}")
+    return True
+
+
+def fetch(metadata_url=GOOGLE_METADATA_URL, timeout=5):
+    """Download the discovery document and the JWKS it points to"""
+    import requests
+
+    response = requests.get(metadata_url, timeout=timeout)
+    response.raise_for_status()
+    metadata = response.json()
+    jwks = None
+    if metadata.get('jwks_uri'):
+        response = requests.get(metadata['jwks_uri'], timeout=timeout)
+        response.raise_for_status()
+        jwks = response.json()
+    return metadata, jwks
+
+
+def load(path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, metadata_url=GOOGLE_METADATA_URL, allow_fetch=True):
+    """
+    Return server metadata ready to pass to ``oauth.register(**metadata)``.
+
+    The result includes ``jwks`` and Authlib's ``_loaded_at`` marker, so Authlib
+    uses it as-is instead of fetching. Returns None when there is no cache and
+    it can't be fetched; the caller then falls back to normal discovery.
+    """
+    entry = read_cache(path)
+    fresh = entry is not None and time.time() - entry.get('fetched_at', 0) < ttl
+
+    if not fresh and allow_fetch:
+        try:
+            metadata, jwks = fetch(metadata_url)
+            entry = write_cache(path, metadata, jwks)
+            logger.info(f"Refreshed Google OpenID metadata cache at {path}")
+        except Exception as e:
+            if entry is None:
+                logger.error(f"Could not fetch Google OpenID metadata: {str(e)}")
+                return None
+            logger.warning(f"Using stale Google OpenID metadata cache: {str(e)}")
+
+    if entry is None:
+        return None
+
+    metadata = dict(entry['metadata'])
+    if entry.get('jwks'):
+        metadata['jwks'] = entry['jwks']
+    metadata['_loaded_at'] = entry.get('fetched_at', time.time())
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm or inspect the Google OpenID metadata cache")
+    parser.add_argument('--path', default=os.environ.get('OAUTH_CACHE_PATH', DEFAULT_CACHE_PATH))
+    parser.add_argument('--refresh', action='store_true', help="fetch even if the cache is still fresh")
+    args = parser.parse_args()
+
+    if args.refresh:
+        metadata, jwks = fetch()
+        write_cache(args.path, metadata, jwks)
+    entry = read_cache(args.path)
+    if entry is None:
+        print(f"No cache at {args.path}")
+        return
+    age = time.time() - entry.get('fetched_at', 0)
+    keys = len((entry.get('jwks') or {}).get('keys', []))
+    print(f"{args.path}: issuer={entry['metadata'].get('issuer')} keys={keys} age={age:.0f}s")
+
+
+if __name__ == "__main__":
+    main()
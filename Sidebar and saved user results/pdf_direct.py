@@ -0,0 +1,421 @@
+"""
+Direct PDF backend for the fixed-layout risk assessment report.
+
+Draws the same content as templates/pdf_template.html - segment answers,
+sub-totals, grand total, risk level, the supervision reference table,
+criminogenic needs, notes and signatures - straight into PDF drawing
+operators. There is no HTML parsing or CSS layout, so a report takes a few
+milliseconds and very little memory compared with WeasyPrint.
+
+Only the standard Helvetica fonts are used (every PDF viewer has them), so
+text is encoded as WinAnsi; characters outside it are replaced with '?'.
+"""
+
+import zlib
+from datetime import datetime
+
+PAGE_WIDTH = 595.28   # A4 in points
+PAGE_HEIGHT = 841.89
+MARGIN = 17.0         # 0.3cm @page margin + 0.3cm content margin
+
+HIGHLIGHT = (1.0, 1.0, 0.6)   # #ffff99, as .highlight in pdf_template.html
+HEADER_FILL = (0.95, 0.95, 0.95)
+
+# Advance widths (1/1000 em) of WinAnsi characters 32-126 from the Adobe AFM files
+_HELVETICA_WIDTHS = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+]
+_HELVETICA_BOLD_WIDTHS = [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+]
+
+
+def text_width(text, size, bold=False):
+    """Width of a string in points"""
+    widths = _HELVETICA_BOLD_WIDTHS if bold else _HELVETICA_WIDTHS
+    total = 0
+    for char in text:
+        code = ord(char)
+        total += widths[code - 32] if 32 <= code <= 126 else 556
+    return total * size / 1000.0
+
+
+def wrap(text, size, max_width, bold=False):
+    """Break text into lines that fit max_width, splitting on spaces"""
+    lines = []
+    for paragraph in str(text).splitlines() or ['']:
+        current = ''
+        for word in paragraph.split(' '):
+            candidate = f"{current} {word}" if current else word
+            if current and text_width(candidate, size, bold) > max_width:
+                lines.append(current)
+                current = word
+            else:
+                current = candidate
+        lines.append(current)
+    return lines
+
+
+def _pdf_string(text):
+    data = str(text).encode('cp1252', errors='replace')
+    data = data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    data = data.replace(b'\r', b'').replace(b'\n', b' ')
+    return b'(' + data + b')'
+
+
+def _num(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+class Page:
+    """Drawing operators for one page; y grows downwards from the top edge"""
+
+    def __init__(self):
+        self.ops = []
+
+    def _y(self, y):
+        return PAGE_HEIGHT - y
+
+    def text(self, x, y, text, size=8, bold=False):
+        """Draw text with its baseline at y"""
+        font = b'F2' if bold else b'F1'
+        self.ops.append(b'BT /' + font + b' ' + _num(size).encode() + b' Tf ' +
+                        f"{_num(x)} {_num(self._y(y))} Td ".encode() + _pdf_string(text) + b' Tj ET')
+
+    def text_right(self, right, y, text, size=8, bold=False):
+        self.text(right - text_width(text, size, bold), y, text, size, bold)
+
+    def text_center(self, center, y, text, size=8, bold=False):
+        self.text(center - text_width(text, size, bold) / 2, y, text, size, bold)
+
+    def line(self, x1, y1, x2, y2, width=0.75):
+        self.ops.append(f"{_num(width)} w {_num(x1)} {_num(self._y(y1))} m "
+                        f"{_num(x2)} {_num(self._y(y2))} l S".encode())
+
+    def rect(self, x, y, w, h, fill=None, stroke=True, width=0.75):
+        """Rectangle with its top-left corner at (x, y)"""
+        ops = []
+        if fill:
+            ops.append(f"{_num(fill[0])} {_num(fill[1])} {_num(fill[2])} rg "
+                       f"{_num(x)} {_num(self._y(y + h))} {_num(w)} {_num(h)} re f 0 g")
+        if stroke:
+            ops.append(f"{_num(width)} w {_num(x)} {_num(self._y(y + h))} {_num(w)} {_num(h)} re S")
+        self.ops.append(' '.join(ops).encode())
+
+    def check(self, x, y, size=7):
+        """Draw a check mark whose bottom-left sits at (x, y) - the font has no glyph for it"""
+        self.ops.append(f"1 w {_num(x)} {_num(self._y(y - size * 0.45))} m "
+                        f"{_num(x + size * 0.3)} {_num(self._y(y))} l "
+                        f"{_num(x + size * 0.8)} {_num(self._y(y - size * 0.9))} l S".encode())
+
+    def content(self):
+        return b'\n'.join(self.ops)
+
+
+class Document:
+    """Collects pages and serialises them as a PDF 1.4 file"""
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+
+    def new_page(self):
+        page = Page()
+        self.pages.append(page)
+        return page
+
+    def to_bytes(self):
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        regular = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        bold = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        info = add(b'<< /Title ' + _pdf_string(self.title) + b' /Producer (pdf_direct) /CreationDate ' +
+                   _pdf_string(datetime.now().strftime("D:%Y%m%d%H%M%S")) + b' >>')
+
+        page_ids = []
+        for page in self.pages:
+            stream = zlib.compress(page.content(), 6)
+            content_id = add(f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode() +
+                             stream + b'\nendstream')
+            page_ids.append(add(
+                f"<< /Type /Page /Parent {pages} 0 R /MediaBox [0 0 {_num(PAGE_WIDTH)} {_num(PAGE_HEIGHT)}] "
+                f"/Resources << /Font << /F1 {regular} 0 R /F2 {bold} 0 R >> >> "
+                f"/Contents {content_id} 0 R >>".encode()
+            ))
+
+        objects[catalog - 1] = f"<< /Type /Catalog /Pages {pages} 0 R >>".encode()
+        kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+        objects[pages - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode() + body + b'\nendobj\n'
+        xref = len(out)
+        out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+        for offset in offsets:
+            out += f"{offset:010d} 00000 n \n".encode()
+        out += (f"trailer\n<< /Size {len(objects) + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode()
+        return bytes(out)
+
+
+# Line height for the 8pt body text
+LINE = 9.2
+# Officer and chief signature lines below the report box
+SIGNATURE_HEIGHT = 70
+
+
+def draw_segment(page, x, width, y, title, answers, answer_data, subtotal):
+    """Draw one risk factor with its questions and answer options, return the new y"""
+    page.text(x + 3, y + 8, title, size=8, bold=True)
+    y += LINE + 2
+    questions = answers.get('questions', [])
+    scores = answers.get('scores', [])
+    value_right = x + width - 20
+    text_left = x + 22
+    text_width_max = value_right - 24 - text_left
+    for i, question in enumerate(questions):
+        for line in wrap(f"{i + 1}. {question}", 8, width - 16, bold=True):
+            page.text(x + 10, y + 8, line, size=8, bold=True)
+            y += LINE
+        score = scores[i] if i < len(scores) else None
+        for answer in answer_data.get(i, []):
+            selected = score == answer['value']
+            lines = wrap(answer['text'], 8, text_width_max, bold=selected)
+            page.text_right(value_right, y + 8, str(answer['value']), size=9, bold=selected)
+            for line in lines:
+                page.text(text_left, y + 8, line, size=8, bold=selected)
+                y += LINE
+        y += 5
+    label = "SUB-TOTAL: "
+    value = str(subtotal)
+    value_x = value_right - text_width(value, 8, True)
+    page.text_right(value_x, y + 8, label, size=8, bold=True)
+    page.text(value_x, y + 8, value, size=8, bold=True)
+    page.line(value_x - 1, y + 10, value_right + 1, y + 10, width=0.5)
+    return y + LINE + 6
+
+
+def draw_table(page, x, y, width, fractions, rows, size=7, header_rows=1, highlight_rows=()):
+    """
+    Draw a bordered table and return the new y.
+
+    rows is a list of cell lists; a cell is either text or (text, True) to
+    append a check mark. highlight_rows are row indexes filled yellow and bold.
+    """
+    widths = [width * f for f in fractions]
+    line_height = size * 1.2
+    for row_index, row in enumerate(rows):
+        is_header = row_index < header_rows
+        bold = is_header or row_index in highlight_rows
+        wrapped = []
+        for cell, cell_width in zip(row, widths):
+            text, checked = cell if isinstance(cell, tuple) else (cell, False)
+            wrapped.append((wrap(text, size, cell_width - 4 - (size if checked else 0), bold), checked))
+        row_height = max(len(lines) for lines, _ in wrapped) * line_height + 4
+        fill = HEADER_FILL if is_header else (HIGHLIGHT if row_index in highlight_rows else None)
+        cell_x = x
+        for (lines, checked), cell_width in zip(wrapped, widths):
+            page.rect(cell_x, y, cell_width, row_height, fill=fill)
+            text_y = y + 2 + size
+            for line in lines:
+                line_width = text_width(line, size, bold)
+                left = cell_x + (cell_width - line_width - (size if checked else 0)) / 2
+                page.text(left, text_y, line, size=size, bold=bold)
+                if checked:
+                    page.check(left + line_width + 2, text_y, size)
+                text_y += line_height
+            cell_x += cell_width
+        y += row_height
+    return y
+
+
+def draw_column_headers(page, y):
+    left, right = MARGIN, PAGE_WIDTH - MARGIN
+    middle = (left + right) / 2
+    page.rect(left, y, right - left, 14, fill=None)
+    page.line(middle, y, middle, y + 14)
+    for column_left, column_right in ((left, middle), (middle, right)):
+        page.text(column_left + 130, y + 10, "FACTORS", size=9, bold=True)
+        page.text_right(column_right - 8, y + 10, "POINTS", size=9, bold=True)
+    return y + 14
+
+
+def render_report(context):
+    """Render the risk report for a context built by build_pdf_context() and return PDF bytes"""
+    subtotals = context['subtotals']
+    segment_titles = context['segment_titles']
+    segment_answers = context['segment_answers']
+    answers_data = context['segment_answers_data']
+    risk_assessment = context['risk_assessment']
+    segment_thresholds = context['segment_thresholds']
+
+    left, right = MARGIN, PAGE_WIDTH - MARGIN
+    middle = (left + right) / 2
+    column_width = middle - left
+
+    def segment_columns(page, top, first_ids, second_ids):
+        y_left = top + 4
+        for segment_id in first_ids:
+            y_left = draw_segment(page, left, column_width, y_left,
+                                  segment_titles.get(segment_id, 'Unknown Segment'),
+                                  segment_answers.get(segment_id, {}), answers_data.get(segment_id, {}),
+                                  subtotals.get(segment_id, 0))
+        y_right = top + 4
+        for segment_id in second_ids:
+            y_right = draw_segment(page, middle, column_width, y_right,
+                                   segment_titles.get(segment_id, 'Unknown Segment'),
+                                   segment_answers.get(segment_id, {}), answers_data.get(segment_id, {}),
+                                   subtotals.get(segment_id, 0))
+        return y_left, y_right
+
+    document = Document(title="Classification and Risk Assessment Tool")
+
+    # Page 1: header, segments 1-3 and 4-5
+    page = document.new_page()
+    top = MARGIN + 34  # first table sits 12mm lower on the page
+    y = top
+    page.text_center(PAGE_WIDTH / 2, y + 16, "Classification and Risk Assessment Tool", size=13, bold=True)
+    client_name = context.get('client_name', '') or ''
+    name_width = max(200, text_width(client_name, 8) + 8)
+    page.text_center(PAGE_WIDTH / 2, y + 32, client_name, size=8)
+    page.line(PAGE_WIDTH / 2 - name_width / 2, y + 34, PAGE_WIDTH / 2 + name_width / 2, y + 34, width=0.5)
+    page.text_center(PAGE_WIDTH / 2, y + 44, "Name of Petitioner/Probationer/Parolee", size=8)
+    page.line(left, y + 50, right, y + 50, width=1.5)
+    y = draw_column_headers(page, y + 50)
+    y_left, y_right = segment_columns(page, y, range(1, 4), range(4, 6))
+    bottom = max(y_left, y_right) + 4
+    page.line(middle, y, middle, bottom)
+    page.rect(left, top, right - left, bottom - top)
+
+    # Page 2: segments 6-7, segment 8 with totals and reference tables, notes, signatures
+    page = document.new_page()
+    top = MARGIN
+    y = draw_column_headers(page, top)
+    y_left, _ = segment_columns(page, y, range(6, 8), ())
+
+    y_right = draw_segment(page, middle, column_width, y + 4, segment_titles.get(8, 'Unknown Segment'),
+                           segment_answers.get(8, {}), answers_data.get(8, {}), subtotals.get(8, 0))
+    inner_left, inner_right = middle + 4, right - 4
+    inner_width = inner_right - inner_left
+    value_right = right - 20
+    for label, value in (("GRAND TOTAL: ", sum(subtotals.values())), ("RISK LEVEL: ", risk_assessment['level'])):
+        value = str(value)
+        value_x = value_right - text_width(value, 8, True)
+        page.text_right(value_x, y_right + 8, label, size=8, bold=True)
+        page.text(value_x, y_right + 8, value, size=8, bold=True)
+        y_right += LINE + 2
+    page.line(inner_left, y_right, inner_right, y_right, width=0.5)
+    y_right += 6
+
+    # Length of sentence
+    page.text(inner_left, y_right + 8, "LENGTH OF SENTENCE", size=8, bold=True)
+    y_right += LINE + 4
+    short_sentence = risk_assessment['level'] in ('Low Risk (Level 1)', 'Medium Risk (Level 2)')
+    option_x = inner_left + 30
+    for label, checked in (("One (1) Year or Less", short_sentence), ("Above Two (2) Years", not short_sentence)):
+        label_width = 18 + text_width(label, 8, checked)
+        if checked:
+            page.rect(option_x - 2, y_right - 2, label_width + 4, 14, fill=HIGHLIGHT, stroke=False)
+        page.rect(option_x, y_right, 12, 10, width=1)
+        if checked:
+            page.check(option_x + 3, y_right + 8, 7)
+        page.text(option_x + 16, y_right + 8, label, size=8, bold=checked)
+        option_x += label_width + 24
+    y_right += 18
+
+    # Reference table for the length of supervision
+    page.text_center((inner_left + inner_right) / 2, y_right + 8,
+                     "REFERENCE TABLE for the LENGTH OF SUPERVISION", size=8, bold=True)
+    page.text_center((inner_left + inner_right) / 2, y_right + 17, "(based on Sec 14 PD 968, as amended)", size=7)
+    y_right += 22
+    levels = [
+        ("17 and below", "Low Risk (Level 1)", "6 months", "1 year", "Once in 2 months"),
+        ("18 to 28", "Medium Risk (Level 2)", "6 months", "1 year", "Once a month"),
+        ("29 to 39", "High Risk (Level 3)", "1 year", "2 years", "Twice a month"),
+        ("40 and above", "Very High Risk (Level 4)", "2 years", "3 years", "Twice a month"),
+    ]
+    rows = [
+        ["SCORE RANGE", "RISK LEVEL", "LENGTH OF PROBATION PERIOD", "", "INTENSITY OF SUPERVISION"],
+        ["", "", "Sentenced to 1 year Imprisonment or less", "All other Cases", ""],
+    ] + [list(level) for level in levels]
+    highlighted = [index + 2 for index, level in enumerate(levels) if level[1] == risk_assessment['level']]
+    y_right = draw_table(page, inner_left, y_right, inner_width, (0.2, 0.25, 0.15, 0.15, 0.25), rows,
+                         size=6, header_rows=2, highlight_rows=highlighted) + 6
+
+    # Criminogenic needs
+    page.text_center((inner_left + inner_right) / 2, y_right + 8, "CRIMINOGENIC NEEDS", size=8, bold=True)
+    page.text_center((inner_left + inner_right) / 2, y_right + 17,
+                     "INSTRUCTION: Highlight the client's identified Risk Factor/s and", size=6)
+    page.text_center((inner_left + inner_right) / 2, y_right + 24,
+                     "Programmatic Intervention/s to be offered.", size=6)
+    y_right += 28
+    rows = [["Risk Factors", "Highest Score", "Threshold", "Client's Risk Score", "Program to be Offered"]]
+    highlighted = []
+    for segment_id, data in segment_thresholds.items():
+        score = subtotals.get(segment_id, 0)
+        met = score >= data['threshold']
+        if met:
+            highlighted.append(len(rows))
+        rows.append([
+            segment_titles[segment_id], str(data['highest_score']), str(data['threshold']), str(score),
+            (data['program'], True) if met else "Not required"
+        ])
+    y_right = draw_table(page, inner_left, y_right, inner_width, (0.4, 0.1, 0.1, 0.2, 0.2), rows,
+                         size=6, highlight_rows=highlighted) + 4
+
+    y = max(y_left, y_right)
+    page.line(middle, top + 14, middle, y)
+
+    # Notes row spans both columns
+    page.line(left, y, right, y)
+    page.text(left + 4, y + 10, "NOTES AND IMPRESSIONS:", size=8, bold=True)
+    y += 14
+    bottom = PAGE_HEIGHT - MARGIN
+    for line in wrap(context.get('notes', '') or '', 8, right - left - 8):
+        if y + LINE > bottom:
+            # Long notes continue in a box on the next page
+            page.rect(left, top, right - left, y - top)
+            page = document.new_page()
+            top = y = MARGIN
+        page.text(left + 4, y + 8, line, size=8)
+        y += LINE
+    y += 10
+    page.rect(left, top, right - left, y - top)
+
+    # Signatures
+    if y + SIGNATURE_HEIGHT > bottom:
+        page = document.new_page()
+        y = MARGIN
+    y += 16
+    officer_left, officer_right = right - 100 - column_width * 0.9, right - 100
+    page.text_center((officer_left + officer_right) / 2, y, context.get('officer_name', '') or '', size=8)
+    page.line(officer_left, y + 3, officer_right, y + 3, width=0.5)
+    page.text(officer_left, y + 11, "Name & Position of Inv/Supvg Officer/Date", size=7)
+    y += 24
+    page.text(left + 100, y, "NOTED:", size=8, bold=True)
+    y += 16
+    chief_left, chief_right = left + 100, right
+    page.text_center((chief_left + chief_right) / 2, y, context.get('chief_name', '') or '', size=8)
+    page.line(chief_left, y + 3, chief_right, y + 3, width=0.5)
+    page.text_center((chief_left + chief_right) / 2, y + 11, "Chief Probation Officer/Officer-in-Charge/Date", size=7)
+
+    return document.to_bytes()
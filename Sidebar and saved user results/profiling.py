@@ -0,0 +1,102 @@
+"""
+Opt-in statistical profiler for individual requests.
+
+A background thread samples the stack of the thread serving the request at a
+fixed interval and counts identical stacks. The result is written in the
+"folded stacks" format (one ``frame;frame;frame count`` line per stack), which
+flamegraph.pl, speedscope and inferno read directly.
+"""
+
+import importlib
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+
+
+def _unpatched(module, name):
+    """Return the original stdlib object even when gevent has monkey-patched it"""
+    if 'gevent' in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched(module):
+            return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+def current_thread_id():
+    """
+    Identifier of the OS thread running the caller.
+
+    Under gevent, threading.get_ident() is patched to return a greenlet id,
+    which sys._current_frames() does not know about.
+    """
+    return _unpatched('threading', 'get_ident')()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _fold_stack(frame):
+    """Return the stack rooted at the outermost frame as a folded string"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    # Semicolons separate frames in the folded format
+    return ';'.join(label.replace(';', ':') for label in labels)
+
+
+class RequestProfiler:
+    """Samples one thread's stack until stopped"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.started_at = None
+        self.duration = 0.0
+        self._running = False
+        # A real OS thread and lock even under gevent, so the sampler keeps
+        # ticking while the request's greenlet holds the hub
+        self._finished = _unpatched('threading', 'Lock')()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._running = True
+        self._finished.acquire()
+        _unpatched('_thread', 'start_new_thread')(self._run, ())
+        return self
+
+    def _run(self):
+        sleep = _unpatched('time', 'sleep')
+        try:
+            while self._running:
+                sleep(self.interval)
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    self.samples[_fold_stack(frame)] += 1
+        finally:
+            self._finished.release()
+
+    def stop(self):
+        self._running = False
+        self._finished.acquire()
+        self._finished.release()
+        self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def write_folded(self, directory, label):
+        """Write the collected stacks to <directory> and return the file path"""
+        os.makedirs(directory, exist_ok=True)
+        timestamp = time.strftime('%Y%m%d-%H%M%S')
+        safe_label = ''.join(c if c.isalnum() or c in '-_' else '_' for c in label)
+        path = os.path.join(directory, f"{safe_label}-{timestamp}-{uuid.uuid4().hex[:8]}.folded")
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
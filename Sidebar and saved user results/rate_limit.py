@@ -0,0 +1,179 @@
+"""
+Token buckets and admission control shared by the rate-limited routes.
+
+A TokenBucket allows a sustained rate with a burst allowance. The
+AdmissionController combines a bucket per user, a bucket shared by all users
+and a cap on concurrent work, and answers immediately: either the request is
+admitted, or it's told how many seconds to wait before retrying.
+
+State is in-process, so every gunicorn worker enforces its own limits.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+# Per-user buckets kept in memory; the least recently used are dropped first
+MAX_TRACKED_USERS = 10000
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average and up to ``burst`` at once"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; otherwise return the seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            if self.rate <= 0:
+                return float('inf')
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout):
+        """Wait up to ``timeout`` seconds for a token"""
+        deadline = time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                return False
+            time.sleep(wait)
+
+    def refund(self):
+        """Return a token taken for a request that was rejected further on"""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + 1)
+
+    def full(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.burst
+
+
+class KeyedTokenBuckets:
+    """One TokenBucket per key (e.g. per user), created on first use"""
+
+    def __init__(self, rate, burst, max_keys=MAX_TRACKED_USERS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._evict()
+                bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def _evict(self):
+        # A full bucket holds no state worth keeping; fall back to the oldest
+        for key, bucket in list(self._buckets.items()):
+            if bucket.full():
+                del self._buckets[key]
+                return
+        self._buckets.popitem(last=False)
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class Rejected(Exception):
+    """The request was refused; ``retry_after`` is the suggested wait in whole seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"rejected ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Per-user and global token buckets plus a concurrency cap.
+
+    ``admit(key)`` returns a ticket to release when the work is done, or
+    raises Rejected without waiting. Rates are per second.
+    """
+
+    def __init__(self, user_rate, user_burst, global_rate, global_burst, max_concurrent, busy_retry_after=2):
+        self.users = KeyedTokenBuckets(user_rate, user_burst)
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.max_concurrent = int(max_concurrent)
+        self.busy_retry_after = busy_retry_after
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @staticmethod
+    def _seconds(wait):
+        return max(1, math.ceil(wait)) if wait != float('inf') else 60
+
+    def admit(self, key):
+        user_bucket = self.users.get(key)
+        wait = user_bucket.try_acquire()
+        if wait:
+            raise Rejected('user_rate', self._seconds(wait))
+        wait = self.global_bucket.try_acquire()
+        if wait:
+            user_bucket.refund()
+            raise Rejected('global_rate', self._seconds(wait))
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                busy = True
+            else:
+                busy = False
+                self.in_flight += 1
+        if busy:
+            user_bucket.refund()
+            self.global_bucket.refund()
+            raise Rejected('concurrency', self.busy_retry_after)
+        return _Ticket(self)
+
+    def saturated(self):
+        """True when every concurrent slot is taken"""
+        with self._lock:
+            return self.in_flight >= self.max_concurrent
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _Ticket:
+    """Held while admitted work runs; releasing it frees the concurrency slot"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Re-score a CSV export of the Google Sheet with the current scoring rules.
+
+The export has the columns prepare_google_sheets_data() writes. Rows are read
+in chunks and scored on a pool of worker processes; at most a few chunks per
+worker are in flight, so memory stays flat however large the export is.
+Only rows whose risk level or recommended programs changed are written, in
+input order, with the new values appended.
+
+The sheet stores the risk level but not the programs, so programs are only
+compared when the export has a "Programs" column or --previous-thresholds
+gives the thresholds the rows were originally scored with.
+
+Usage:
+    python rescore_csv.py export.csv -o changed.csv
+    python rescore_csv.py export.csv --previous-thresholds old_thresholds.json
+    cat export.csv | python rescore_csv.py - --workers 4 --chunk-size 5000
+"""
+
+import argparse
+import copy
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import app as app_module
+
+PROGRAMS_COLUMN = "Programs"
+PROGRAM_SEPARATOR = "; "
+OUTPUT_COLUMNS = [
+    "New Risk Level",
+    "New Probation Period",
+    "New Supervision Intensity",
+    "Previous Programs",
+    "New Programs",
+    "Changed"
+]
+
+# Set in each worker by init_worker()
+_previous_thresholds = None
+
+
+def load_previous_thresholds(path):
+    """Read {"<factor key>": threshold} and overlay it on the current segment_thresholds"""
+    with open(path) as f:
+        overrides = json.load(f)
+    thresholds = copy.deepcopy(app_module.segment_thresholds)
+    for key, value in overrides.items():
+        thresholds[int(key)]['threshold'] = value['threshold'] if isinstance(value, dict) else value
+    return thresholds
+
+
+def init_worker(previous_thresholds):
+    global _previous_thresholds
+    _previous_thresholds = previous_thresholds
+    logging.disable(logging.WARNING)
+
+
+def rescore_row(row):
+    """Return the appended output values if the row's result changed, otherwise None"""
+    segment_scores = {
+        i: [int(row.get(column) or 0) for column in columns]
+        for i, columns in app_module.SHEETS_ANSWER_COLUMNS.items()
+    }
+    subtotals, total_score = app_module.compute_subtotals(segment_scores)
+    risk_assessment = app_module.assess_risk_level(total_score, row.get("Length of Sentence", ""))
+    programs = app_module.recommend_programs(subtotals)
+
+    if _previous_thresholds is not None:
+        previous_programs = app_module.recommend_programs(subtotals, _previous_thresholds)
+    elif PROGRAMS_COLUMN in row:
+        previous_programs = [p for p in (row[PROGRAMS_COLUMN] or '').split(PROGRAM_SEPARATOR) if p]
+    else:
+        previous_programs = None
+
+    changed = []
+    if risk_assessment["level"] != row.get("Risk Level"):
+        changed.append("risk level")
+    if previous_programs is not None and previous_programs != programs:
+        changed.append("programs")
+    if not changed:
+        return None
+    return [
+        risk_assessment["level"],
+        risk_assessment["probation"],
+        risk_assessment["supervision"],
+        PROGRAM_SEPARATOR.join(previous_programs or []),
+        PROGRAM_SEPARATOR.join(programs),
+        ", ".join(changed)
+    ]
+
+
+def rescore_chunk(header, rows):
+    """Score one chunk; returns (changed output rows, number of unreadable rows)"""
+    changed = []
+    errors = 0
+    for values in rows:
+        row = dict(zip(header, values))
+        try:
+            extra = rescore_row(row)
+        except ValueError:
+            errors += 1
+            continue
+        if extra is not None:
+            changed.append(values + extra)
+    return changed, errors
+
+
+def read_chunks(reader, chunk_size):
+    chunk = []
+    for values in reader:
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score a Google Sheets CSV export with the current rules")
+    parser.add_argument('input', help="CSV export, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="CSV of changed rows (default stdout)")
+    parser.add_argument('--chunk-size', type=int, default=2000, help="rows per worker task")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--previous-thresholds',
+                        help="JSON of the factor thresholds the rows were scored with, e.g. {\"1\": 5, \"5\": 4}")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    previous_thresholds = load_previous_thresholds(args.previous_thresholds) if args.previous_thresholds else None
+
+    infile = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8-sig')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    start = time.perf_counter()
+    total_rows = changed_rows = error_rows = 0
+    try:
+        reader = csv.reader(infile)
+        header = next(reader, None)
+        if header is None:
+            parser.error("input is empty")
+        missing = [c for columns in app_module.SHEETS_ANSWER_COLUMNS.values() for c in columns if c not in header]
+        if missing:
+            parser.error(f"input is missing {len(missing)} answer column(s), e.g. {missing[0]!r}")
+        writer = csv.writer(outfile)
+        writer.writerow(header + OUTPUT_COLUMNS)
+
+        with ProcessPoolExecutor(args.workers, initializer=init_worker,
+                                 initargs=(previous_thresholds,)) as pool:
+            # Bounded window of in-flight chunks keeps memory constant and
+            # output in input order
+            pending = deque()
+            for chunk in read_chunks(reader, args.chunk_size):
+                total_rows += len(chunk)
+                pending.append(pool.submit(rescore_chunk, header, chunk))
+                if len(pending) >= args.workers * 2:
+                    changed, errors = pending.popleft().result()
+                    writer.writerows(changed)
+                    changed_rows += len(changed)
+                    error_rows += errors
+            while pending:
+                changed, errors = pending.popleft().result()
+                writer.writerows(changed)
+                changed_rows += len(changed)
+                error_rows += errors
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"{total_rows} rows re-scored in {elapsed:.1f}s ({total_rows / max(elapsed, 1e-9):.0f} rows/s) "
+          f"with {args.workers} worker(s): {changed_rows} changed, {error_rows} unreadable",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Routing of completed assessments to per-office Apps Script endpoints.
+
+Apps Script enforces quotas per script, so a single shared endpoint lets one
+busy office use up the quota for everyone. Each office can instead post to its
+own script (and sheet). An officer is matched to an office by:
+
+    1. their email address listed under the office's "members"
+    2. their email domain (or a parent domain) listed under "domains"
+    3. the "default" office
+
+An office can be given its own token bucket ("rate" sustained posts per
+second plus a "burst" allowance) and a cap on concurrent posts
+("concurrency"). A submission waits up to "max_wait" seconds for both; if
+neither frees up in time it fails fast instead of piling more load onto a
+script that is already at its quota. Only limits set in the routes file
+apply: an office without them, like the default office when no routes file
+is configured, posts without waiting.
+Each endpoint also has its own circuit breaker ("failure_threshold" failed
+posts in a row open it for "reset_timeout" seconds) and a window of recent
+post latencies.
+
+Routes are read from a JSON file, e.g.:
+
+    {
+      "default": "central",
+      "offices": {
+        "central": {"url": "https://script.google.com/.../exec"},
+        "region7": {
+          "url": "https://script.google.com/.../exec",
+          "domains": ["r7.probation.gov.ph"],
+          "members": ["officer@gmail.com"],
+          "rate": 0.5, "burst": 5, "concurrency": 2,
+          "failure_threshold": 3, "reset_timeout": 30
+        }
+      }
+    }
+
+Limits apply per gunicorn worker process, so set them to the script's quota
+divided by the number of workers.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from circuit_breaker import (DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT, CircuitBreaker,
+                             LatencyWindow)
+from rate_limit import TokenBucket
+
+DEFAULT_OFFICE = 'default'
+# Burst allowance of an office given a "rate" but no "burst"
+DEFAULT_BURST = 10
+DEFAULT_MAX_WAIT = 5.0
+
+
+class EndpointBusy(Exception):
+    """No rate or concurrency allowance freed up within the wait limit"""
+
+    def __init__(self, office, reason):
+        super().__init__(f"Sheets endpoint for office {office!r} is busy ({reason})")
+        self.office = office
+        self.reason = reason
+
+
+class Endpoint:
+    """One office's Apps Script URL with its own rate and concurrency limits, if any (None: unlimited)"""
+
+    def __init__(self, office, url, rate=None, burst=None, concurrency=None,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 on_state_change=None):
+        self.office = office
+        self.url = url
+        self.concurrency = None if concurrency is None else int(concurrency)
+        self.bucket = None if rate is None else TokenBucket(rate, DEFAULT_BURST if burst is None else burst)
+        self.breaker = CircuitBreaker(office, failure_threshold, reset_timeout, on_state_change=on_state_change)
+        self.latencies = LatencyWindow()
+        self._slots = None if self.concurrency is None else threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    @contextmanager
+    def slot(self, max_wait):
+        """
+        Hold one rate token and one concurrency slot for the duration of a post.
+
+        Raises CircuitOpen at once if the endpoint's breaker is open; the caller
+        reports the post's result to ``self.breaker``.
+        """
+        self.breaker.check()
+        started = time.monotonic()
+        if self.bucket is not None and not self.bucket.acquire(max_wait):
+            self.breaker.record_skipped()
+            raise EndpointBusy(self.office, 'rate')
+        if self._slots is not None and not self._slots.acquire(
+                timeout=max(0.0, max_wait - (time.monotonic() - started))):
+            self.breaker.record_skipped()
+            raise EndpointBusy(self.office, 'concurrency')
+        with self._lock:
+            self.in_flight += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+
+class SheetsRouter:
+    """Maps an officer's email to the Endpoint of their office"""
+
+    def __init__(self, endpoints, default=DEFAULT_OFFICE, domains=None, members=None, max_wait=DEFAULT_MAX_WAIT):
+        self.endpoints = endpoints
+        if default not in endpoints:
+            raise ValueError(f"default office {default!r} has no endpoint")
+        self.default = default
+        self.domains = {domain.lower(): office for domain, office in (domains or {}).items()}
+        self.members = {email.lower(): office for email, office in (members or {}).items()}
+        self.max_wait = max_wait
+
+    @classmethod
+    def from_config(cls, config, fallback_url=None, max_wait=DEFAULT_MAX_WAIT, on_state_change=None):
+        """
+        Build from the parsed JSON routes; ``fallback_url`` becomes the default
+        office's URL when the config doesn't define one. ``on_state_change``
+        is called as (breaker, old state, new state) by every endpoint's breaker.
+        """
+        config = config or {}
+        default = config.get('default', DEFAULT_OFFICE)
+        endpoints = {}
+        domains = {}
+        members = {}
+        for office, settings in config.get('offices', {}).items():
+            url = settings.get('url') or (fallback_url if office == default else None)
+            if not url:
+                raise ValueError(f"office {office!r} has no url")
+            endpoints[office] = Endpoint(
+                office, url,
+                rate=settings.get('rate'),
+                burst=settings.get('burst'),
+                concurrency=settings.get('concurrency'),
+                failure_threshold=settings.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD),
+                reset_timeout=settings.get('reset_timeout', DEFAULT_RESET_TIMEOUT),
+                on_state_change=on_state_change
+            )
+            for domain in settings.get('domains', []):
+                domains[domain] = office
+            for email in settings.get('members', []):
+                members[email] = office
+        if default not in endpoints:
+            if not fallback_url:
+                raise ValueError(f"default office {default!r} has no url")
+            endpoints[default] = Endpoint(default, fallback_url, on_state_change=on_state_change)
+        return cls(endpoints, default, domains, members, config.get('max_wait', max_wait))
+
+    @classmethod
+    def from_file(cls, path, fallback_url=None, max_wait=DEFAULT_MAX_WAIT, on_state_change=None):
+        config = None
+        if path:
+            with open(path) as f:
+                config = json.load(f)
+        return cls.from_config(config, fallback_url, max_wait, on_state_change)
+
+    def office_for(self, email):
+        email = (email or '').strip().lower()
+        if email in self.members:
+            return self.members[email]
+        domain = email.rpartition('@')[2]
+        # Most specific domain first: r7.probation.gov.ph, probation.gov.ph, ...
+        while domain:
+            if domain in self.domains:
+                return self.domains[domain]
+            domain = domain.partition('.')[2]
+        return self.default
+
+    def endpoint_for(self, email):
+        return self.endpoints[self.office_for(email)]
+
+    @contextmanager
+    def slot(self, email):
+        """Route the officer's submission and hold its endpoint's limits while posting"""
+        with self.endpoint_for(email).slot(self.max_wait) as endpoint:
+            yield endpoint
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Local spool of Sheets submissions that could not be posted.
+
+When an office's Apps Script endpoint is failing (its circuit breaker is open,
+it is throttled, or the post errors), the completed assessment is written here
+instead of being lost. Batch intake queues its clients here as well, so that
+they are posted one at a time outside the request. The app replays the spool in
+the background once a post to the endpoint succeeds again, and straight after a
+batch is queued. Entries the endpoint rejects outright (a status other than
+5xx or 429, which retrying would not change) are moved to dead_letter.jsonl
+in the spool directory, so they don't hold up the rest. The spool can also be
+inspected or replayed by hand:
+
+    python sheets_spool.py status
+    python sheets_spool.py replay
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_FILE = 'dead_letter.jsonl'
+
+
+class Spool:
+    """One JSON file per submission, replayed oldest first"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.dead_letter_path = os.path.join(directory, DEAD_LETTER_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+    def add(self, email, data, reason):
+        entry = {'spooled_at': time.time(), 'email': email, 'reason': reason, 'data': data}
+        # Time-ordered names so replay keeps submission order
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.json"
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.spool-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def names(self):
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith('.json'))
+        except FileNotFoundError:
+            return []
+
+    def __len__(self):
+        return len(self.names())
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name)) as f:
+            return json.load(f)
+
+    def remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def recover(self, stale_after=300):
+        """Put back entries claimed by a replay that died before finishing"""
+        now = time.time()
+        for name in os.listdir(self.directory):
+            if name.endswith('.replaying'):
+                try:
+                    if now - os.path.getmtime(os.path.join(self.directory, name)) > stale_after:
+                        self.unclaim(name)
+                except FileNotFoundError:
+                    pass
+
+    def claim(self, name):
+        """Move an entry aside so that only one replayer posts it; returns the claimed name or None"""
+        claimed = name + '.replaying'
+        try:
+            os.rename(os.path.join(self.directory, name), os.path.join(self.directory, claimed))
+        except FileNotFoundError:
+            return None
+        # Mark the claim time, which recover() measures staleness from
+        os.utime(os.path.join(self.directory, claimed))
+        return claimed
+
+    def unclaim(self, claimed):
+        os.rename(os.path.join(self.directory, claimed),
+                  os.path.join(self.directory, claimed[:-len('.replaying')]))
+
+    def dead_letter(self, claimed, reason):
+        """Move a claimed entry the endpoint rejected to the dead-letter file, one JSON line per entry"""
+        entry = self.read(claimed)
+        entry.update(rejected_at=time.time(), rejection=reason)
+        # One write of one line in append mode, so concurrent replayers don't interleave
+        with open(self.dead_letter_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+        self.remove(claimed)
+
+    def dead_letters(self):
+        try:
+            with open(self.dead_letter_path) as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or replay spooled Sheets submissions")
+    parser.add_argument('command', choices=['status', 'replay'])
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    import app as app_module
+
+    spool = app_module.submission_spool
+    if args.command == 'status':
+        names = spool.names()
+        print(f"{len(names)} spooled submission(s) in {spool.directory}")
+        for name in names:
+            entry = spool.read(name)
+            spooled_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['spooled_at']))
+            print(f"  {spooled_at}  {entry['email']:<40} {entry['reason']}")
+        rejected = spool.dead_letters()
+        if rejected:
+            print(f"{len(rejected)} rejected submission(s) in {spool.dead_letter_path}")
+        return
+    sent, remaining = app_module.replay_sheets_spool()
+    print(f"replayed {sent}, {remaining} still spooled", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
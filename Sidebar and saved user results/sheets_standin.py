@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Apps Script endpoint, for offline load tests.
+
+Accepts the JSON that prepare_google_sheets_data() produces, like the real
+script's doPost(), and answers {"result": "success"}. Faults are injected
+so the submission path (routing, rate limits, circuit breaker, spool) can be
+exercised without touching the real sheet:
+
+    --latency SPEC        answer delay: 0.3, uniform:0.1:0.5, normal:1.0:0.3,
+                          lognormal:1.2:0.5 (median, sigma) or exp:0.8 (mean)
+    --error-rate P        fraction of posts answered 500
+    --hang-rate P         fraction of posts that hang for --hang seconds,
+                          past the app's 15s timeout
+    --rate R --burst B    token bucket; posts over it get 429, as Apps Script
+                          does when a script is invoked too often
+    --max-concurrent N    posts beyond N executing at once get 429
+
+Every post is appended to --record as one JSON line (payload, status, delay).
+GET /stats returns counts and delay percentiles so far.
+
+Run it and point the app at it:
+    python sheets_standin.py --port 8765 --latency lognormal:1.2:0.5 --error-rate 0.02
+    GOOGLE_SCRIPT_URL=http://127.0.0.1:8765/exec gunicorn app:app
+    GOOGLE_SCRIPT_URL=http://127.0.0.1:8765/exec python bench_flow.py --live-sheets
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rate_limit import TokenBucket
+
+
+def parse_latency(spec):
+    """Turn a --latency spec into a function returning a delay in seconds"""
+    kind, _, params = spec.partition(':')
+    try:
+        if not params:
+            value = float(kind)
+            return lambda: value
+        values = [float(v) for v in params.split(':')]
+        if kind == 'uniform':
+            low, high = values
+            return lambda: random.uniform(low, high)
+        if kind == 'normal':
+            mean, sd = values
+            return lambda: max(0.0, random.gauss(mean, sd))
+        if kind == 'lognormal':
+            median, sigma = values
+            mu = math.log(median)
+            return lambda: random.lognormvariate(mu, sigma)
+        if kind == 'exp':
+            mean, = values
+            return lambda: random.expovariate(1 / mean)
+    except ValueError:
+        pass
+    raise argparse.ArgumentTypeError(f"bad latency spec {spec!r}")
+
+
+def expected_columns():
+    """Columns prepare_google_sheets_data() sends, in order"""
+    import app as app_module
+    columns = ['Timestamp'] + list(app_module.SHEETS_METADATA_COLUMNS.values())
+    for i, answer_columns in app_module.SHEETS_ANSWER_COLUMNS.items():
+        columns += answer_columns + [f"Segment {i} Total"]
+    return columns + ["Total Risk Score", "Risk Level", "Probation Period", "Supervision Intensity"]
+
+
+class StandIn:
+    """Fault settings, counters and the record file shared by all handler threads"""
+
+    def __init__(self, latency, error_rate=0.0, hang_rate=0.0, hang=20.0, bucket=None, max_concurrent=0,
+                 record=None, columns=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang = hang
+        self.bucket = bucket
+        self.max_concurrent = max_concurrent
+        self.columns = columns
+        self.record = record
+        self.statuses = Counter()
+        self.delays = []
+        self.executing = 0
+        self.peak_executing = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def handle(self, body):
+        """Decide the response for one post; returns (status, body dict, delay, parsed payload)"""
+        with self._lock:
+            self.executing += 1
+            self.peak_executing = max(self.peak_executing, self.executing)
+            over_concurrency = self.max_concurrent and self.executing > self.max_concurrent
+        try:
+            try:
+                payload = json.loads(body or b'null')
+            except ValueError:
+                return 400, {'result': 'error', 'error': 'body is not JSON'}, 0.0, None
+            if not isinstance(payload, dict):
+                return 400, {'result': 'error', 'error': 'expected a JSON object'}, 0.0, payload
+            if self.columns:
+                missing = [column for column in self.columns if column not in payload]
+                if missing:
+                    return 400, {'result': 'error', 'error': f"missing {len(missing)} column(s)",
+                                 'missing': missing[:5]}, 0.0, payload
+            if over_concurrency:
+                return 429, {'result': 'error', 'error': 'too many simultaneous invocations'}, 0.0, payload
+            # try_acquire() returns the wait for the next token, 0 when one was taken
+            if self.bucket is not None and self.bucket.try_acquire():
+                return 429, {'result': 'error', 'error': 'service invoked too many times'}, 0.0, payload
+
+            roll = random.random()
+            if roll < self.hang_rate:
+                delay = self.hang
+                status, result = 500, {'result': 'error', 'error': 'execution timed out'}
+            elif roll < self.hang_rate + self.error_rate:
+                delay = self.latency()
+                status, result = 500, {'result': 'error', 'error': 'injected failure'}
+            else:
+                delay = self.latency()
+                status, result = 200, {'result': 'success'}
+            time.sleep(delay)
+            return status, result, delay, payload
+        finally:
+            with self._lock:
+                self.executing -= 1
+
+    def log(self, status, delay, payload):
+        with self._lock:
+            self.statuses[status] += 1
+            self.delays.append(delay)
+            if self.record is not None:
+                self.record.write(json.dumps({
+                    'received_at': time.time(), 'status': status, 'delay': round(delay, 4), 'payload': payload
+                }) + '\n')
+                self.record.flush()
+
+    def stats(self):
+        with self._lock:
+            delays = sorted(self.delays)
+            statuses = dict(self.statuses)
+            peak = self.peak_executing
+        elapsed = time.time() - self.started
+        total = sum(statuses.values())
+
+        def pct(point):
+            if not delays:
+                return None
+            return round(delays[max(1, -(-point * len(delays) // 100)) - 1] * 1000, 1)
+
+        return {
+            'received': total,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'posts_per_s': round(total / elapsed, 2) if elapsed else 0.0,
+            'peak_concurrent': peak,
+            'delay_ms': {'p50': pct(50), 'p90': pct(90), 'p99': pct(99)}
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = 'SheetsStandIn/1.0'
+    standin = None
+
+    def _send(self, status, result):
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        status, result, delay, payload = self.standin.handle(body)
+        self.standin.log(status, delay, payload)
+        try:
+            self._send(status, result)
+        except (BrokenPipeError, ConnectionResetError):
+            # The app gave up waiting (e.g. its 15s timeout on a hang)
+            pass
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send(200, self.standin.stats())
+        else:
+            self._send(404, {'result': 'error', 'error': 'POST submissions to any path; GET /stats'})
+
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Apps Script stand-in with fault injection")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=parse_latency, default=parse_latency('0'), help="delay spec (see above)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--hang', type=float, default=20.0, help="seconds a hanging post takes")
+    parser.add_argument('--rate', type=float, default=None, help="posts per second before answering 429")
+    parser.add_argument('--burst', type=float, default=10)
+    parser.add_argument('--max-concurrent', type=int, default=0, help="0 for no limit")
+    parser.add_argument('--record', help="append every post to this JSON lines file")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="accept any JSON object instead of checking the app's Sheets columns")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    columns = None
+    if not args.no_validate:
+        logging.disable(logging.WARNING)
+        columns = expected_columns()
+        logging.disable(logging.NOTSET)
+
+    record = open(args.record, 'a') if args.record else None
+    Handler.verbose = args.verbose
+    Handler.standin = StandIn(
+        args.latency, args.error_rate, args.hang_rate, args.hang,
+        TokenBucket(args.rate, args.burst) if args.rate is not None else None,
+        args.max_concurrent, record, columns
+    )
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    print(f"Apps Script stand-in on http://{args.host}:{server.server_port}/exec", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if record:
+            record.close()
+        print(json.dumps(Handler.standin.stats(), indent=2), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
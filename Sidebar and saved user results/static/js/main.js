@@ -288,6 +288,182 @@ const SecureLogger = (function() {
     };
 })();
 
+// Live Scoring Module - provisional subtotals and risk level computed in the browser
+// from the scoring tables the server publishes (/scoring_tables/<version>.json).
+// The server recomputes everything on submission; these numbers are only a preview.
+const LiveScoring = (function() {
+    let tables = null;
+
+    // Fetch the tables once per version - the response is cached by the browser
+    // for a year and also kept in sessionStorage to skip the request entirely
+    function load() {
+        const meta = document.querySelector('meta[name="scoring-tables"]');
+        if (!meta) {
+            return Promise.resolve(null);
+        }
+        const url = meta.getAttribute('content');
+        const cacheKey = `scoringTables:${url}`;
+        try {
+            const cached = sessionStorage.getItem(cacheKey);
+            if (cached) {
+                tables = JSON.parse(cached);
+                return Promise.resolve(tables);
+            }
+        } catch (error) {
+            SecureLogger.warn('Could not read cached scoring tables:', error.name);
+        }
+        return fetch(url, { credentials: 'same-origin' })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                tables = data;
+                try {
+                    sessionStorage.setItem(cacheKey, JSON.stringify(data));
+                } catch (error) {
+                    // Storage full or disabled - the HTTP cache still applies
+                }
+                return tables;
+            })
+            .catch(error => {
+                SecureLogger.warn('Live scoring unavailable:', error.message);
+                return null;
+            });
+    }
+
+    // Answers from earlier segments (saved by saveFormData) overlaid with this page's radios
+    function collectAnswers() {
+        const answers = {};
+        const allData = SecureStorage.getItem('allSegmentData') || {};
+        Object.values(allData).forEach(segmentData => {
+            Object.assign(answers, segmentData || {});
+        });
+        const pageQuestions = new Set();
+        document.querySelectorAll('input[type="radio"]').forEach(radio => pageQuestions.add(radio.name));
+        pageQuestions.forEach(name => {
+            const checked = document.querySelector(`input[name="${name}"]:checked`);
+            if (checked) {
+                answers[name] = checked.value;
+            } else {
+                delete answers[name];
+            }
+        });
+        return answers;
+    }
+
+    // Same rules as compute_subtotals(), recommend_programs() and assess_risk_level()
+    function compute(answers) {
+        const subtotals = {};
+        let total = 0;
+        let answered = 0;
+        tables.factors.forEach(factor => {
+            let subtotal = 0;
+            factor.questions.forEach(name => {
+                const value = parseInt(answers[name], 10);
+                if (!isNaN(value) && tables.questions[name].includes(value)) {
+                    subtotal += value;
+                    answered += 1;
+                }
+            });
+            subtotals[factor.key] = subtotal;
+            total += subtotal;
+        });
+
+        let band = tables.risk_cutoffs.findIndex(cutoff => total <= cutoff);
+        if (band === -1) {
+            band = tables.risk_cutoffs.length;
+        }
+
+        const programs = Object.entries(tables.thresholds)
+            .filter(([key, data]) => (subtotals[key] || 0) >= data.threshold)
+            .map(([, data]) => data.program);
+
+        return {
+            subtotals,
+            total,
+            answered,
+            questions: Object.keys(tables.questions).length,
+            level: tables.risk_levels[band],
+            outcome: tables.risk_outcomes[band],
+            programs
+        };
+    }
+
+    function render(result) {
+        const form = document.getElementById('questionForm');
+        const actions = form ? form.querySelector('.form-actions') : null;
+        if (!actions) {
+            return;
+        }
+        let panel = document.getElementById('live-score');
+        if (!panel) {
+            panel = document.createElement('div');
+            panel.id = 'live-score';
+            panel.className = 'live-score';
+            panel.setAttribute('aria-live', 'polite');
+            form.insertBefore(panel, actions);
+        }
+
+        // Subtotal of the factors asked on this page
+        const segmentMatch = document.body.className.match(/segment-(\d+)/);
+        const segmentId = segmentMatch ? segmentMatch[1] : null;
+        let segmentScore = 0;
+        tables.factors.forEach(factor => {
+            if (segmentId && factor.questions.some(name => name.startsWith(`seg${segmentId}_`))) {
+                segmentScore += result.subtotals[factor.key];
+            }
+        });
+
+        panel.innerHTML = '';
+        const lines = [
+            ['This segment', String(segmentScore)],
+            ['Running total', `${result.total} (${result.answered} of ${result.questions} questions answered)`],
+            ['Provisional risk level', result.level],
+            // Both probation periods, as the results page shows them
+            ['Probation period', `${result.outcome.probation_sentenced} if sentenced to 1 year imprisonment or less, ` +
+                `${result.outcome.probation_other} in all other cases`],
+            ['Supervision', result.outcome.supervision],
+            ['Programs so far', result.programs.length ? result.programs.join(', ') : 'None']
+        ];
+        lines.forEach(([label, value]) => {
+            const line = document.createElement('p');
+            const strong = document.createElement('strong');
+            strong.textContent = `${label}: `;
+            line.appendChild(strong);
+            line.appendChild(document.createTextNode(value));
+            panel.appendChild(line);
+        });
+        const note = document.createElement('p');
+        note.className = 'provisional-note';
+        note.textContent = 'Provisional - the final score is calculated when the assessment is submitted.';
+        panel.appendChild(note);
+    }
+
+    function refresh() {
+        if (!tables) {
+            return;
+        }
+        try {
+            render(compute(collectAnswers()));
+        } catch (error) {
+            SecureLogger.error('Error updating live score:', error);
+        }
+    }
+
+    function init() {
+        return load().then(() => refresh());
+    }
+
+    return {
+        init,
+        refresh,
+        compute
+    };
+})();
+
 document.addEventListener('DOMContentLoaded', function() {
     // Fix overlay issue - ensure overlay is properly hidden
     const overlay = document.querySelector('.overlay');
@@ -864,6 +1040,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Update current score display
     function updateCurrentScore() {
+        LiveScoring.refresh();
         try {
             const radioButtons = document.querySelectorAll('input[type="radio"]:checked');
             let totalScore = 0;
@@ -1559,6 +1736,16 @@ document.addEventListener('DOMContentLoaded', function() {
                 // Save to localStorage as a backup
                 saveFormData();
                 
+                // Swap the segment in place; fall back to the full navigate() round trip
+                const targetMatch = href.match(/segment_(\d+)/);
+                if (targetMatch && window.history && window.history.pushState) {
+                    loadSegmentInPlace(parseInt(targetMatch[1], 10), true).catch(error => {
+                        SecureLogger.warn('Partial navigation failed, loading the full page:', error.message);
+                        window.location.href = href;
+                    });
+                    return;
+                }
+                
                 // Directly navigate to the next page without triggering beforeunload warning
                 setTimeout(() => {
                     window.location.href = href;
@@ -1570,6 +1757,91 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // ==================== PARTIAL NAVIGATION ====================
+
+    // Replace the segment form with another segment's without reloading the page.
+    // The sidebar link's data-fragment URL (navigate_fragment) returns the form
+    // and its token in one request; the address bar is kept in step with the
+    // History API so reloads, Back and Forward still land on the right segment.
+    function loadSegmentInPlace(segmentId, pushHistory) {
+        const link = document.querySelector(`.sidebar-menu a[data-fragment][href$="segment_${segmentId}"]`);
+        if (!link) {
+            return Promise.reject(new Error(`No fragment URL for segment ${segmentId}`));
+        }
+        return fetch(link.dataset.fragment, {
+            credentials: 'same-origin',
+            headers: { 'Accept': 'application/json' }
+        })
+            .then(response => {
+                const contentType = response.headers.get('Content-Type') || '';
+                // An expired session redirects to an HTML page
+                if (!response.ok || response.redirected || !contentType.includes('application/json')) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(fragment => {
+                form.innerHTML = fragment.html;
+                form.setAttribute('action', fragment.action);
+                form.removeAttribute('data-saved');
+
+                const container = form.closest('.container');
+                const heading = container ? container.querySelector('h1') : null;
+                const part = container ? container.querySelector('h1 + p') : null;
+                if (heading) heading.textContent = fragment.title;
+                if (part) part.textContent = `Part ${fragment.segment_id} of 8`;
+                document.title = `${fragment.title} - Risk Assessment`;
+                document.body.className = document.body.className.replace(/segment-\d+/, `segment-${fragment.segment_id}`);
+
+                // Update the URL first: saveFormData() and loadFormData() read the segment from it
+                const state = { segmentId: fragment.segment_id };
+                if (pushHistory) {
+                    history.pushState(state, '', fragment.url);
+                } else {
+                    history.replaceState(state, '', fragment.url);
+                }
+
+                loadFormData();
+                form.querySelectorAll('input[type="radio"]').forEach(radio => {
+                    radio.addEventListener('change', updateCurrentScore);
+                });
+                enhanceAccessibility();
+                updateCurrentScore();
+                updateSidebarCheckmarks();
+                updateResultsLinkVisibility();
+                window.scrollTo(0, 0);
+            });
+    }
+
+    if (form && window.history && window.history.replaceState) {
+        const segmentMatch = document.body.className.match(/segment-(\d+)/);
+        if (segmentMatch) {
+            // Give the entry for the full page load a state so Back can return to it in place
+            history.replaceState({ segmentId: parseInt(segmentMatch[1], 10) }, '', window.location.href);
+        }
+
+        window.addEventListener('popstate', function(e) {
+            if (!e.state || !e.state.segmentId) {
+                return;
+            }
+            // Answers are already saved on every change; the URL has moved on, so don't save here
+            loadSegmentInPlace(e.state.segmentId, false).catch(() => window.location.reload());
+        });
+
+        // The Previous button is inside the swapped form, so listen on the form itself
+        form.addEventListener('click', function(e) {
+            const link = e.target.closest('a[data-segment]');
+            if (!link) {
+                return;
+            }
+            e.preventDefault();
+            saveFormData();
+            loadSegmentInPlace(parseInt(link.dataset.segment, 10), true).catch(() => {
+                window.location.href = link.href;
+            });
+        });
+    }
+
     // Handle window resize
     window.addEventListener('resize', function() {
         if (window.innerWidth > 768) {
@@ -1592,6 +1864,7 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Initialize UI elements
     setupRealTimeScoring();
+    LiveScoring.init();
     updateProgressBar();
     setupTooltips();
     setupSmoothScrolling();
@@ -0,0 +1,85 @@
+"""
+Fragment and bytecode caching for the Jinja templates.
+
+The report templates spend most of their time looping over data that is the
+same for every client - question texts, answer options, reference tables,
+program lists. Wrapping such a section in
+
+    {% cache "name", key1, key2 %} ... {% endcache %}
+
+renders it once per process for each distinct key and reuses the output
+afterwards. The keys must capture everything inside the block that varies
+between clients (the selected answer, the risk level); anything not listed
+as a key is frozen at first render.
+
+The report templates put each tag on a line of its own written {%- cache %}
+and {%- endcache %}: the '-' drops the line break and indentation before the
+tag in place of the ones its own line adds, so the page is byte for byte
+what the template rendered without the tags. A plain {% cache %} line would
+add a blank line each time.
+
+The bytecode cache stores compiled templates on disk, so a fresh worker
+loads them instead of recompiling every template source.
+"""
+
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+# Fragments are keyed by small bounded values; this only guards against a
+# key that accidentally includes free-form input
+MAX_FRAGMENTS = 2048
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class FragmentCacheExtension(Extension):
+    """Adds the {% cache %} tag; the cache lives on the environment"""
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={}, fragment_cache_enabled=True)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.List(key)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        # Templates reloaded from disk in debug mode would otherwise keep
+        # serving fragments rendered from the old source
+        if not self.environment.fragment_cache_enabled or self.environment.auto_reload:
+            return caller()
+        key = _freeze(key)
+        cache = self.environment.fragment_cache
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            if len(cache) < MAX_FRAGMENTS:
+                cache[key] = fragment
+        return fragment
+
+
+def init_app(app):
+    """Install the fragment cache and, if configured, the on-disk bytecode cache"""
+    env = app.jinja_env
+    env.add_extension(FragmentCacheExtension)
+    env.fragment_cache_enabled = app.config['TEMPLATE_FRAGMENT_CACHE']
+
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(directory)
@@ -0,0 +1,78 @@
+"""Packed session answers: round trips, the layout-dependent size, and rejected formats"""
+
+import base64
+import random
+
+import pytest
+
+import answer_codec
+import app as app_module
+
+LAYOUT = app_module.ANSWER_LAYOUT
+
+
+def pack_raw(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def test_round_trip_of_complete_assessments():
+    rng = random.Random(3)
+    for _ in range(200):
+        answers = {segment: [rng.randint(0, answer_codec.MAX_SCORE) for _ in range(count)]
+                   for segment, count in LAYOUT.items()}
+        assert answer_codec.decode(answer_codec.encode(answers, LAYOUT), LAYOUT) == answers
+
+
+def test_unanswered_segments_stay_unanswered():
+    answers = {1: [2, 1, 0, 1, 1, 0], 4: [1, 0, 1, 1, 0, 1]}
+    assert answer_codec.decode(answer_codec.encode(answers, LAYOUT), LAYOUT) == answers
+    assert answer_codec.decode('', LAYOUT) == {}
+
+
+def test_short_score_list_is_padded_with_zeros():
+    decoded = answer_codec.decode(answer_codec.encode({2: [1]}, LAYOUT), LAYOUT)
+    assert decoded == {2: [1] + [0] * (LAYOUT[2] - 1)}
+
+
+def test_packed_size_matches_the_questionnaire():
+    packed = answer_codec.encode({segment: [3] * count for segment, count in LAYOUT.items()}, LAYOUT)
+    assert answer_codec.packed_size(LAYOUT) == 2 + (sum(LAYOUT.values()) * 2 + 7) // 8
+    assert len(packed) == 18
+
+
+@pytest.mark.parametrize('answers', [
+    {1: [4, 0, 0, 0, 0, 0]},
+    {1: [-1]},
+    {2: [0, 0, 0, 0]},
+])
+def test_encode_refuses_scores_that_do_not_fit(answers):
+    with pytest.raises(ValueError):
+        answer_codec.encode(answers, LAYOUT)
+
+
+def test_other_version_is_rejected():
+    raw = bytearray(base64.urlsafe_b64decode(answer_codec.encode({1: [1] * LAYOUT[1]}, LAYOUT) + '=='))
+    raw[0] = answer_codec.VERSION + 1
+    with pytest.raises(answer_codec.AnswerFormatError):
+        answer_codec.decode(pack_raw(bytes(raw)), LAYOUT)
+
+
+def test_answers_packed_for_another_layout_are_rejected():
+    packed = answer_codec.encode({1: [1, 1]}, {1: 2, 2: 2})
+    with pytest.raises(answer_codec.AnswerFormatError):
+        answer_codec.decode(packed, LAYOUT)
+
+
+@pytest.mark.parametrize('packed', ['not base64!', 'A', '{"1": [1, 2]}'])
+def test_garbage_is_rejected(packed):
+    with pytest.raises(answer_codec.AnswerFormatError):
+        answer_codec.decode(packed, LAYOUT)
+
+
+def test_unreadable_session_answers_are_dropped():
+    """A cookie from another format version starts the assessment over instead of scoring garbage"""
+    other_version = pack_raw(bytes([answer_codec.VERSION + 1]) + bytes(answer_codec.packed_size(LAYOUT) - 1))
+    with app_module.app.test_request_context('/'):
+        app_module.session['answers'] = other_version
+        assert app_module.session_answers() == {}
+        assert app_module.segment_scores(1) == []
@@ -0,0 +1,173 @@
+"""Batch intake: reading and validating rows, and queueing a batch for Sheets one client per row"""
+
+import io
+import uuid
+
+import pytest
+
+import app as app_module
+import batch_intake
+
+RULES = app_module.batch_rules
+NAME_COLUMN = app_module.SHEETS_METADATA_COLUMNS['client_name']
+
+
+def client_row(name, score='0'):
+    return [name, '1-year', 'Officer', 'Chief'] + [score] * len(RULES.answer_columns)
+
+
+def to_csv(*records):
+    return ''.join(','.join(record) + '\r\n' for record in records)
+
+
+def test_csv_is_read_by_position_without_a_header():
+    rows = RULES.rows_from_csv(to_csv(client_row('Juan'), client_row('Maria')))
+    assert [row['client_name'] for row in rows] == ['Juan', 'Maria']
+    assert rows[0]['seg8_q5'] == '0'
+
+
+def test_csv_header_matches_columns_by_name():
+    columns = list(reversed(RULES.columns))
+    record = dict(zip(RULES.columns, client_row('Juan')), seg1_q1='2')
+    rows = RULES.rows_from_csv(to_csv(columns, [record[column] for column in columns]))
+    assert rows[0]['client_name'] == 'Juan' and rows[0]['seg1_q1'] == '2'
+
+
+def test_csv_header_missing_columns_is_refused():
+    with pytest.raises(batch_intake.BatchError, match='missing 1 column'):
+        RULES.rows_from_csv(to_csv(RULES.columns[:-1], client_row('Juan')[:-1]))
+
+
+@pytest.mark.parametrize('text', ['', '\r\n , \r\n'])
+def test_empty_csv_is_refused(text):
+    with pytest.raises(batch_intake.BatchError):
+        RULES.rows_from_csv(text)
+
+
+def test_batch_over_the_row_limit_is_refused():
+    rules = batch_intake.BatchIntake({1: [[0, 1]]}, max_rows=2)
+    assert len(rules.rows_from_csv(to_csv(*[['Juan', '1-year', '', '', '1']] * 2))) == 2
+    with pytest.raises(batch_intake.BatchError, match='at most 2'):
+        rules.rows_from_csv(to_csv(*[['Juan', '1-year', '', '', '1']] * 3))
+
+
+def test_blank_grid_rows_are_skipped():
+    form = {'row-0-client_name': 'Juan', 'row-1-client_name': ' ', 'row-2-client_name': 'Maria'}
+    assert [row['client_name'] for row in RULES.rows_from_form(form, 3)] == ['Juan', 'Maria']
+    with pytest.raises(batch_intake.BatchError):
+        RULES.rows_from_form({}, 3)
+
+
+def test_valid_row_is_scored_as_integers():
+    row, = RULES.validate(RULES.rows_from_csv(to_csv(client_row('Juan'))))
+    assert row.valid and row.number == 1
+    assert row.answers == {segment: [0] * count for segment, count in app_module.ANSWER_LAYOUT.items()}
+
+
+def test_invalid_values_are_listed_per_row():
+    rules = batch_intake.BatchIntake({1: [[0, 1], [0, 2]]})
+    good, bad = rules.validate([
+        {'client_name': 'Juan', 'length_of_sentence': '1-year', 'seg1_q1': '1', 'seg1_q2': '2'},
+        {'client_name': '', 'length_of_sentence': 'forever', 'seg1_q1': '2', 'seg1_q2': ''},
+    ])
+    assert good.valid and good.answers == {1: [1, 2]}
+    assert bad.number == 2
+    assert bad.errors == [
+        "client name is missing",
+        "length of sentence 'forever' is not one of " + ', '.join(batch_intake.SENTENCE_LENGTHS),
+        "seg1_q1 is '2', expected one of [0, 1]",
+        "seg1_q2 is missing",
+    ]
+    assert bad.answers == {1: [0, 0]}
+
+
+def test_errors_beyond_the_limit_are_summarised():
+    rules = batch_intake.BatchIntake({1: [[0]] * 10})
+    row, = rules.validate([{'client_name': 'Juan', 'length_of_sentence': '1-year'}])
+    assert len(row.errors) == batch_intake.MAX_ERRORS_PER_ROW + 1
+    assert row.errors[-1] == f"and {10 - batch_intake.MAX_ERRORS_PER_ROW} more"
+
+
+def post_batch(client, *records):
+    """Upload the records as a CSV; names stand for a client row answering every question with 0"""
+    with client.session_transaction() as sess:
+        sess['session_id'] = 'batch-test'
+        sess['csrf_token'] = 'csrf'
+    records = [client_row(record) if isinstance(record, str) else record for record in records]
+    upload = (io.BytesIO(to_csv(*records).encode()), 'batch.csv')
+    return client.post('/batch', data={'csrf_token': 'csrf', 'csv_file': upload},
+                       content_type='multipart/form-data')
+
+
+def unique_names(count):
+    """Client names no other test uses, so earlier batches' idempotency keys don't apply"""
+    tag = uuid.uuid4().hex[:8]
+    return [f'Client {tag} {n}' for n in range(count)]
+
+
+def queued_column(spool, column):
+    return [spool.read(name)['data'][column] for name in spool.names()]
+
+
+def test_batch_is_queued_one_row_per_client_without_posting(client, spool, sheets_endpoint, monkeypatch):
+    replays = []
+    monkeypatch.setattr(app_module, 'replay_sheets_spool_in_background', lambda: replays.append(1))
+    names = unique_names(3)
+    response = post_batch(client, *names)
+    assert response.status_code == 200
+    assert "3 client(s) were saved and are being sent" in response.get_data(as_text=True)
+    assert queued_column(spool, NAME_COLUMN) == names
+    assert sheets_endpoint.posts == [] and replays == [1]
+
+
+def test_replay_posts_the_queued_rows_in_order(client, spool, sheets_endpoint):
+    names = unique_names(3)
+    post_batch(client, *names)
+    assert app_module.replay_sheets_spool() == (3, 0)
+    assert [post[NAME_COLUMN] for post in sheets_endpoint.posts] == names
+
+
+def test_repeated_batch_is_not_queued_again(client, spool):
+    names = unique_names(2)
+    post_batch(client, *names)
+    response = post_batch(client, *names)
+    assert response.status_code == 200
+    assert len(spool) == 2
+    assert "2 client(s) were already saved" in response.get_data(as_text=True)
+
+
+def test_only_rows_that_failed_to_queue_are_retried(client, spool, monkeypatch):
+    names = unique_names(3)
+    add = spool.add
+    failures = [names[1]]
+
+    def flaky_add(email, data, reason):
+        if data[NAME_COLUMN] in failures:
+            failures.remove(data[NAME_COLUMN])
+            raise OSError("disk full")
+        return add(email, data, reason)
+
+    monkeypatch.setattr(spool, 'add', flaky_add)
+    page = post_batch(client, *names).get_data(as_text=True)
+    assert "Failed to save 1 of 3 client(s)" in page
+    post_batch(client, *names)
+    assert queued_column(spool, NAME_COLUMN) == [names[0], names[2], names[1]]
+
+
+def test_each_row_is_scored_with_its_own_length_of_sentence(client, spool):
+    """The Sheets row agrees with the row's PDF, which uses its length of sentence"""
+    short, long = unique_names(2)
+    long_row = client_row(long)
+    long_row[1] = '2-years-or-less'
+    post_batch(client, short, long_row)
+    # All answers 0 is Low Risk: 6 months for 2 years or less, 1 year otherwise
+    assert queued_column(spool, 'Probation Period') == ['1 year', '6 months']
+
+
+def test_batch_with_an_invalid_row_is_not_queued(client, spool):
+    bad = client_row('Maria')
+    bad[1] = 'forever'
+    response = post_batch(client, 'Juan', bad)
+    assert response.status_code == 400
+    assert "1 of 2 client(s) have errors" in response.get_data(as_text=True)
+    assert len(spool) == 0
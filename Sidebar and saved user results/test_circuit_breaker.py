@@ -0,0 +1,102 @@
+"""Circuit breaker state changes and the latency window, on a clock the tests move by hand"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, LatencyWindow
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_breaker(changes=None):
+    """Breaker opening after 3 failures for 30 s; state changes are appended to ``changes``"""
+    on_state_change = None
+    if changes is not None:
+        def on_state_change(breaker, previous, state):
+            changes.append((previous, state))
+    return CircuitBreaker('office', failure_threshold=3, reset_timeout=30, on_state_change=on_state_change)
+
+
+def test_opens_after_consecutive_failures(clock):
+    changes = []
+    breaker = make_breaker(changes)
+    breaker.record_failure('HTTP 500')
+    breaker.record_failure('HTTP 500')
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure('ReadTimeout')
+    assert breaker.state == OPEN
+    assert changes == [(CLOSED, OPEN)]
+    assert breaker.last_failure == 'ReadTimeout'
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success(clock):
+    changes = []
+    breaker = make_breaker(changes)
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 29
+    assert not breaker.allow()
+    assert breaker.retry_after() == pytest.approx(1)
+    clock[0] += 1
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert changes == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+def test_half_open_probe_failure_opens_again(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_failure('HTTP 429')
+    assert breaker.state == OPEN
+    assert breaker.snapshot()['next_probe_in'] == 30.0
+
+
+def test_skipped_probe_frees_the_slot(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    clock[0] += 30
+    assert breaker.allow()
+    breaker.record_skipped()
+    assert breaker.allow()
+
+
+def test_snapshot(clock):
+    breaker = make_breaker()
+    breaker.record_failure('HTTP 503')
+    assert breaker.snapshot() == {'state': CLOSED, 'consecutive_failures': 1, 'last_failure': 'HTTP 503',
+                                  'next_probe_in': 0.0}
+
+
+def test_latency_window_percentiles():
+    window = LatencyWindow(size=100)
+    assert window.percentiles() == {'count': 0, 'p50_ms': None, 'p90_ms': None, 'p99_ms': None}
+    for ms in range(1, 201):
+        window.observe(ms / 1000)
+    # Only the last 100 samples (101-200 ms) are kept
+    assert window.percentiles() == {'count': 100, 'p50_ms': 150.0, 'p90_ms': 190.0, 'p99_ms': 199.0}
@@ -0,0 +1,75 @@
+"""Cold start: heavy libraries stay unimported until used, and the Google client registers from the on-disk cache"""
+
+import json
+import os
+import subprocess
+import sys
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+
+import app as app_module
+import oauth_cache
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+METADATA = {
+    'issuer': 'https://accounts.google.com',
+    'authorization_endpoint': 'https://accounts.google.com/o/oauth2/v2/auth',
+    'token_endpoint': 'https://oauth2.googleapis.com/token',
+    'jwks_uri': 'https://www.googleapis.com/oauth2/v3/certs'
+}
+JWKS = {'keys': [{'kid': 'cached'}]}
+
+
+def test_importing_the_app_leaves_heavy_libraries_unimported(tmp_path):
+    env = dict(os.environ, PYTHONPATH=APP_DIR, OAUTH_CACHE_PATH=str(tmp_path / 'oauth.json'),
+               SUBMISSION_KEYS_DIR=str(tmp_path / 'submissions'), SHEETS_SPOOL_DIR=str(tmp_path / 'spool'),
+               JINJA_BYTECODE_CACHE_DIR=str(tmp_path / 'jinja'))
+    code = ("import json, sys, app; "
+            "print(json.dumps([name for name in ('weasyprint', 'authlib', 'requests') if name in sys.modules]))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+
+@pytest.fixture
+def fresh_client(monkeypatch, tmp_path):
+    """Forget the registered Google client and point the cache at a new file"""
+    pytest.importorskip('authlib')
+    path = str(tmp_path / 'google_openid_cache.json')
+    monkeypatch.setattr(app_module, '_google_client', None)
+    monkeypatch.setitem(app_module.app.config, 'OAUTH_CACHE_PATH', path)
+    return path
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    """Fail any HTTP request Authlib or the cache would make"""
+    def refuse(*args, **kwargs):
+        raise requests.ConnectionError('offline')
+    monkeypatch.setattr(requests.Session, 'request', refuse)
+    monkeypatch.setattr(requests, 'get', refuse)
+
+
+def test_client_registered_from_a_fresh_cache_needs_no_network(fresh_client, offline):
+    oauth_cache.write_cache(fresh_client, METADATA, JWKS)
+    google = app_module.get_google_client()
+    assert google is app_module.get_google_client()
+    metadata = google.load_server_metadata()
+    assert metadata['authorization_endpoint'] == METADATA['authorization_endpoint']
+    assert metadata['jwks'] == JWKS
+
+    response = app_module.app.test_client().get('/login_google')
+    assert response.status_code == 302
+    location = urlsplit(response.headers['Location'])
+    assert f'{location.scheme}://{location.netloc}{location.path}' == METADATA['authorization_endpoint']
+
+
+def test_client_falls_back_to_discovery_without_a_cache(fresh_client, offline):
+    google = app_module.get_google_client()
+    assert '_loaded_at' not in google.server_metadata
+    # Discovery is left to Authlib, which fetches on first use
+    with pytest.raises(requests.ConnectionError):
+        google.load_server_metadata()
@@ -0,0 +1,141 @@
+"""The columnar analytics export: incremental appends, compaction, and the export state surviving failures"""
+
+import argparse
+import csv
+import json
+import os
+
+import pytest
+
+import app as app_module
+import columnar_export
+
+pa = pytest.importorskip('pyarrow')
+columnar_export._pyarrow()
+
+QUESTIONS = [column for column, _ in columnar_export.question_columns()]
+HEADER = (['Timestamp'] + list(app_module.SHEETS_METADATA_COLUMNS.values()) + QUESTIONS
+          + list(columnar_export.RESULT_COLUMNS))
+
+
+def sheet_row(n):
+    """Row n of the sheet, submitted n minutes after 9:00 with answers that vary by n"""
+    scores = {i: [(n + i + q) % 3 for q in range(len(columns))]
+              for i, columns in app_module.SHEETS_ANSWER_COLUMNS.items()}
+    _, total = app_module.compute_subtotals(scores)
+    risk = app_module.assess_risk_level(total, '1-year')
+    return ([f'10/19/2026 09:{n:02d}:00', f'officer{n}@example.gov.ph', f'Client {n}', '1-year', 'Officer', 'Chief']
+            + [str(value) for i in scores for value in scores[i]]
+            + [risk['level'], risk['probation'], risk['supervision']])
+
+
+def write_export(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def append(source, dataset, fmt=None):
+    columnar_export.append(argparse.Namespace(input=source, dataset=dataset, format=fmt, block_size=1))
+
+
+def read_all(dataset):
+    table = columnar_export.open_dataset(pa, dataset).to_table()
+    return sorted(table.to_pylist(), key=lambda row: row['timestamp'])
+
+
+def parts(dataset, fmt='ipc'):
+    return columnar_export.part_files(dataset, fmt)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    return str(tmp_path / 'assessments')
+
+
+@pytest.mark.parametrize('fmt', ['ipc', 'parquet'])
+def test_append_only_converts_rows_newer_than_the_last_export(tmp_path, dataset, fmt):
+    rows = [sheet_row(n) for n in range(10)]
+    append(write_export(tmp_path / 'first.csv', rows[:6]), dataset, fmt)
+    assert len(parts(dataset, fmt)) == 1
+    state = columnar_export.read_state(dataset)
+    assert state == {'format': fmt, 'watermark': '2026-10-19 09:05:00', 'rows': 6}
+
+    # The sheet has grown; the second export repeats the first six rows
+    append(write_export(tmp_path / 'second.csv', rows), dataset)
+    assert len(parts(dataset, fmt)) == 2
+    assert columnar_export.read_state(dataset)['rows'] == 10
+    assert [row['email'] for row in read_all(dataset)] == [f'officer{n}@example.gov.ph' for n in range(10)]
+
+    # Nothing new: no part and no state change
+    append(write_export(tmp_path / 'third.csv', rows), dataset)
+    assert len(parts(dataset, fmt)) == 2
+    assert columnar_export.read_state(dataset)['watermark'] == '2026-10-19 09:09:00'
+
+
+def test_subtotals_match_the_app(tmp_path, dataset):
+    append(write_export(tmp_path / 'export.csv', [sheet_row(n) for n in range(5)]), dataset)
+    for n, row in enumerate(read_all(dataset)):
+        scores = {i: [row[f'seg{i}_q{q}'] for q in range(1, len(columns) + 1)]
+                  for i, columns in app_module.SHEETS_ANSWER_COLUMNS.items()}
+        subtotals, total = app_module.compute_subtotals(scores)
+        assert row['total_score'] == total
+        assert row['education_total'] == subtotals[5] and row['employment_total'] == subtotals[6]
+        assert [row[f'segment{i}_total'] for i in range(1, 9)] == [sum(scores[i]) for i in range(1, 9)]
+        assert row['risk_level'] == sheet_row(n)[-3]
+
+
+def test_compact_merges_the_parts(tmp_path, dataset):
+    rows = [sheet_row(n) for n in range(9)]
+    for end in (3, 6, 9):
+        append(write_export(tmp_path / f'export{end}.csv', rows[:end]), dataset)
+    before = read_all(dataset)
+    state = columnar_export.read_state(dataset)
+    assert len(parts(dataset)) == 3
+
+    columnar_export.compact(argparse.Namespace(dataset=dataset))
+    assert len(parts(dataset)) == 1
+    assert read_all(dataset) == before
+    assert columnar_export.read_state(dataset) == state
+    assert sorted(os.listdir(dataset)) == sorted([columnar_export.STATE_FILE, os.path.basename(parts(dataset)[0])])
+
+    # A single part is left alone
+    columnar_export.compact(argparse.Namespace(dataset=dataset))
+    assert len(parts(dataset)) == 1
+
+
+def test_failed_append_leaves_the_dataset_as_it_was(tmp_path, dataset):
+    rows = [sheet_row(n) for n in range(4)]
+    append(write_export(tmp_path / 'good.csv', rows[:2]), dataset)
+    state = columnar_export.read_state(dataset)
+    listing = sorted(os.listdir(dataset))
+
+    bad = [list(row) for row in rows]
+    bad[3][len(HEADER) - len(columnar_export.RESULT_COLUMNS) - 1] = 'two'
+    with pytest.raises(pa.ArrowInvalid):
+        append(write_export(tmp_path / 'bad.csv', bad), dataset)
+    # No half-written part or temp file, and the watermark still covers only what was exported
+    assert sorted(os.listdir(dataset)) == listing
+    assert columnar_export.read_state(dataset) == state
+
+    append(write_export(tmp_path / 'fixed.csv', rows), dataset)
+    assert len(read_all(dataset)) == 4
+
+
+def test_format_is_fixed_by_the_first_append(tmp_path, dataset):
+    source = write_export(tmp_path / 'export.csv', [sheet_row(0)])
+    append(source, dataset, 'parquet')
+    with pytest.raises(SystemExit):
+        append(source, dataset, 'ipc')
+
+
+def test_state_is_replaced_atomically(tmp_path):
+    directory = str(tmp_path)
+    columnar_export.write_state(directory, {'rows': 1})
+    columnar_export.write_state(directory, {'rows': 2})
+    assert os.listdir(directory) == [columnar_export.STATE_FILE]
+    with open(tmp_path / columnar_export.STATE_FILE) as f:
+        assert json.load(f) == {'rows': 2}
+    assert columnar_export.read_state(str(tmp_path / 'missing')) == {}
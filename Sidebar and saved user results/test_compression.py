@@ -0,0 +1,106 @@
+"""Negotiated response compression, on a small app with the same after_request hook"""
+
+import gzip
+
+import pytest
+from flask import Flask, Response, request, send_file
+from werkzeug.http import parse_accept_header
+
+import compression
+
+PAGE = '<p>' + 'risk assessment ' * 200 + '</p>'
+
+
+def accept(header):
+    return parse_accept_header(header)
+
+
+@pytest.fixture
+def client(tmp_path):
+    app = Flask(__name__)
+    app.config.update(COMPRESS_MIN_SIZE=512, COMPRESS_GZIP_LEVEL=6, COMPRESS_BROTLI_LEVEL=5,
+                      COMPRESS_CPU_BUDGET_MS=1000)
+    pdf = tmp_path / 'report.pdf'
+    pdf.write_bytes(b'%PDF-1.4 ' * 200)
+
+    @app.route('/page')
+    def page():
+        # The app's conditional_page: a 304 for any coding of the ETag
+        if any(tag in request.if_none_match for tag in compression.etag_variants('abc')):
+            response = Response(status=304)
+        else:
+            response = Response(PAGE, mimetype='text/html')
+        response.set_etag('abc')
+        return response
+
+    @app.route('/small')
+    def small():
+        return 'ok'
+
+    @app.route('/pdf')
+    def pdf_bytes():
+        return Response(pdf.read_bytes(), mimetype='application/pdf')
+
+    @app.route('/file')
+    def file():
+        return send_file(str(pdf), mimetype='text/plain')
+
+    compression.init_app(app)
+    return app.test_client()
+
+
+@pytest.mark.parametrize('header, brotli_available, expected', [
+    ('gzip, deflate, br', True, 'br'),
+    ('gzip, deflate, br', False, 'gzip'),
+    ('gzip;q=1.0, br;q=0.5', True, 'gzip'),
+    ('br;q=0, gzip', True, 'gzip'),
+    ('deflate', True, None),
+    ('', True, None),
+])
+def test_negotiate(header, brotli_available, expected):
+    assert compression.negotiate(accept(header), brotli_available) == expected
+
+
+def test_page_is_gzipped_with_a_distinct_etag(client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.get_etag() == ('abc-gzip', False)
+    assert gzip.decompress(response.get_data()).decode() == PAGE
+
+
+def test_conditional_request_gets_a_304_for_the_compressed_variant(client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip', 'If-None-Match': '"abc-gzip"'})
+    assert response.status_code == 304
+    assert response.get_etag() == ('abc-gzip', False)
+
+
+def test_identity_when_the_client_does_not_accept_compression(client):
+    response = client.get('/page', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == PAGE
+    assert response.get_etag() == ('abc', False)
+
+
+@pytest.mark.parametrize('path', ['/small', '/pdf', '/file'])
+def test_small_pdf_and_file_responses_are_left_alone(client, path):
+    response = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    response.close()
+
+
+def test_over_the_cpu_budget_is_sent_uncompressed(client, monkeypatch):
+    monkeypatch.setattr(compression, 'brotli', None)
+    client.application.config['COMPRESS_CPU_BUDGET_MS'] = 0
+    # Each chunk appears to take a full second of CPU
+    ticks = iter(range(1000))
+    monkeypatch.setattr(compression.time, 'thread_time', lambda: next(ticks))
+    response = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data(as_text=True) == PAGE
+
+
+def test_etag_variants():
+    assert compression.etag_variants('abc') == ['abc', 'abc-br', 'abc-gzip']
@@ -0,0 +1,75 @@
+"""Repeat visits to segment and results pages: stable URLs and 304s for the browser's cached copy"""
+
+import itertools
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture(autouse=True)
+def ticking_clock(monkeypatch):
+    """Every token is minted in a new second, as across real clicks"""
+    seconds = itertools.count(1_700_000_000)
+    generate = app_module.generate_secure_token
+    monkeypatch.setattr(app_module, 'generate_secure_token',
+                        lambda text, salt=None: generate(text, salt or str(next(seconds))))
+
+
+def start_assessment(client):
+    client.post('/', data={'client_name': 'Juan', 'length_of_sentence': '1-year',
+                           'officer_name': 'Officer', 'chief_name': 'Chief'})
+
+
+def visit(client, target, etag=None):
+    """Follow a sidebar link: /navigate/<target>, then the page it redirects to"""
+    location = client.get(f'/navigate/{target}').headers['Location']
+    headers = {'If-None-Match': f'"{etag}"'} if etag else {}
+    return location, client.get(location, headers=headers)
+
+
+def test_sidebar_revisit_of_a_segment_is_answered_with_304(client):
+    start_assessment(client)
+    first_url, first = visit(client, 'segment_2')
+    assert first.status_code == 200
+    etag, _ = first.get_etag()
+
+    visit(client, 'segment_3')
+    second_url, second = visit(client, 'segment_2', etag)
+    assert second_url == first_url
+    assert second.status_code == 304
+    assert second.get_etag() == (etag, False)
+
+
+def test_saved_answers_change_the_segment_etag(client):
+    start_assessment(client)
+    _, first = visit(client, 'segment_1')
+    etag, _ = first.get_etag()
+    with client.session_transaction() as sess:
+        token = sess['current_segment_token']
+    form = {'token': token, **{f'seg1_q{q}': '1' for q in range(1, app_module.ANSWER_LAYOUT[1] + 1)}}
+    client.post('/segment/1', data=form)
+    _, again = visit(client, 'segment_1', etag)
+    assert again.status_code == 200
+    assert again.get_etag()[0] != etag
+
+
+def test_new_assessment_gets_new_segment_urls_and_pages(client):
+    start_assessment(client)
+    first_url, first = visit(client, 'segment_2')
+    etag, _ = first.get_etag()
+    start_assessment(client)
+    second_url, second = visit(client, 'segment_2', etag)
+    assert second_url != first_url
+    assert second.status_code == 200
+
+
+def test_sidebar_revisit_of_results_is_answered_with_304(client):
+    start_assessment(client)
+    first_url, first = visit(client, 'results')
+    assert first.status_code == 200
+    etag, _ = first.get_etag()
+    visit(client, 'segment_4')
+    second_url, second = visit(client, 'results', etag)
+    assert second_url == first_url
+    assert second.status_code == 304
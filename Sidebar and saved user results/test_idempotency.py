@@ -0,0 +1,126 @@
+"""Idempotency keys for the final submission: claim, complete, release, and the segment 8 route"""
+
+import os
+import re
+import threading
+import time
+
+import app as app_module
+import idempotency
+
+
+def test_first_claim_wins(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path))
+    assert store.claim('abc')
+    assert not store.claim('abc')
+    assert store.outcome('abc') is None
+
+
+def test_completed_key_returns_its_outcome(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path))
+    store.claim('abc')
+    store.complete('abc', {'results_token': 't1'})
+    assert not store.claim('abc')
+    assert store.outcome('abc') == {'results_token': 't1'}
+    assert store.wait('abc', timeout=0) == {'results_token': 't1'}
+    # Other stores on the same directory (other workers) see it too
+    assert idempotency.IdempotencyStore(str(tmp_path)).outcome('abc') == {'results_token': 't1'}
+
+
+def test_released_key_can_be_claimed_again(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path))
+    store.claim('abc')
+    store.release('abc')
+    assert store.wait('abc', timeout=5) is None
+    assert store.claim('abc')
+    store.release('missing')
+
+
+def test_wait_returns_the_outcome_recorded_meanwhile(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path))
+    store.claim('abc')
+    timer = threading.Timer(0.2, store.complete, ('abc', {'outcome': 'sent'}))
+    timer.start()
+    try:
+        assert store.wait('abc', timeout=5) == {'outcome': 'sent'}
+    finally:
+        timer.cancel()
+
+
+def test_wait_gives_up_after_the_timeout(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path))
+    store.claim('abc')
+    started = time.monotonic()
+    assert store.wait('abc', timeout=0.2) is None
+    assert time.monotonic() - started < 2
+
+
+def test_stale_claim_is_taken_over(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path), stale_after=60)
+    store.claim('abc')
+    old = time.time() - 120
+    os.utime(tmp_path / 'abc.claim', (old, old))
+    assert store.claim('abc')
+
+
+def test_expired_entries_are_purged(tmp_path):
+    store = idempotency.IdempotencyStore(str(tmp_path), ttl=60)
+    store.claim('old')
+    store.complete('old', {'outcome': 'sent'})
+    expired = time.time() - 120
+    for name in ('old.claim', 'old.json'):
+        os.utime(tmp_path / name, (expired, expired))
+    store._last_purge = 0
+    assert store.claim('new')
+    assert sorted(os.listdir(tmp_path)) == ['new.claim']
+
+
+def submit_assessment(client):
+    """Answer every segment with 0s; returns the final segment 8 response"""
+    response = client.post('/', data={'client_name': 'Juan', 'length_of_sentence': '1-year',
+                                      'officer_name': 'Officer', 'chief_name': 'Chief'})
+    for segment_id in range(1, 9):
+        page = client.get(response.headers['Location']).get_data(as_text=True)
+        form = {'token': re.search(r'name="token" value="([^"]+)"', page).group(1)}
+        form.update({f'seg{segment_id}_q{q}': '0' for q in range(1, app_module.ANSWER_LAYOUT[segment_id] + 1)})
+        response = client.post(f'/segment/{segment_id}', data=form)
+    return response
+
+
+def resubmit_segment_8(client):
+    with client.session_transaction() as sess:
+        token = sess['current_segment_token']
+    form = {'token': token, **{f'seg8_q{q}': '0' for q in range(1, app_module.ANSWER_LAYOUT[8] + 1)}}
+    return client.post('/segment/8', data=form)
+
+
+def test_failed_final_submission_is_retried(client, monkeypatch):
+    outcomes = ['failed', 'sent']
+    posts = []
+
+    def fake_submit(ordered_data, email):
+        posts.append(ordered_data)
+        return outcomes.pop(0)
+
+    monkeypatch.setattr(app_module, 'submit_to_sheets', fake_submit)
+    assert submit_assessment(client).status_code == 302
+    assert len(posts) == 1
+    # The failed post left nothing behind, so submitting again posts again...
+    assert resubmit_segment_8(client).status_code == 302
+    assert len(posts) == 2
+    # ...and once it was sent, a repeat is answered without posting
+    assert resubmit_segment_8(client).status_code == 302
+    assert len(posts) == 2
+
+
+def test_final_submission_that_raises_is_retried(client, monkeypatch):
+    posts = []
+
+    def failing_submit(ordered_data, email):
+        posts.append(ordered_data)
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(app_module, 'submit_to_sheets', failing_submit)
+    submit_assessment(client)
+    resubmit_segment_8(client)
+    assert len(posts) == 2
@@ -0,0 +1,98 @@
+"""The Prometheus registry: exposition format, label escaping, histogram buckets, and the /metrics endpoint"""
+
+import pytest
+
+import app as app_module
+import metrics
+
+
+def test_counter_exposition():
+    registry = metrics.Registry()
+    counter = registry.counter('jobs_total', 'Jobs run', ('queue',))
+    counter.inc(queue='pdf')
+    counter.inc(2, queue='pdf')
+    counter.inc(0.5, queue='batch')
+    assert registry.render() == (
+        '# HELP jobs_total Jobs run\n'
+        '# TYPE jobs_total counter\n'
+        'jobs_total{queue="batch"} 0.5\n'
+        'jobs_total{queue="pdf"} 3\n'
+    )
+
+
+def test_unlabelled_gauge_goes_up_and_down():
+    registry = metrics.Registry()
+    gauge = registry.gauge('in_flight', 'Requests in flight')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert registry.render().splitlines()[-1] == 'in_flight 1'
+    gauge.set(7.0)
+    assert registry.render().splitlines()[-1] == 'in_flight 7'
+
+
+def test_label_values_are_escaped():
+    registry = metrics.Registry()
+    counter = registry.counter('errors_total', 'Errors', ('reason',))
+    counter.inc(reason='say "hi"\\n\nnext')
+    assert registry.render().splitlines()[-1] == 'errors_total{reason="say \\"hi\\"\\\\n\\nnext"} 1'
+
+
+def test_wrong_labels_are_refused():
+    counter = metrics.Registry().counter('errors_total', 'Errors', ('reason',))
+    with pytest.raises(ValueError):
+        counter.inc()
+    with pytest.raises(ValueError):
+        counter.inc(reason='x', office='y')
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = metrics.Registry()
+    histogram = registry.histogram('latency_seconds', 'Latency', ('route',), buckets=(1, 0.1, 0.5))
+    for value in (0.05, 0.1, 0.3, 0.7, 2):
+        histogram.observe(value, route='pdf')
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{route="pdf",le="0.1"} 2',
+        'latency_seconds_bucket{route="pdf",le="0.5"} 3',
+        'latency_seconds_bucket{route="pdf",le="1"} 4',
+        'latency_seconds_bucket{route="pdf",le="+Inf"} 5',
+        'latency_seconds_sum{route="pdf"} 3.15',
+        'latency_seconds_count{route="pdf"} 5',
+    ]
+
+
+def test_histogram_times_a_block_even_when_it_raises(monkeypatch):
+    histogram = metrics.Registry().histogram('work_seconds', 'Work', buckets=(1,))
+    ticks = iter([10.0, 10.25])
+    monkeypatch.setattr(metrics.time, 'perf_counter', lambda: next(ticks))
+    with pytest.raises(RuntimeError):
+        with histogram.time():
+            raise RuntimeError()
+    assert histogram.render()[2:] == ['work_seconds_bucket{le="1"} 1', 'work_seconds_bucket{le="+Inf"} 1',
+                                      'work_seconds_sum 0.25', 'work_seconds_count 1']
+
+
+def test_app_metrics_have_help_and_type_lines():
+    lines = metrics.REGISTRY.render().splitlines()
+    names = {line.split()[2] for line in lines if line.startswith('# TYPE')}
+    assert {'http_request_duration_seconds', 'sheets_spooled_total', 'batch_submissions_total'} <= names
+    for line in lines:
+        if not line.startswith('#'):
+            assert line.split('{')[0].split(' ')[0].startswith(tuple(names))
+
+
+def test_metrics_endpoint_is_hidden_without_a_token(monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'METRICS_TOKEN', '')
+    assert app_module.app.test_client().get('/metrics').status_code == 404
+
+
+def test_metrics_endpoint_needs_the_token(monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'METRICS_TOKEN', 'scrape')
+    client = app_module.app.test_client()
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+    assert response.status_code == 200
+    assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+    # Scrapes are left out of the request timings they report
+    assert 'route="metrics_endpoint"' not in response.get_data(as_text=True)
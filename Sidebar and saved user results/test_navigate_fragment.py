@@ -0,0 +1,42 @@
+"""In-place sidebar navigation: the fragment endpoint and the URLs segment.html gives main.js for it"""
+
+import re
+
+import pytest
+
+
+def start_assessment(client):
+    response = client.post('/', data={'client_name': 'Juan', 'length_of_sentence': '1-year',
+                                      'officer_name': 'Officer', 'chief_name': 'Chief'})
+    return response.headers['Location']
+
+
+def test_fragment_has_the_segment_form_and_its_url(client):
+    start_assessment(client)
+    response = client.get('/navigate/segment_3/fragment')
+    assert response.status_code == 200
+    assert 'no-store' in response.headers['Cache-Control']
+    fragment = response.get_json()
+    assert fragment['segment_id'] == 3
+    assert fragment['action'] == '/segment/3'
+    # The same URL a full sidebar navigation lands on
+    assert client.get('/navigate/segment_3').headers['Location'].endswith(fragment['url'])
+    token = re.search(r'token=(\w+)', fragment['url']).group(1)
+    assert f'name="token" value="{token}"' in fragment['html']
+    assert 'name="seg3_q1"' in fragment['html']
+
+
+@pytest.mark.parametrize('target', ['results', 'index', 'segment_9', 'segment_x'])
+def test_only_segments_have_fragments(client, target):
+    start_assessment(client)
+    assert client.get(f'/navigate/{target}/fragment').status_code == 404
+
+
+def test_fragment_needs_a_session(client):
+    assert client.get('/navigate/segment_1/fragment').status_code == 302
+
+
+def test_segment_page_links_the_fragment_urls(client):
+    page = client.get(start_assessment(client)).get_data(as_text=True)
+    links = re.findall(r'href="(/navigate/segment_\d)" data-fragment="([^"]+)"', page)
+    assert links == [(f'/navigate/segment_{i}', f'/navigate/segment_{i}/fragment') for i in range(1, 9)]
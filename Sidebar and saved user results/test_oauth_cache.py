@@ -0,0 +1,181 @@
+"""The cached Google OpenID metadata and the login profile taken from the verified ID token"""
+
+import json
+
+import pytest
+
+import app as app_module
+import oauth_cache
+
+METADATA = {'issuer': 'https://accounts.google.com', 'jwks_uri': 'https://www.googleapis.com/oauth2/v3/certs'}
+JWKS = {'keys': [{'kid': 'first'}]}
+ROTATED_JWKS = {'keys': [{'kid': 'second'}]}
+
+
+class Fetcher:
+    """Stands in for oauth_cache.fetch, counting calls; fails with the given exception if set"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, metadata_url=oauth_cache.GOOGLE_METADATA_URL, timeout=5):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return dict(METADATA, fetched=self.calls), JWKS
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / 'instance' / 'google_openid_cache.json')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Settable time.time() for the cache's ages"""
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(oauth_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def use_fetcher(monkeypatch, error=None):
+    fetcher = Fetcher(error)
+    monkeypatch.setattr(oauth_cache, 'fetch', fetcher)
+    return fetcher
+
+
+def test_fresh_cache_is_used_without_fetching(monkeypatch, cache_path, clock):
+    fetcher = use_fetcher(monkeypatch)
+    first = oauth_cache.load(cache_path, ttl=60)
+    clock[0] += 59
+    second = oauth_cache.load(cache_path, ttl=60)
+    assert fetcher.calls == 1
+    assert first == second
+    assert second['jwks'] == JWKS and second['issuer'] == METADATA['issuer']
+    # Authlib treats metadata with _loaded_at as already loaded
+    assert second['_loaded_at'] == clock[0] - 59
+
+
+def test_expired_cache_is_refreshed(monkeypatch, cache_path, clock):
+    fetcher = use_fetcher(monkeypatch)
+    oauth_cache.load(cache_path, ttl=60)
+    clock[0] += 60
+    metadata = oauth_cache.load(cache_path, ttl=60)
+    assert fetcher.calls == 2 and metadata['fetched'] == 2
+    assert oauth_cache.read_cache(cache_path)['fetched_at'] == clock[0]
+
+
+def test_stale_cache_is_used_when_the_fetch_fails(monkeypatch, cache_path, clock):
+    use_fetcher(monkeypatch)
+    oauth_cache.load(cache_path, ttl=60)
+    clock[0] += 3600
+    fetcher = use_fetcher(monkeypatch, OSError('network is unreachable'))
+    metadata = oauth_cache.load(cache_path, ttl=60)
+    assert fetcher.calls == 1
+    assert metadata['fetched'] == 1 and metadata['jwks'] == JWKS
+    # Still stale, so the next load tries again
+    oauth_cache.load(cache_path, ttl=60)
+    assert fetcher.calls == 2
+
+
+@pytest.mark.parametrize('contents', [None, 'not json', '[]', '{"fetched_at": 1}'])
+def test_no_usable_cache_and_no_fetch_gives_none(monkeypatch, cache_path, contents):
+    if contents is not None:
+        oauth_cache.write_cache(cache_path, {}, None)
+        with open(cache_path, 'w') as f:
+            f.write(contents)
+    use_fetcher(monkeypatch, ValueError('bad discovery document'))
+    assert oauth_cache.load(cache_path) is None
+    assert oauth_cache.load(cache_path, allow_fetch=False) is None
+
+
+def test_stale_cache_is_used_as_is_when_fetching_is_off(monkeypatch, cache_path, clock):
+    use_fetcher(monkeypatch)
+    oauth_cache.load(cache_path, ttl=60)
+    clock[0] += 3600
+    fetcher = use_fetcher(monkeypatch)
+    assert oauth_cache.load(cache_path, ttl=60, allow_fetch=False)['fetched'] == 1
+    assert fetcher.calls == 0
+
+
+def test_rotated_keys_are_written_back(monkeypatch, cache_path):
+    assert not oauth_cache.remember_jwks(cache_path, ROTATED_JWKS)
+    use_fetcher(monkeypatch)
+    oauth_cache.load(cache_path)
+    assert not oauth_cache.remember_jwks(cache_path, JWKS)
+    assert not oauth_cache.remember_jwks(cache_path, None)
+    assert oauth_cache.remember_jwks(cache_path, ROTATED_JWKS)
+    with open(cache_path) as f:
+        entry = json.load(f)
+    assert entry['jwks'] == ROTATED_JWKS and entry['metadata']['issuer'] == METADATA['issuer']
+
+
+class GoogleClient:
+    """Stands in for the registered Authlib client after the token exchange"""
+
+    def __init__(self, token, userinfo=None):
+        self.token = token
+        self.userinfo = userinfo
+        self.userinfo_calls = 0
+        self.server_metadata = {'jwks': ROTATED_JWKS}
+
+    def authorize_access_token(self):
+        return dict(self.token)
+
+    def get(self, url, token=None):
+        self.userinfo_calls += 1
+        userinfo = self.userinfo
+
+        class Response:
+            def json(self):
+                return userinfo
+        return Response()
+
+
+def log_in(monkeypatch, google):
+    monkeypatch.setattr(app_module, 'get_google_client', lambda: google)
+    client = app_module.app.test_client()
+    response = client.get('/authorize')
+    with client.session_transaction() as sess:
+        return response, dict(sess)
+
+
+CLAIMS = {'sub': '1234', 'email': 'officer@probation.gov.ph', 'email_verified': True, 'name': 'Officer',
+          'nonce': 'n-0S6', 'aud': 'client-id'}
+
+
+def test_login_takes_the_profile_from_the_id_token(monkeypatch, cache_path):
+    monkeypatch.setitem(app_module.app.config, 'OAUTH_CACHE_PATH', cache_path)
+    use_fetcher(monkeypatch)
+    oauth_cache.load(cache_path)
+    google = GoogleClient({'access_token': 'a', 'id_token': 'signed', 'userinfo': CLAIMS})
+    response, sess = log_in(monkeypatch, google)
+    assert response.status_code == 302 and response.headers['Location'].endswith('/')
+    assert google.userinfo_calls == 0
+    assert sess['email'] == CLAIMS['email']
+    assert sess['user'] == {key: CLAIMS[key] for key in ('sub', 'email', 'email_verified', 'name')}
+    assert 'userinfo' not in sess['google_token']
+    # Keys Authlib re-fetched during the exchange are kept for the other workers
+    assert oauth_cache.read_cache(cache_path)['jwks'] == ROTATED_JWKS
+
+
+@pytest.mark.parametrize('claims', [None, {'sub': '1234'}, dict(CLAIMS, email_verified=False)])
+def test_login_without_usable_claims_asks_the_userinfo_endpoint(monkeypatch, tmp_path, claims):
+    monkeypatch.setitem(app_module.app.config, 'OAUTH_CACHE_PATH', str(tmp_path / 'cache.json'))
+    token = {'access_token': 'a'}
+    if claims is not None:
+        token['userinfo'] = claims
+    google = GoogleClient(token, userinfo={'email': 'from-userinfo@probation.gov.ph'})
+    response, sess = log_in(monkeypatch, google)
+    assert google.userinfo_calls == 1
+    assert sess['email'] == 'from-userinfo@probation.gov.ph'
+
+
+def test_failed_token_exchange_goes_back_to_login(monkeypatch):
+    class Failing(GoogleClient):
+        def authorize_access_token(self):
+            raise ValueError('invalid nonce')
+    response, sess = log_in(monkeypatch, Failing({}))
+    assert response.headers['Location'].endswith('/login')
+    assert 'google_token' not in sess
@@ -0,0 +1,175 @@
+"""The direct PDF backend against the pdf_template.html path, and admission of the PDF routes under load"""
+
+import html
+import re
+import zlib
+
+import pytest
+
+import app as app_module
+import pdf_direct
+import rate_limit
+
+ANSWERS = {i: [(i + q) % 2 for q in range(count)] for i, count in app_module.ANSWER_LAYOUT.items()}
+FIELDS = dict(length_of_sentence='1-year', client_name='Juan (J.) dela Cruz',
+              officer_name='Officer Reyes', chief_name='Chief Santos')
+
+
+def report_context(answers=ANSWERS, notes='Reports every Monday.'):
+    with app_module.app.test_request_context('/'):
+        return app_module.build_pdf_context(answers=answers, notes=notes, **FIELDS)
+
+
+def template_html(context):
+    with app_module.app.test_request_context('/'):
+        return app_module.render_template('pdf_template.html', **context)
+
+
+def pdf_pages(pdf):
+    """Decompressed content stream of every page, in order"""
+    return [zlib.decompress(stream) for stream in
+            re.findall(rb'/FlateDecode >>\nstream\n(.*?)\nendstream', pdf, re.S)]
+
+
+def pdf_strings(content):
+    """The strings drawn by Tj operators, unescaped"""
+    strings = []
+    for raw in re.findall(rb'\(((?:\\.|[^\\)])*)\) Tj', content):
+        strings.append(re.sub(rb'\\(.)', rb'\1', raw).decode('cp1252'))
+    return strings
+
+
+def normalise(text):
+    return ' '.join(text.split())
+
+
+def pdf_text(pdf):
+    return normalise(' '.join(' '.join(pdf_strings(page)) for page in pdf_pages(pdf)))
+
+
+def html_text(markup):
+    markup = re.sub(r'<(style|script)\b.*?</\1>', ' ', markup, flags=re.S)
+    return normalise(html.unescape(re.sub(r'<[^>]+>', ' ', markup)))
+
+
+def test_output_is_a_well_formed_pdf():
+    pdf = pdf_direct.render_report(report_context())
+    assert pdf.startswith(b'%PDF-1.4') and pdf.endswith(b'%%EOF\n')
+    # Every xref entry points at the start of its object
+    xref = int(re.search(rb'startxref\n(\d+)', pdf).group(1))
+    offsets = [int(offset) for offset in re.findall(rb'(\d{10}) 00000 n', pdf[xref:])]
+    for number, offset in enumerate(offsets, start=1):
+        assert pdf[offset:].startswith(f"{number} 0 obj".encode())
+    assert len(pdf_pages(pdf)) == 2
+
+
+def test_direct_report_has_the_template_reports_content():
+    context = report_context()
+    template = html_text(template_html(context))
+    direct = pdf_text(pdf_direct.render_report(context))
+
+    expected = [FIELDS['client_name'], FIELDS['officer_name'], FIELDS['chief_name'],
+                'Reports every Monday.', context['risk_assessment']['level']]
+    for segment_id, title in context['segment_titles'].items():
+        expected.append(title)
+        segment = context['segment_answers'].get(segment_id, {})
+        for number, question in enumerate(segment.get('questions', []), start=1):
+            expected.append(question)
+            options = context['segment_answers_data'][segment_id].get(number - 1, [])
+            selected = [option['text'] for option in options if option['value'] == segment['scores'][number - 1]]
+            expected += selected
+    for text in expected:
+        text = normalise(text)
+        assert text in template, text
+        assert text in direct, text
+
+
+def test_totals_match_the_template_path():
+    context = report_context()
+    direct = pdf_strings(b''.join(pdf_pages(pdf_direct.render_report(context))))
+    total = sum(context['subtotals'].values())
+    assert total == context['total_score']
+    assert str(total) in direct
+    for segment_id, subtotal in context['subtotals'].items():
+        assert str(subtotal) in direct
+
+
+def test_text_outside_winansi_is_replaced_and_parentheses_escaped():
+    pdf = pdf_direct.render_report(dict(report_context(), client_name='Nguyễn (Jr.)'))
+    assert b'Nguy?n \\(Jr.\\)' in zlib.decompress(re.search(rb'stream\n(.*?)\nendstream', pdf, re.S).group(1))
+
+
+def test_long_notes_continue_on_another_page():
+    pdf = pdf_direct.render_report(report_context(notes='Attended counselling. ' * 800))
+    assert len(pdf_pages(pdf)) > 2
+
+
+def test_wrap_fits_the_width():
+    lines = pdf_direct.wrap('the quick brown fox jumps over the lazy dog ' * 5, 8, 100)
+    assert len(lines) > 1
+    assert all(pdf_direct.text_width(line, 8) <= 100 for line in lines)
+    assert normalise(' '.join(lines)) == normalise('the quick brown fox jumps over the lazy dog ' * 5)
+
+
+@pytest.fixture
+def report_session(client, monkeypatch):
+    """Client with an assessment to report on, and the time salt of tokens pinned"""
+    generate = app_module.generate_secure_token
+    monkeypatch.setattr(app_module, 'generate_secure_token', lambda text, salt=None: generate(text, salt or 'pinned'))
+    monkeypatch.setitem(app_module.app.config, 'PDF_BACKEND', 'direct')
+    with client.session_transaction() as sess:
+        sess['session_id'] = 'pdf-test'
+        sess['segment0'] = {k: v for k, v in FIELDS.items()}
+    return client
+
+
+def test_direct_backend_serves_the_pdf_routes(report_session):
+    token = app_module.generate_secure_token('pdf-test' + 'generate_pdf', 'pinned')
+    for path in (f'/generate_pdf?token={token}', '/direct_pdf_download'):
+        response = report_session.get(path)
+        assert response.status_code == 200 and response.mimetype == 'application/pdf'
+        assert response.get_data().startswith(b'%PDF-1.4')
+
+
+class CountingController(rate_limit.AdmissionController):
+    def __init__(self, **limits):
+        super().__init__(**limits)
+        self.admitted = 0
+
+    def admit(self, key):
+        ticket = super().admit(key)
+        self.admitted += 1
+        return ticket
+
+
+def test_invalid_token_is_refused_before_admission(report_session, monkeypatch):
+    controller = CountingController(user_rate=1, user_burst=1, global_rate=10, global_burst=10, max_concurrent=1)
+    monkeypatch.setattr(app_module, 'pdf_admission', controller)
+    for _ in range(3):
+        response = report_session.get('/generate_pdf?token=wrong')
+        assert response.status_code == 302 and response.headers['Location'].endswith('/results')
+    assert controller.admitted == 0
+    # The user's single token is still there for a valid request
+    token = app_module.generate_secure_token('pdf-test' + 'generate_pdf', 'pinned')
+    assert report_session.get(f'/generate_pdf?token={token}').status_code == 200
+
+
+def test_renders_beyond_the_concurrency_cap_are_rejected(report_session, monkeypatch):
+    controller = rate_limit.AdmissionController(user_rate=10, user_burst=10, global_rate=10, global_burst=10,
+                                                max_concurrent=1)
+    monkeypatch.setattr(app_module, 'pdf_admission', controller)
+    monkeypatch.setitem(app_module.app.config, 'PRINT_REPORT_FALLBACK', False)
+    with controller.admit('another officer'):
+        response = report_session.get('/direct_pdf_download')
+        assert response.status_code == 429
+        assert int(response.headers['Retry-After']) >= 1
+    assert report_session.get('/direct_pdf_download').status_code == 200
+    assert controller.in_flight == 0
+
+
+def test_user_over_their_pdf_rate_is_rejected(report_session, monkeypatch):
+    controller = rate_limit.AdmissionController(user_rate=0.01, user_burst=2, global_rate=10, global_burst=10,
+                                                max_concurrent=4)
+    monkeypatch.setattr(app_module, 'pdf_admission', controller)
+    statuses = [report_session.get('/direct_pdf_download').status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
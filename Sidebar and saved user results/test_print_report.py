@@ -0,0 +1,82 @@
+"""Browser-printed reports: the print_report page, the report_mode choice, and the fallback when PDF rendering is full"""
+
+import pytest
+
+import app as app_module
+import rate_limit
+
+SESSION_ID = 'print-test'
+# Tokens are salted with the time; the fixture below pins the salt
+PDF_TOKEN = app_module.generate_secure_token(SESSION_ID + 'generate_pdf', 'pinned')
+PDF_ROUTES = [f'/generate_pdf?token={PDF_TOKEN}', '/direct_pdf_download']
+
+
+@pytest.fixture
+def assessment(client, monkeypatch):
+    """Client partway through an assessment, with the session the PDF routes expect"""
+    generate = app_module.generate_secure_token
+    monkeypatch.setattr(app_module, 'generate_secure_token', lambda text, salt=None: generate(text, salt or 'pinned'))
+    with client.session_transaction() as sess:
+        sess['session_id'] = SESSION_ID
+        sess['csrf_token'] = 'csrf'
+        sess['segment0'] = {'client_name': 'Juan', 'length_of_sentence': '1-year',
+                            'officer_name': 'Officer', 'chief_name': 'Chief'}
+    return client
+
+
+class RejectingController:
+    """Admission controller that refuses every PDF for one reason"""
+
+    def __init__(self, reason):
+        self.reason = reason
+
+    def admit(self, key):
+        raise rate_limit.Rejected(self.reason, 7)
+
+
+def test_print_report_renders_the_report_as_a_page(assessment):
+    response = assessment.get('/print_report')
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'window.print()' in page and 'Juan' in page
+    assert 'The PDF service is busy' not in page
+    assert 'no-store' in response.headers['Cache-Control']
+
+
+def test_report_mode_is_remembered_in_a_cookie(assessment):
+    response = assessment.post('/report_mode', data={'mode': 'browser'}, headers={'X-CSRFToken': 'csrf'})
+    assert response.status_code == 204
+    assert app_module.REPORT_MODE_COOKIE + '=browser' in response.headers['Set-Cookie']
+    for path in PDF_ROUTES:
+        response = assessment.get(path)
+        assert response.status_code == 302
+        assert response.headers['Location'].endswith('/print_report')
+
+
+def test_report_mode_needs_the_csrf_token_and_a_known_mode(assessment):
+    assert assessment.post('/report_mode', data={'mode': 'browser'}).status_code == 403
+    assert assessment.post('/report_mode', data={'mode': 'fax'}, headers={'X-CSRFToken': 'csrf'}).status_code == 400
+
+
+@pytest.mark.parametrize('reason', ['global_rate', 'concurrency'])
+@pytest.mark.parametrize('path', PDF_ROUTES)
+def test_saturated_pdf_rendering_falls_back_to_the_printed_report(assessment, monkeypatch, path, reason):
+    monkeypatch.setattr(app_module, 'pdf_admission', RejectingController(reason))
+    response = assessment.get(path)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/print_report?fallback=1')
+    page = assessment.get(response.headers['Location']).get_data(as_text=True)
+    assert 'The PDF service is busy' in page
+
+
+def test_user_over_their_own_rate_gets_a_429(assessment, monkeypatch):
+    monkeypatch.setattr(app_module, 'pdf_admission', RejectingController('user_rate'))
+    response = assessment.get('/direct_pdf_download')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '7'
+
+
+def test_fallback_can_be_turned_off(assessment, monkeypatch):
+    monkeypatch.setattr(app_module, 'pdf_admission', RejectingController('concurrency'))
+    monkeypatch.setitem(app_module.app.config, 'PRINT_REPORT_FALLBACK', False)
+    assert assessment.get('/direct_pdf_download').status_code == 429
@@ -0,0 +1,87 @@
+"""The sampling profiler and the request hook that turns it on"""
+
+import os
+import time
+
+import pytest
+
+import app as app_module
+import profiling
+
+
+def spin_in_a_marked_frame(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_samples_the_target_threads_stack():
+    profiler = profiling.RequestProfiler(profiling.current_thread_id(), interval=0.001).start()
+    spin_in_a_marked_frame(0.1)
+    profiler.stop()
+    assert profiler.duration >= 0.1
+    assert sum(profiler.samples.values()) > 0
+    stacks = [stack for stack in profiler.samples if 'spin_in_a_marked_frame (test_profiling.py:' in stack]
+    assert stacks
+    # Folded stacks run from the outermost frame in
+    frames = stacks[0].split(';')
+    assert frames[-1].startswith('spin_in_a_marked_frame')
+    assert any(frame.startswith('test_samples_the_target_threads_stack') for frame in frames[:-1])
+
+
+def test_unknown_thread_gives_no_samples():
+    profiler = profiling.RequestProfiler(thread_id=-1, interval=0.001).start()
+    time.sleep(0.02)
+    assert not profiler.stop().samples
+
+
+def test_folded_output(tmp_path):
+    profiler = profiling.RequestProfiler(0)
+    profiler.samples.update({'main (a.py:1);work (a.py:5)': 3, 'main (a.py:1)': 7})
+    path = profiler.write_folded(str(tmp_path / 'profiles'), 'segment/POST?x')
+    assert os.path.basename(path).startswith('segment_POST_x-') and path.endswith('.folded')
+    with open(path) as f:
+        assert f.read() == 'main (a.py:1) 7\nmain (a.py:1);work (a.py:5) 3\n'
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'profiles'
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_DIR', str(directory))
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_INTERVAL', 0.001)
+    return directory
+
+
+def profiles(directory):
+    return sorted(os.listdir(directory)) if directory.exists() else []
+
+
+def test_profiler_is_off_by_default(profile_dir, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SAMPLE_RATE', 0)
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_ADMIN_TOKEN', '')
+    app_module.app.test_client().get('/login', headers={'X-Profile-Request': ''})
+    assert profiles(profile_dir) == []
+
+
+def test_admin_header_profiles_one_request(profile_dir, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SAMPLE_RATE', 0)
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_ADMIN_TOKEN', 'profile-me')
+    client = app_module.app.test_client()
+    client.get('/login', headers={'X-Profile-Request': 'wrong'})
+    client.get('/login')
+    assert profiles(profile_dir) == []
+    assert client.get('/login', headers={'X-Profile-Request': 'profile-me'}).status_code == 200
+    [name] = profiles(profile_dir)
+    assert name.startswith('login-GET-')
+
+
+def test_sampling_covers_only_the_listed_endpoints(profile_dir, client, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_ADMIN_TOKEN', '')
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_ENDPOINTS', {'segment', 'login'})
+    client.get('/login')
+    client.get('/results')
+    # Segment pages are only sampled when answers are posted
+    client.get('/segment/1')
+    client.post('/segment/1', data={})
+    assert [name.rsplit('-', 3)[0] for name in profiles(profile_dir)] == ['login-GET', 'segment-POST']
@@ -0,0 +1,110 @@
+"""Token buckets and PDF admission control, on a clock the tests move by hand"""
+
+import pytest
+
+import rate_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_allows_the_burst_then_reports_the_wait(clock):
+    bucket = rate_limit.TokenBucket(rate=2, burst=3)
+    assert [bucket.try_acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.try_acquire() == pytest.approx(0.5)
+
+
+def test_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    bucket = rate_limit.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.try_acquire()
+    clock.advance(0.5)
+    assert bucket.try_acquire() == 0.0
+    assert bucket.try_acquire() > 0
+    clock.advance(60)
+    assert bucket.full()
+    assert [bucket.try_acquire() for _ in range(4)][-1] > 0
+
+
+def test_refund_returns_a_token(clock):
+    bucket = rate_limit.TokenBucket(rate=1, burst=1)
+    bucket.try_acquire()
+    assert bucket.try_acquire() > 0
+    bucket.refund()
+    assert bucket.try_acquire() == 0.0
+
+
+def test_zero_rate_bucket_never_refills(clock):
+    bucket = rate_limit.TokenBucket(rate=0, burst=1)
+    bucket.try_acquire()
+    assert bucket.try_acquire() == float('inf')
+    assert not bucket.acquire(timeout=0.01)
+
+
+def test_keyed_buckets_evict_full_buckets_first(clock):
+    buckets = rate_limit.KeyedTokenBuckets(rate=1, burst=2, max_keys=2)
+    buckets.get('busy').try_acquire()
+    buckets.get('idle')
+    buckets.get('new')
+    assert len(buckets) == 2
+    # 'idle' was full, so it went instead of the older 'busy'
+    assert buckets.get('busy').try_acquire() == 0.0
+    assert buckets.get('busy').try_acquire() > 0
+
+
+def make_controller(**limits):
+    settings = dict(user_rate=1, user_burst=2, global_rate=10, global_burst=10, max_concurrent=2)
+    settings.update(limits)
+    return rate_limit.AdmissionController(**settings)
+
+
+def test_user_over_their_rate_is_rejected(clock):
+    controller = make_controller()
+    for _ in range(2):
+        controller.admit('a').release()
+    with pytest.raises(rate_limit.Rejected) as rejected:
+        controller.admit('a')
+    assert rejected.value.reason == 'user_rate'
+    assert rejected.value.retry_after == 1
+    # Other users are unaffected
+    controller.admit('b').release()
+
+
+def test_global_rejection_gives_back_the_user_token(clock):
+    # One request per user in practice: a charged token would not come back within the test
+    controller = make_controller(user_rate=0.001, user_burst=1, global_rate=1, global_burst=1)
+    controller.admit('a').release()
+    with pytest.raises(rate_limit.Rejected) as rejected:
+        controller.admit('b')
+    assert rejected.value.reason == 'global_rate'
+    clock.advance(1)
+    controller.admit('b').release()
+
+
+def test_concurrency_cap_and_ticket_release(clock):
+    controller = make_controller(user_burst=5, max_concurrent=2)
+    first = controller.admit('a')
+    with controller.admit('b'):
+        assert controller.saturated()
+        with pytest.raises(rate_limit.Rejected) as rejected:
+            controller.admit('c')
+        assert rejected.value.reason == 'concurrency'
+    assert not controller.saturated()
+    first.release()
+    first.release()
+    assert controller.in_flight == 0
@@ -0,0 +1,142 @@
+"""Bulk re-scoring of a Sheets CSV export: which rows are flagged, the previous-thresholds overlay, and output order"""
+
+import csv
+import json
+import logging
+import sys
+
+import pytest
+
+import app as app_module
+import rescore_csv
+
+ANSWER_COLUMNS = [column for columns in app_module.SHEETS_ANSWER_COLUMNS.values() for column in columns]
+HEADER = ['Email Address', 'Length of Sentence'] + ANSWER_COLUMNS + ['Risk Level']
+CRIMINAL_HISTORY = app_module.SHEETS_ANSWER_COLUMNS[1]
+ICARE = app_module.program_label(1, app_module.segment_thresholds[1])
+
+
+def export_row(email, risk_level, **scores):
+    """Values for HEADER: every answer 0 unless given by column name, e.g. {'Derogatory Record': 1}"""
+    return [email, '1-year'] + [str(scores.get(column, 0)) for column in ANSWER_COLUMNS] + [risk_level]
+
+
+def criminal_history(score):
+    """Every Criminal History answer at score, which puts the factor over its threshold from score 1"""
+    return {column: score for column in CRIMINAL_HISTORY}
+
+
+LOW = app_module.risk_levels[0]
+ROWS = {
+    'unchanged': export_row('same@example.gov.ph', LOW),
+    'level': export_row('level@example.gov.ph', app_module.risk_levels[2]),
+    'unreadable': export_row('typo@example.gov.ph', LOW, **{CRIMINAL_HISTORY[0]: 'two'}),
+    'icare': export_row('icare@example.gov.ph', LOW, **criminal_history(1)),
+}
+
+
+@pytest.fixture
+def previous_thresholds(monkeypatch):
+    """Set the thresholds the export was scored with, as init_worker() does in each worker"""
+    def overlay(thresholds):
+        monkeypatch.setattr(rescore_csv, '_previous_thresholds', thresholds)
+    overlay(None)
+    return overlay
+
+
+def row_dict(values, header=HEADER):
+    return dict(zip(header, values))
+
+
+def test_fixture_rows_score_as_intended():
+    subtotals, total = app_module.compute_subtotals({1: [1] * len(CRIMINAL_HISTORY)})
+    assert app_module.assess_risk_level(total, '1-year')['level'] == LOW
+    assert ICARE in app_module.recommend_programs(subtotals)
+    assert app_module.recommend_programs(app_module.compute_subtotals({})[0]) == []
+
+
+def test_unchanged_row_is_skipped(previous_thresholds):
+    assert rescore_csv.rescore_row(row_dict(ROWS['unchanged'])) is None
+    # Without a Programs column or previous thresholds, programs can't be compared
+    assert rescore_csv.rescore_row(row_dict(ROWS['icare'])) is None
+
+
+def test_changed_risk_level_is_flagged(previous_thresholds):
+    extra = rescore_csv.rescore_row(row_dict(ROWS['level']))
+    assert extra == [LOW, '1 year', 'Once in 2 months', '', '', 'risk level']
+    assert len(extra) == len(rescore_csv.OUTPUT_COLUMNS)
+
+
+def test_programs_column_is_compared(previous_thresholds):
+    header = HEADER + [rescore_csv.PROGRAMS_COLUMN]
+    assert rescore_csv.rescore_row(row_dict(ROWS['icare'] + [ICARE], header)) is None
+    extra = rescore_csv.rescore_row(row_dict(ROWS['icare'] + [''], header))
+    assert extra[3:] == ['', ICARE, 'programs']
+
+
+def test_previous_thresholds_overlay(tmp_path, previous_thresholds):
+    path = tmp_path / 'old_thresholds.json'
+    path.write_text(json.dumps({'1': 7, '2': {'threshold': 3}}))
+    thresholds = rescore_csv.load_previous_thresholds(path)
+    assert thresholds[1]['threshold'] == 7 and thresholds[2]['threshold'] == 3
+    assert thresholds[1]['program'] == app_module.segment_thresholds[1]['program']
+    # The current rules are left alone
+    assert app_module.segment_thresholds[1]['threshold'] != 7
+
+    previous_thresholds(thresholds)
+    assert rescore_csv.rescore_row(row_dict(ROWS['unchanged'])) is None
+    extra = rescore_csv.rescore_row(row_dict(ROWS['icare']))
+    assert extra[3:] == ['', ICARE, 'programs']
+    both = rescore_csv.rescore_row(row_dict(export_row('both@example.gov.ph', app_module.risk_levels[3],
+                                                       **criminal_history(1))))
+    assert both[-1] == 'risk level, programs'
+
+
+def test_chunk_keeps_order_and_counts_unreadable_rows(previous_thresholds):
+    rows = [ROWS['level'], ROWS['unreadable'], ROWS['unchanged'], ROWS['unreadable'],
+            export_row('second@example.gov.ph', app_module.risk_levels[1])]
+    changed, errors = rescore_csv.rescore_chunk(HEADER, rows)
+    assert errors == 2
+    assert [values[0] for values in changed] == ['level@example.gov.ph', 'second@example.gov.ph']
+    assert changed[0][:len(HEADER)] == ROWS['level']
+
+
+def test_read_chunks_splits_without_losing_rows():
+    chunks = list(rescore_csv.read_chunks(iter(range(7)), 3))
+    assert chunks == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_export_is_rescored_in_input_order(tmp_path, monkeypatch, capsys):
+    emails = [f'officer{n}@example.gov.ph' for n in range(12)]
+    rows = []
+    for n, email in enumerate(emails):
+        rows.append(export_row(email, LOW if n % 3 else app_module.risk_levels[3]))
+        rows.append(ROWS['unreadable'] if n % 4 == 0 else ROWS['unchanged'])
+    source = tmp_path / 'export.csv'
+    with open(source, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows([HEADER] + rows)
+    output = tmp_path / 'changed.csv'
+    monkeypatch.setattr(sys, 'argv', ['rescore_csv.py', str(source), '-o', str(output),
+                                      '--workers', '2', '--chunk-size', '1'])
+    try:
+        rescore_csv.main()
+    finally:
+        logging.disable(logging.NOTSET)
+
+    with open(output, newline='', encoding='utf-8') as f:
+        written = list(csv.reader(f))
+    assert written[0] == HEADER + rescore_csv.OUTPUT_COLUMNS
+    assert [values[0] for values in written[1:]] == emails[::3]
+    summary = capsys.readouterr().err
+    assert '24 rows re-scored' in summary and '4 changed, 3 unreadable' in summary
+
+
+def test_export_without_the_answer_columns_is_refused(tmp_path, monkeypatch):
+    source = tmp_path / 'export.csv'
+    source.write_text('Email Address,Risk Level\nsomeone@example.gov.ph,Low Risk (Level 1)\n')
+    monkeypatch.setattr(sys, 'argv', ['rescore_csv.py', str(source)])
+    try:
+        with pytest.raises(SystemExit):
+            rescore_csv.main()
+    finally:
+        logging.disable(logging.NOTSET)
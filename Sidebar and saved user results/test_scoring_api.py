@@ -0,0 +1,116 @@
+"""The JSON scoring API must give the outcome the results page shows for the same answers"""
+
+import random
+
+import pytest
+
+import answer_codec
+import app as app_module
+
+API_TOKEN = 'test-api-token'
+
+
+def answer_sets():
+    """Every answer at its lowest and highest value, plus random assessments across the risk bands"""
+    lowest = {i: [min(option['value'] for option in app_module.segment_answers_data[i][q])
+                  for q in range(count)] for i, count in app_module.ANSWER_LAYOUT.items()}
+    highest = {i: [max(option['value'] for option in app_module.segment_answers_data[i][q])
+                   for q in range(count)] for i, count in app_module.ANSWER_LAYOUT.items()}
+    rng = random.Random(7)
+    sets = [lowest, highest]
+    for _ in range(6):
+        sets.append({i: [rng.choice([option['value'] for option in app_module.segment_answers_data[i][q]])
+                         for q in range(count)] for i, count in app_module.ANSWER_LAYOUT.items()})
+    return sets
+
+
+def results_context(client, monkeypatch, answers, length_of_sentence):
+    """What results() passes to results.html for a session holding these answers"""
+    with client.session_transaction() as sess:
+        sess['session_id'] = 'parity-session'
+        sess['segment0'] = {'client_name': 'Juan', 'length_of_sentence': length_of_sentence}
+        sess['answers'] = answer_codec.encode(answers, app_module.ANSWER_LAYOUT)
+        sess['current_results_token'] = 'parity-token'
+    rendered = {}
+
+    def capture(template_name, **context):
+        rendered.update(context)
+        return ''
+
+    monkeypatch.setattr(app_module, 'render_template', capture)
+    response = client.get('/results?token=parity-token')
+    assert response.status_code == 200
+    return rendered
+
+
+def as_api_result(context):
+    risk_assessment = context['risk_assessment']
+    return {
+        'subtotals': {str(key): value for key, value in context['subtotals'].items()},
+        'total_score': context['total_score'],
+        'risk_level': risk_assessment['level'],
+        'probation': risk_assessment['probation'],
+        'probation_sentenced': risk_assessment['probation_sentenced'],
+        'probation_other': risk_assessment['probation_other'],
+        'supervision': risk_assessment['supervision'],
+        'programs': context['recommended_programs']
+    }
+
+
+@pytest.mark.parametrize('length_of_sentence', ['1-year', '3-years', '2-years-or-less'])
+def test_api_matches_results_page(client, monkeypatch, length_of_sentence):
+    monkeypatch.setitem(app_module.app.config, 'SCORING_API_TOKENS', [API_TOKEN])
+    headers = {'Authorization': f'Bearer {API_TOKEN}'}
+    levels = set()
+    for answers in answer_sets():
+        expected = as_api_result(results_context(client, monkeypatch, answers, length_of_sentence))
+        levels.add(expected['risk_level'])
+
+        session_result = client.get('/api/score').get_json()
+        posted = client.post('/api/score', headers=headers, json={
+            'answers': {str(i): scores for i, scores in answers.items()}
+        }).get_json()
+        batched = client.post('/api/score', headers=headers, json={
+            'assessments': [{'id': 1, 'answers': {str(i): scores for i, scores in answers.items()}}]
+        }).get_json()['results'][0]
+
+        assert {key: session_result[key] for key in expected} == expected
+        # Posted assessments have no session length to read "probation" against
+        del expected['probation']
+        for result in (posted, batched):
+            assert 'probation' not in result
+            assert {key: result[key] for key in expected} == expected
+    assert len(levels) >= 3
+
+
+def test_api_requires_a_token_or_login(monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'SCORING_API_TOKENS', [API_TOKEN])
+    anonymous = app_module.app.test_client()
+    assert anonymous.post('/api/score', json={}).status_code == 401
+    assert anonymous.post('/api/score', json={}, headers={'Authorization': 'Bearer wrong'}).status_code == 401
+
+
+def test_api_reports_invalid_assessments_per_item(client):
+    answers = {str(i): [0] * count for i, count in app_module.ANSWER_LAYOUT.items()}
+    bad = dict(answers, **{'1': [9] + answers['1'][1:]})
+    body = client.post('/api/score', json={'assessments': [{'id': 'ok', 'answers': answers},
+                                                           {'id': 'bad', 'answers': bad}]}).get_json()
+    ok, invalid = body['results']
+    assert ok['id'] == 'ok' and ok['total_score'] == 0
+    assert invalid['id'] == 'bad' and invalid['errors'] == ["seg1_q1 is '9', expected one of [0, 1, 2]"]
+
+
+@pytest.mark.parametrize('length_of_sentence, probation', [('2-years-or-less', '6 months'), ('3-years', '1 year')])
+def test_probation_follows_the_posted_length_of_sentence(client, length_of_sentence, probation):
+    answers = {str(i): [0] * count for i, count in app_module.ANSWER_LAYOUT.items()}
+    body = client.post('/api/score', json={'assessments': [
+        {'answers': answers, 'length_of_sentence': length_of_sentence}
+    ]}).get_json()
+    assert body['results'][0]['probation'] == probation
+
+
+def test_unknown_length_of_sentence_is_refused(client):
+    answers = {str(i): [0] * count for i, count in app_module.ANSWER_LAYOUT.items()}
+    response = client.post('/api/score', json={'answers': answers, 'length_of_sentence': 'forever'})
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0].startswith("length_of_sentence 'forever' is not one of")
@@ -0,0 +1,149 @@
+"""The published scoring tables: the browser's live scoring agrees with the server, and the versioned URL caches"""
+
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+
+import pytest
+
+import app as app_module
+
+
+def tables():
+    return json.loads(app_module.SCORING_TABLES_JSON)
+
+
+def live_score(tables, answers):
+    """Port of compute() in LiveScoring (static/js/main.js), reading only the tables"""
+    subtotals = {}
+    total = 0
+    for factor in tables['factors']:
+        subtotal = 0
+        for name in factor['questions']:
+            value = int(answers[name]) if name in answers else None
+            if value in tables['questions'][name]:
+                subtotal += value
+        subtotals[str(factor['key'])] = subtotal
+        total += subtotal
+    band = next((i for i, cutoff in enumerate(tables['risk_cutoffs']) if total <= cutoff),
+                len(tables['risk_cutoffs']))
+    # Object.entries() lists integer-like keys in numeric order
+    programs = [data['program'] for key, data in sorted(tables['thresholds'].items(), key=lambda item: int(item[0]))
+                if subtotals.get(key, 0) >= data['threshold']]
+    return {'subtotals': subtotals, 'total': total, 'level': tables['risk_levels'][band],
+            'outcome': tables['risk_outcomes'][band], 'programs': programs}
+
+
+def random_answers(rng):
+    """{segment: [scores]} with each answer one of the question's options, leaning low or high per assessment"""
+    lean = rng.random()
+    answers = {}
+    for i, count in app_module.ANSWER_LAYOUT.items():
+        answers[i] = []
+        for q in range(count):
+            values = sorted(option['value'] for option in app_module.segment_answers_data[i][q])
+            answers[i].append(values[int(rng.random() * lean * len(values))])
+    return answers
+
+
+def random_forms(count, seed=36):
+    """(answers, the form fields main.js reads them from) for count random assessments"""
+    rng = random.Random(seed)
+    forms = []
+    for _ in range(count):
+        answers = random_answers(rng)
+        forms.append((answers, {f'seg{i}_q{q + 1}': str(value)
+                                for i, scores in answers.items() for q, value in enumerate(scores)}))
+    return forms
+
+
+def test_every_question_is_in_exactly_one_factor():
+    published = tables()
+    names = [name for factor in published['factors'] for name in factor['questions']]
+    assert sorted(names) == sorted(published['questions'])
+    assert len(names) == sum(app_module.ANSWER_LAYOUT.values())
+
+
+def test_live_scoring_matches_the_server():
+    published = tables()
+    levels = set()
+    for answers, form in random_forms(300):
+        live = live_score(published, form)
+        subtotals, total = app_module.compute_subtotals(answers)
+        risk = app_module.assess_risk_level(total, None)
+        assert live['total'] == total
+        assert live['subtotals'] == {str(key): value for key, value in subtotals.items()}
+        assert live['level'] == risk['level']
+        assert live['outcome'] == {key: risk[key] for key in ('probation_sentenced', 'probation_other', 'supervision')}
+        assert live['programs'] == app_module.recommend_programs(subtotals)
+        levels.add(live['level'])
+    assert levels == set(app_module.risk_levels)
+
+
+def test_unanswered_and_unknown_values_count_nothing():
+    published = tables()
+    name = next(iter(published['questions']))
+    assert live_score(published, {})['total'] == 0
+    assert live_score(published, {name: str(max(published['questions'][name]) + 100)})['total'] == 0
+
+
+def main_js_compute():
+    """Source of LiveScoring's compute() in main.js"""
+    with open(os.path.join(app_module.app.root_path, 'static', 'js', 'main.js')) as f:
+        source = f.read()
+    start = source.index('function compute(answers) {')
+    end = re.compile(r'^    }$', re.M).search(source, start).end()
+    return source[start:end]
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='needs node to run main.js')
+def test_main_js_compute_matches_the_port():
+    forms = random_forms(100, seed=37)
+    script = (f"const tables = {app_module.SCORING_TABLES_JSON};\n{main_js_compute()}\n"
+              "const forms = JSON.parse(require('fs').readFileSync(0, 'utf8'));\n"
+              "console.log(JSON.stringify(forms.map(form => compute(form))));")
+    result = subprocess.run(['node', '-e', script], input=json.dumps([form for _, form in forms]),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    published = tables()
+    for (_, form), browser in zip(forms, json.loads(result.stdout)):
+        expected = live_score(published, form)
+        assert {key: browser[key] for key in expected} == expected
+
+
+def test_version_follows_the_rules(monkeypatch):
+    version, body = app_module.build_scoring_tables()
+    assert (version, body) == (app_module.SCORING_TABLES_VERSION, app_module.SCORING_TABLES_JSON)
+    monkeypatch.setattr(app_module, 'risk_cutoffs', (16, 28, 39))
+    changed, _ = app_module.build_scoring_tables()
+    assert changed != version
+
+
+def test_tables_are_served_immutable_at_their_version(client):
+    url = f'/scoring_tables/{app_module.SCORING_TABLES_VERSION}.json'
+    response = client.get(url)
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    assert response.get_data(as_text=True) == app_module.SCORING_TABLES_JSON
+    assert response.get_etag() == (app_module.SCORING_TABLES_VERSION, False)
+    cache_control = response.headers['Cache-Control']
+    assert 'public' in cache_control and 'immutable' in cache_control and 'max-age=31536000' in cache_control
+
+    revalidated = client.get(url, headers={'If-None-Match': f'"{app_module.SCORING_TABLES_VERSION}"'})
+    assert revalidated.status_code == 304 and not revalidated.get_data()
+
+
+def test_old_version_is_redirected_to_the_current_tables(client):
+    response = client.get('/scoring_tables/0123456789abcdef.json')
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith(f'/scoring_tables/{app_module.SCORING_TABLES_VERSION}.json')
+
+
+def test_segment_page_links_the_current_tables(client):
+    client.post('/', data={'client_name': 'Juan', 'length_of_sentence': '1-year',
+                           'officer_name': 'Officer', 'chief_name': 'Chief'})
+    location = client.get('/navigate/segment_1').headers['Location']
+    page = client.get(location).get_data(as_text=True)
+    assert f'/scoring_tables/{app_module.SCORING_TABLES_VERSION}.json' in page
@@ -0,0 +1,93 @@
+"""Office routing of Sheets submissions and the per-office limits"""
+
+import time
+
+import pytest
+
+import circuit_breaker
+import sheets_routing
+
+ROUTES = {
+    'default': 'central',
+    'offices': {
+        'central': {'url': 'https://central.example/exec'},
+        'region7': {
+            'url': 'https://r7.example/exec',
+            'domains': ['r7.probation.gov.ph'],
+            'members': ['Officer@Gmail.com'],
+            'rate': 1, 'burst': 1, 'concurrency': 1
+        },
+        'national': {'url': 'https://national.example/exec', 'domains': ['probation.gov.ph']}
+    }
+}
+
+
+def test_officers_are_matched_by_email_then_domain_then_default():
+    router = sheets_routing.SheetsRouter.from_config(ROUTES)
+    assert router.office_for('officer@gmail.com') == 'region7'
+    assert router.office_for('someone@r7.probation.gov.ph') == 'region7'
+    assert router.office_for('someone@manila.probation.gov.ph') == 'national'
+    assert router.office_for('someone@example.com') == 'central'
+    assert router.office_for('') == 'central'
+    assert router.endpoint_for('someone@example.com').url == 'https://central.example/exec'
+
+
+def test_without_routes_everything_goes_to_the_fallback_url_unlimited():
+    router = sheets_routing.SheetsRouter.from_config(None, 'https://script.example/exec', max_wait=0)
+    endpoint = router.endpoint_for('anyone@example.com')
+    assert endpoint.url == 'https://script.example/exec'
+    assert endpoint.bucket is None and endpoint.concurrency is None
+    started = time.monotonic()
+    for _ in range(100):
+        with router.slot('anyone@example.com'):
+            pass
+    assert time.monotonic() - started < 1
+
+
+def test_offices_without_limits_are_not_throttled():
+    router = sheets_routing.SheetsRouter.from_config(ROUTES, max_wait=0)
+    central = router.endpoints['central']
+    assert central.bucket is None and central.concurrency is None
+    region7 = router.endpoints['region7']
+    assert region7.bucket is not None and region7.concurrency == 1
+
+
+def test_configured_rate_limit_fails_fast():
+    router = sheets_routing.SheetsRouter.from_config(ROUTES, max_wait=0.05)
+    with router.slot('officer@gmail.com'):
+        pass
+    with pytest.raises(sheets_routing.EndpointBusy) as busy:
+        with router.slot('officer@gmail.com'):
+            pass
+    assert busy.value.office == 'region7' and busy.value.reason == 'rate'
+
+
+def test_configured_concurrency_limit_fails_fast():
+    config = {'offices': {'default': {'concurrency': 1}}}
+    router = sheets_routing.SheetsRouter.from_config(config, 'https://script.example/exec', max_wait=0.05)
+    with router.slot('a@example.com') as endpoint:
+        assert endpoint.in_flight == 1
+        with pytest.raises(sheets_routing.EndpointBusy) as busy:
+            with router.slot('b@example.com'):
+                pass
+        assert busy.value.reason == 'concurrency'
+    assert endpoint.in_flight == 0
+
+
+def test_open_circuit_refuses_the_slot():
+    router = sheets_routing.SheetsRouter.from_config(
+        {'offices': {'default': {'failure_threshold': 1}}}, 'https://script.example/exec'
+    )
+    router.endpoints['default'].breaker.record_failure('HTTP 500')
+    with pytest.raises(circuit_breaker.CircuitOpen):
+        with router.slot('a@example.com'):
+            pass
+
+
+@pytest.mark.parametrize('config', [
+    {'offices': {'region7': {'domains': ['r7.example']}}},
+    {'default': 'missing', 'offices': {}},
+])
+def test_offices_without_a_url_are_refused(config):
+    with pytest.raises(ValueError):
+        sheets_routing.SheetsRouter.from_config(config)
@@ -0,0 +1,85 @@
+"""The Sheets spool and its replay: order, transient failures kept, rejected entries dead-lettered"""
+
+import os
+import time
+
+import requests
+
+import app as app_module
+
+ALICE = 'alice@office-a.example'
+BOB = 'bob@office-b.example'
+
+
+def test_entries_are_kept_in_submission_order(spool):
+    names = [spool.add(ALICE, {'n': n}, 'HTTP 503') for n in range(3)]
+    assert spool.names() == names
+    assert [spool.read(name)['data'] for name in names] == [{'n': 0}, {'n': 1}, {'n': 2}]
+
+
+def test_claimed_entry_is_hidden_until_unclaimed(spool):
+    name = spool.add(ALICE, {}, 'HTTP 503')
+    claimed = spool.claim(name)
+    assert spool.names() == [] and spool.claim(name) is None
+    spool.unclaim(claimed)
+    assert spool.names() == [name]
+
+
+def test_stale_claims_are_recovered(spool):
+    name = spool.add(ALICE, {}, 'HTTP 503')
+    claimed = spool.claim(name)
+    spool.recover(stale_after=300)
+    assert spool.names() == []
+    old = time.time() - 600
+    os.utime(os.path.join(spool.directory, claimed), (old, old))
+    spool.recover(stale_after=300)
+    assert spool.names() == [name]
+
+
+def test_replay_sends_and_removes_entries(spool, sheets_endpoint):
+    for n in range(3):
+        spool.add(ALICE, {'n': n}, 'HTTP 503')
+    assert app_module.replay_sheets_spool() == (3, 0)
+    assert sheets_endpoint.posts == [{'n': 0}, {'n': 1}, {'n': 2}]
+
+
+def test_transient_failures_stay_spooled_and_stop_that_office(spool, sheets_endpoint, monkeypatch):
+    monkeypatch.setattr(app_module.sheets_router, 'office_for', lambda email: email.split('@')[1])
+    spool.add(ALICE, {'n': 0}, 'HTTP 503')
+    spool.add(ALICE, {'n': 1}, 'HTTP 503')
+    spool.add(BOB, {'n': 2}, 'HTTP 503')
+    sheets_endpoint.statuses = [503, 200]
+    assert app_module.replay_sheets_spool() == (1, 2)
+    # Office A's second entry waited for the next replay; office B went ahead
+    assert sheets_endpoint.posts == [{'n': 0}, {'n': 2}]
+    sheets_endpoint.statuses = [requests.exceptions.ConnectTimeout("timed out")]
+    assert app_module.replay_sheets_spool() == (0, 2)
+    assert app_module.replay_sheets_spool() == (2, 0)
+    assert spool.dead_letters() == []
+
+
+def test_rejected_entry_is_dead_lettered_and_the_rest_are_sent(spool, sheets_endpoint):
+    spool.add(ALICE, {'n': 0}, 'HTTP 503')
+    spool.add(ALICE, {'n': 1}, 'HTTP 503')
+    sheets_endpoint.statuses = [400]
+    assert app_module.replay_sheets_spool() == (1, 0)
+    assert sheets_endpoint.posts == [{'n': 0}, {'n': 1}]
+    rejected, = spool.dead_letters()
+    assert rejected['data'] == {'n': 0} and rejected['email'] == ALICE
+    assert rejected['rejection'] == 'HTTP 400'
+    # Never posted again
+    assert app_module.replay_sheets_spool() == (0, 0)
+    assert len(sheets_endpoint.posts) == 2
+
+
+def test_entries_queued_during_a_replay_are_sent_by_it(spool, sheets_endpoint, monkeypatch):
+    spool.add(ALICE, {'n': 0}, 'batch')
+    post = sheets_endpoint.post
+
+    def post_and_queue(ordered_data, email):
+        if ordered_data == {'n': 0}:
+            spool.add(ALICE, {'n': 1}, 'batch')
+        return post(ordered_data, email)
+
+    monkeypatch.setattr(app_module, 'post_to_sheets', post_and_queue)
+    assert app_module.replay_sheets_spool() == (2, 0)
@@ -0,0 +1,170 @@
+"""The local Apps Script stand-in: column validation, injected faults, and its HTTP server"""
+
+import argparse
+import io
+import json
+import random
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+import app as app_module
+import rate_limit
+import sheets_standin
+
+SEGMENT0 = {'email': 'officer@example.gov.ph', 'client_name': 'Juan', 'length_of_sentence': '1-year',
+            'officer_name': 'Officer', 'chief_name': 'Chief'}
+ANSWERS = {i: [1] * count for i, count in app_module.ANSWER_LAYOUT.items()}
+
+
+def sheets_payload():
+    with app_module.app.test_request_context('/'):
+        return app_module.prepare_google_sheets_data(SEGMENT0, ANSWERS)
+
+
+def no_delay():
+    return 0.0
+
+
+def standin(**settings):
+    return sheets_standin.StandIn(no_delay, columns=sheets_standin.expected_columns(), **settings)
+
+
+def test_expected_columns_are_what_the_app_sends():
+    assert list(sheets_payload()) == sheets_standin.expected_columns()
+
+
+def test_valid_submission_succeeds():
+    status, result, delay, payload = standin().handle(json.dumps(sheets_payload()).encode())
+    assert (status, result, delay) == (200, {'result': 'success'}, 0.0)
+    assert payload['Risk Level'] == sheets_payload()['Risk Level']
+
+
+@pytest.mark.parametrize('body, error', [
+    (b'{"Timestamp": ', 'body is not JSON'),
+    (b'[1, 2]', 'expected a JSON object'),
+    (b'', 'expected a JSON object'),
+])
+def test_malformed_bodies_are_refused(body, error):
+    status, result, _, _ = standin().handle(body)
+    assert status == 400 and result['error'] == error
+
+
+def test_missing_columns_are_refused():
+    payload = sheets_payload()
+    del payload['Risk Level'], payload['Total Risk Score']
+    status, result, _, _ = standin().handle(json.dumps(payload).encode())
+    assert status == 400
+    assert result['error'] == 'missing 2 column(s)'
+    assert result['missing'] == ['Total Risk Score', 'Risk Level']
+    # Validation off accepts any object
+    assert sheets_standin.StandIn(no_delay).handle(b'{}')[0] == 200
+
+
+@pytest.mark.parametrize('settings, error', [
+    ({'error_rate': 1.0}, 'injected failure'),
+    ({'hang_rate': 1.0, 'hang': 0.0}, 'execution timed out'),
+])
+def test_injected_failures_answer_500(settings, error):
+    status, result, _, _ = standin(**settings).handle(json.dumps(sheets_payload()).encode())
+    assert status == 500 and result['error'] == error
+
+
+def test_injected_failures_follow_the_rates():
+    random.seed(44)
+    server = standin(error_rate=0.2, hang_rate=0.1, hang=0.0)
+    body = json.dumps(sheets_payload()).encode()
+    statuses = [server.handle(body)[0] for _ in range(2000)]
+    assert 0.25 < statuses.count(500) / len(statuses) < 0.35
+
+
+def test_rate_limit_answers_429_over_the_burst():
+    server = standin(bucket=rate_limit.TokenBucket(0.001, 3))
+    body = json.dumps(sheets_payload()).encode()
+    assert [server.handle(body)[0] for _ in range(5)] == [200, 200, 200, 429, 429]
+
+
+def test_concurrency_limit_answers_429():
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+
+    def held_latency():
+        entered.release()
+        release.wait(5)
+        return 0.0
+
+    server = sheets_standin.StandIn(held_latency, max_concurrent=2)
+    statuses = []
+    threads = [threading.Thread(target=lambda: statuses.append(server.handle(b'{}')[0])) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for _ in threads:
+        assert entered.acquire(timeout=5)
+    assert server.handle(b'{}')[0] == 429
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200, 200]
+    assert server.peak_executing == 3 and server.executing == 0
+
+
+def test_posts_are_recorded_and_counted():
+    record = io.StringIO()
+    server = sheets_standin.StandIn(no_delay, record=record)
+    for body in (b'{"n": 1}', b'nope'):
+        status, _, delay, payload = server.handle(body)
+        server.log(status, delay, payload)
+    lines = [json.loads(line) for line in record.getvalue().splitlines()]
+    assert [(line['status'], line['payload']) for line in lines] == [(200, {'n': 1}), (400, None)]
+    stats = server.stats()
+    assert stats['received'] == 2 and stats['statuses'] == {'200': 1, '400': 1}
+    assert stats['delay_ms'] == {'p50': 0.0, 'p90': 0.0, 'p99': 0.0}
+
+
+@pytest.mark.parametrize('spec, low, high', [
+    ('0.3', 0.3, 0.3), ('uniform:0.1:0.5', 0.1, 0.5), ('normal:1.0:0.3', 0.0, None),
+    ('lognormal:1.2:0.5', 0.0, None), ('exp:0.8', 0.0, None),
+])
+def test_latency_specs(spec, low, high):
+    latency = sheets_standin.parse_latency(spec)
+    for _ in range(50):
+        delay = latency()
+        assert delay >= low and (high is None or delay <= high)
+
+
+@pytest.mark.parametrize('spec', ['fast', 'uniform:1', 'exp:a', 'gamma:1:2'])
+def test_bad_latency_specs_are_refused(spec):
+    with pytest.raises(argparse.ArgumentTypeError):
+        sheets_standin.parse_latency(spec)
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The stand-in serving on a free local port, validating the app's columns"""
+    monkeypatch.setattr(sheets_standin.Handler, 'standin', standin())
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), sheets_standin.Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def post(url, payload):
+    request = Request(url, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+    try:
+        with urlopen(request, timeout=5) as response:
+            return response.status, json.load(response)
+    except HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_served_over_http(server):
+    assert post(f'{server}/exec', sheets_payload()) == (200, {'result': 'success'})
+    assert post(f'{server}/exec', {'Timestamp': 'now'})[0] == 400
+    with urlopen(f'{server}/stats', timeout=5) as response:
+        stats = json.load(response)
+    assert stats['received'] == 2 and stats['statuses'] == {'200': 1, '400': 1}
@@ -0,0 +1,108 @@
+"""The {% cache %} fragment tag: hits render what misses did, keys stay apart, and the report templates are unchanged by it"""
+
+import re
+
+import pytest
+from jinja2 import DictLoader, Environment
+
+import app as app_module
+import template_cache
+
+TAG_LINE = re.compile(r'[^\n]*\{%-? (?:cache [^%]*|endcache )%\}[^\n]*\r?\n')
+
+
+def make_env(templates, auto_reload=False):
+    env = Environment(loader=DictLoader(templates), extensions=[template_cache.FragmentCacheExtension],
+                      auto_reload=auto_reload)
+    calls = []
+    env.globals['count'] = lambda: calls.append(1) or len(calls)
+    return env, calls
+
+
+def test_hit_renders_the_same_as_the_miss_without_running_the_block():
+    env, calls = make_env({'t': "{% cache 'f', x %}[{{ x }} {{ count() }}]{% endcache %}"})
+    template = env.get_template('t')
+    assert template.render(x=1) == '[1 1]'
+    assert template.render(x=1) == '[1 1]'
+    assert len(calls) == 1
+
+
+def test_fragments_are_kept_apart_by_key():
+    env, calls = make_env({'t': "{% cache 'f', x, pair %}{{ x }}/{{ pair }}{% endcache %}"})
+    template = env.get_template('t')
+    assert template.render(x=0, pair=[1, 2]) == '0/[1, 2]'
+    assert template.render(x=1, pair=[1, 2]) == '1/[1, 2]'
+    assert template.render(x=0, pair=[2, 1]) == '0/[2, 1]'
+    assert template.render(x=0, pair=(1, 2)) == '0/[1, 2]'
+    assert len(env.fragment_cache) == 3
+
+
+def test_disabled_or_auto_reloading_environment_renders_every_time():
+    for auto_reload, enabled in ((False, False), (True, True)):
+        env, calls = make_env({'t': "{% cache 'f' %}{{ count() }}{% endcache %}"}, auto_reload)
+        env.fragment_cache_enabled = enabled
+        template = env.get_template('t')
+        assert [template.render(), template.render()] == ['1', '2']
+
+
+def test_number_of_fragments_is_bounded(monkeypatch):
+    monkeypatch.setattr(template_cache, 'MAX_FRAGMENTS', 2)
+    env, calls = make_env({'t': "{% cache 'f', x %}{{ x }}{% endcache %}"})
+    template = env.get_template('t')
+    assert [template.render(x=x) for x in (1, 2, 3, 3)] == ['1', '2', '3', '3']
+    assert len(env.fragment_cache) == 2 and len(calls) == 0
+
+
+def render_source(source, context):
+    """Render template source in the app's environment, with a request for the session-reading globals"""
+    with app_module.app.test_request_context('/'):
+        app_module.session.update(session_id='cache-test', csrf_token='csrf')
+        return app_module.app.jinja_env.from_string(source).render(**context)
+
+
+def template_source(name):
+    with open(f'{app_module.app.root_path}/templates/{name}', newline='') as f:
+        return f.read()
+
+
+def answer_sets():
+    layout = app_module.ANSWER_LAYOUT
+    return [
+        {i: [0] * count for i, count in layout.items()},
+        {i: [(i + q) % 2 for q in range(count)] for i, count in layout.items()},
+        {i: [max(option['value'] for option in app_module.segment_answers_data[i][q]) for q in range(count)]
+         for i, count in layout.items()},
+    ]
+
+
+def pdf_context(answers):
+    with app_module.app.test_request_context('/'):
+        return app_module.build_pdf_context('1-year', 'Juan', 'Officer', 'Chief', answers=answers, notes='')
+
+
+def results_context(answers):
+    with app_module.app.test_request_context('/'):
+        scored = app_module.score_assessment(answers)
+    return dict(scored, mandatory_programs=app_module.mandatory_programs,
+                segment_titles=app_module.segment_titles, segment_thresholds=app_module.segment_thresholds,
+                risk_cutoffs=app_module.risk_cutoffs, notes='', report_mode='server')
+
+
+@pytest.mark.parametrize('name, make_context', [('pdf_template.html', pdf_context),
+                                                ('results.html', results_context)])
+def test_report_templates_render_as_they_would_without_the_tags(name, make_context, monkeypatch):
+    """
+    Each tag sits on a line of its own written {%- ... %}, which drops the line
+    break before it in place of the one after it, so the output is the same
+    bytes as the template without the tag lines - cold or warm, for every
+    answer set in turn
+    """
+    monkeypatch.setattr(app_module.app.jinja_env, 'fragment_cache', {})
+    source = template_source(name)
+    plain = TAG_LINE.sub('', source)
+    assert plain != source
+    contexts = [make_context(answers) for answers in answer_sets()]
+    expected = [render_source(plain, context) for context in contexts]
+    for _ in range(2):
+        assert [render_source(source, context) for context in contexts] == expected
+    assert len(set(expected)) == len(expected)
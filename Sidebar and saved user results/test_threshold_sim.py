@@ -0,0 +1,131 @@
+"""The cutoff and threshold simulator against a brute-force recount of the same assessments"""
+
+import argparse
+import bisect
+import csv
+import io
+import random
+
+import pytest
+
+import app as app_module
+import threshold_sim
+
+CANDIDATE_CUTOFFS = [app_module.risk_cutoffs, (0, 1, 2), (15, 27, 38), (20, 21, 60), (5, 40, 200)]
+
+
+def random_assessments(count, seed=7):
+    """(subtotals, total score) of count assessments with answers drawn at random, mostly low so every band is populated"""
+    rng = random.Random(seed)
+    assessments = []
+    for _ in range(count):
+        segment_scores = {i: [rng.choice((0, 0, 0, 0, 1, 1, 2)) for _ in range(n)] for i, n in app_module.ANSWER_LAYOUT.items()}
+        assessments.append(app_module.compute_subtotals(segment_scores))
+    return assessments
+
+
+ASSESSMENTS = random_assessments(400)
+
+
+@pytest.fixture(scope='module')
+def histograms():
+    histograms = threshold_sim.ScoreHistograms()
+    for subtotals, total in ASSESSMENTS:
+        histograms.add(subtotals, total)
+    histograms._prefix()
+    return histograms
+
+
+def band(total, cutoffs):
+    """Risk band of a total score, counted the way assess_risk_level() reads the cutoffs"""
+    return bisect.bisect_left(cutoffs, total)
+
+
+def test_band_agrees_with_the_app():
+    for _, total in ASSESSMENTS:
+        level = app_module.assess_risk_level(total, '1-year')['level']
+        assert app_module.risk_levels[band(total, app_module.risk_cutoffs)] == level
+
+
+@pytest.mark.parametrize('cutoffs', CANDIDATE_CUTOFFS)
+def test_level_counts_match_a_recount(histograms, cutoffs):
+    expected = [0] * len(app_module.risk_levels)
+    for _, total in ASSESSMENTS:
+        expected[band(total, cutoffs)] += 1
+    assert histograms.level_counts(cutoffs) == expected
+    if cutoffs == app_module.risk_cutoffs:
+        assert all(expected)
+    assert histograms.clients == len(ASSESSMENTS)
+
+
+@pytest.mark.parametrize('current', CANDIDATE_CUTOFFS[:2])
+@pytest.mark.parametrize('candidate', CANDIDATE_CUTOFFS)
+def test_moves_match_a_recount(histograms, current, candidate):
+    size = len(app_module.risk_levels)
+    expected = [[0] * size for _ in range(size)]
+    for _, total in ASSESSMENTS:
+        expected[band(total, current)][band(total, candidate)] += 1
+    assert histograms.moves(current, candidate) == expected
+
+
+@pytest.mark.parametrize('factor', sorted(app_module.segment_thresholds))
+def test_program_counts_match_a_recount(histograms, factor):
+    for threshold in range(0, 12):
+        expected = sum(1 for subtotals, _ in ASSESSMENTS if subtotals.get(factor, 0) >= threshold)
+        assert histograms.program_count(factor, threshold) == expected
+
+
+def test_evaluate_reports_changes_against_the_current_rules(histograms):
+    result = histograms.evaluate((15, 27, 38), {1: 7})
+    assert sum(result['levels'].values()) == len(ASSESSMENTS)
+    assert result['moved'] == sum(1 for _, total in ASSESSMENTS
+                                  if band(total, app_module.risk_cutoffs) != band(total, (15, 27, 38)))
+    label = app_module.program_label(1, app_module.segment_thresholds[1])
+    current = app_module.segment_thresholds[1]['threshold']
+    assert result['programs'][label]['change'] == (histograms.program_count(1, 7)
+                                                   - histograms.program_count(1, current))
+    unchanged = histograms.evaluate()
+    assert unchanged['moved'] == 0
+    assert all(info['change'] == 0 for info in unchanged['programs'].values())
+
+
+@pytest.mark.parametrize('cutoffs', [(17, 28), (17, 28, 39, 50), (17, 17, 39), (28, 17, 39)])
+def test_check_cutoffs_refuses_bad_sets(cutoffs):
+    with pytest.raises(ValueError):
+        threshold_sim.check_cutoffs(cutoffs)
+    with pytest.raises(argparse.ArgumentTypeError):
+        threshold_sim.parse_cutoffs(','.join(map(str, cutoffs)))
+
+
+def test_check_cutoffs_accepts_increasing_sets():
+    assert threshold_sim.check_cutoffs([1, 2, 3]) == (1, 2, 3)
+    assert threshold_sim.parse_cutoffs('17,28,39') == (17, 28, 39)
+
+
+def test_histograms_from_an_export_and_back(histograms):
+    columns = [column for columns in app_module.SHEETS_ANSWER_COLUMNS.values() for column in columns]
+    export = io.StringIO()
+    writer = csv.writer(export)
+    writer.writerow(['Email Address'] + columns)
+    writer.writerow(['zero@example.gov.ph'] + ['0'] * len(columns))
+    writer.writerow(['blank@example.gov.ph'] + [''] * len(columns))
+    writer.writerow(['one@example.gov.ph'] + ['1'] * len(columns))
+    writer.writerow(['typo@example.gov.ph'] + ['x'] * len(columns))
+    export.seek(0)
+    built, skipped = threshold_sim.ScoreHistograms.from_csv(export)
+    assert skipped == 1 and built.clients == 3
+    assert built.level_counts(app_module.risk_cutoffs)[0] == 2
+
+    loaded = threshold_sim.ScoreHistograms.from_json(histograms.to_json())
+    for cutoffs in CANDIDATE_CUTOFFS:
+        assert loaded.level_counts(cutoffs) == histograms.level_counts(cutoffs)
+
+
+def test_candidates_cover_every_combination():
+    args = argparse.Namespace(cutoffs=[], low='16-17', medium='17-18', high=None, threshold=['1=6-7', '8=3'])
+    combos = list(threshold_sim.candidates(args))
+    high = app_module.risk_cutoffs[2]
+    # (17, 17, ...) is not strictly increasing and is dropped
+    assert sorted({cutoffs for cutoffs, _ in combos}) == [(16, 17, high), (16, 18, high), (17, 18, high)]
+    assert len(combos) == 3 * 2
+    assert {tuple(sorted(thresholds.items())) for _, thresholds in combos} == {((1, 6), (8, 3)), ((1, 7), (8, 3))}
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+What-if simulator for the risk cutoffs and factor thresholds.
+
+Stored assessments (a Google Sheets CSV export) are reduced once to
+histograms: how many clients had each total score, and each subtotal per
+risk factor. Prefix sums over those histograms answer "how many clients
+score at most x" in constant time, so any candidate set of cutoffs or
+thresholds is evaluated with a few dozen lookups regardless of how many
+assessments the histograms were built from.
+
+For each candidate the simulator reports clients per risk level, how many
+move from their current level to each other level, and how many would be
+recommended each factor's program.
+
+Usage:
+    python threshold_sim.py build export.csv -o histograms.json
+    python threshold_sim.py sweep histograms.json --cutoffs 17,28,39 --cutoffs 15,27,38
+    python threshold_sim.py sweep histograms.json --low 15-19 --medium 26-30 --high 37-41
+    python threshold_sim.py sweep histograms.json --threshold 1=6 --threshold 8=3-5 --json
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import sys
+import time
+
+import app as app_module
+
+
+def _prefix_sums(histogram):
+    sums = []
+    running = 0
+    for count in histogram:
+        running += count
+        sums.append(running)
+    return sums
+
+
+def check_cutoffs(cutoffs):
+    """Cutoffs as a tuple, or ValueError unless they are one per band but the last, strictly increasing"""
+    cutoffs = tuple(cutoffs)
+    expected = len(app_module.risk_levels) - 1
+    if len(cutoffs) != expected:
+        raise ValueError(f"expected {expected} cutoffs, got {len(cutoffs)}")
+    if any(low >= high for low, high in zip(cutoffs, cutoffs[1:])):
+        raise ValueError(f"cutoffs must be strictly increasing, got {','.join(map(str, cutoffs))}")
+    return cutoffs
+
+
+def _count_at_most(prefix, score):
+    """Clients with a score <= score"""
+    if score < 0 or not prefix:
+        return 0
+    return prefix[min(score, len(prefix) - 1)]
+
+
+class ScoreHistograms:
+    """Counts of total scores and per-factor subtotals over stored assessments"""
+
+    def __init__(self, totals=None, factors=None):
+        self.totals = list(totals or [])
+        # Factor key as used by segment_thresholds -> histogram of subtotals
+        self.factors = {int(key): list(counts) for key, counts in (factors or {}).items()}
+        self._prefix()
+
+    def _prefix(self):
+        self.clients = sum(self.totals)
+        self._total_prefix = _prefix_sums(self.totals)
+        self._factor_prefix = {key: _prefix_sums(counts) for key, counts in self.factors.items()}
+
+    @staticmethod
+    def _bump(histogram, value):
+        if value >= len(histogram):
+            histogram.extend([0] * (value + 1 - len(histogram)))
+        histogram[value] += 1
+
+    def add(self, subtotals, total_score):
+        self._bump(self.totals, total_score)
+        for key, subtotal in subtotals.items():
+            self._bump(self.factors.setdefault(key, []), subtotal)
+
+    @classmethod
+    def from_csv(cls, infile):
+        """Build from an export with the columns prepare_google_sheets_data() writes; returns (histograms, skipped rows)"""
+        histograms = cls()
+        skipped = 0
+        for row in csv.DictReader(infile):
+            try:
+                segment_scores = {
+                    i: [int(row.get(column) or 0) for column in columns]
+                    for i, columns in app_module.SHEETS_ANSWER_COLUMNS.items()
+                }
+            except ValueError:
+                skipped += 1
+                continue
+            subtotals, total_score = app_module.compute_subtotals(segment_scores)
+            histograms.add(subtotals, total_score)
+        histograms._prefix()
+        return histograms, skipped
+
+    def to_json(self):
+        return {'totals': self.totals, 'factors': {str(key): counts for key, counts in self.factors.items()}}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['totals'], data['factors'])
+
+    def level_counts(self, cutoffs):
+        """Clients in each risk band for ascending cutoffs (upper bound of each band but the last)"""
+        bounds = [-1] + list(cutoffs) + [float('inf')]
+        return [
+            _count_at_most(self._total_prefix, bounds[i + 1]) - _count_at_most(self._total_prefix, bounds[i])
+            for i in range(len(bounds) - 1)
+        ]
+
+    def moves(self, current, candidate):
+        """Matrix [from band][to band] of clients moving between current and candidate cutoffs"""
+        old = [-1] + list(current) + [float('inf')]
+        new = [-1] + list(candidate) + [float('inf')]
+        matrix = []
+        for i in range(len(old) - 1):
+            row = []
+            for j in range(len(new) - 1):
+                low, high = max(old[i], new[j]), min(old[i + 1], new[j + 1])
+                row.append(_count_at_most(self._total_prefix, high) - _count_at_most(self._total_prefix, low)
+                           if high > low else 0)
+            matrix.append(row)
+        return matrix
+
+    def program_count(self, factor, threshold):
+        """Clients whose subtotal for a factor reaches the threshold"""
+        prefix = self._factor_prefix.get(factor)
+        if not prefix:
+            return 0
+        return prefix[-1] - _count_at_most(prefix, threshold - 1)
+
+    def evaluate(self, cutoffs=None, thresholds=None):
+        """Outcome of one candidate; cutoffs and factor thresholds default to the current rules"""
+        cutoffs = check_cutoffs(cutoffs or app_module.risk_cutoffs)
+        thresholds = dict(thresholds or {})
+        levels = self.level_counts(cutoffs)
+        matrix = self.moves(app_module.risk_cutoffs, cutoffs)
+        programs = {}
+        for factor, data in app_module.segment_thresholds.items():
+            label = app_module.program_label(factor, data)
+            threshold = thresholds.get(factor, data['threshold'])
+            clients = self.program_count(factor, threshold)
+            programs[label] = {
+                'threshold': threshold,
+                'clients': clients,
+                'change': clients - self.program_count(factor, data['threshold'])
+            }
+        return {
+            'cutoffs': list(cutoffs),
+            'thresholds': {str(key): value for key, value in sorted(thresholds.items())},
+            'levels': dict(zip(app_module.risk_levels, levels)),
+            'moved': sum(count for i, row in enumerate(matrix) for j, count in enumerate(row) if i != j),
+            'moves': {
+                app_module.risk_levels[i]: {app_module.risk_levels[j]: count for j, count in enumerate(row) if count}
+                for i, row in enumerate(matrix)
+            },
+            'programs': programs
+        }
+
+
+def parse_range(text):
+    """'17' -> [17], '15-19' -> [15, ..., 19]"""
+    if '-' in text:
+        low, high = text.split('-', 1)
+        return list(range(int(low), int(high) + 1))
+    return [int(text)]
+
+
+def parse_cutoffs(text):
+    """'17,28,39' -> (17, 28, 39), for argparse"""
+    try:
+        return check_cutoffs(int(value) for value in text.split(','))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"{text!r}: {e}")
+
+
+def candidates(args):
+    """Every combination of the requested cutoffs and factor thresholds"""
+    if args.cutoffs:
+        cutoff_sets = args.cutoffs
+    else:
+        current = app_module.risk_cutoffs
+        bands = [parse_range(text) if text else [default]
+                 for text, default in zip((args.low, args.medium, args.high), current)]
+        cutoff_sets = [combo for combo in itertools.product(*bands) if list(combo) == sorted(set(combo))]
+
+    factors = []
+    for text in args.threshold:
+        factor, values = text.split('=', 1)
+        factors.append([(int(factor), value) for value in parse_range(values)])
+    threshold_sets = [dict(combo) for combo in itertools.product(*factors)] or [{}]
+
+    return itertools.product(cutoff_sets, threshold_sets)
+
+
+def print_result(result):
+    levels = ''.join(f"{count:>11}" for count in result['levels'].values())
+    programs = ', '.join(f"{label} {info['change']:+d}" for label, info in result['programs'].items()
+                         if info['change'])
+    cutoffs = '/'.join(str(value) for value in result['cutoffs'])
+    thresholds = ' '.join(f"{key}={value}" for key, value in result['thresholds'].items()) or '-'
+    print(f"{cutoffs:<12}{thresholds:<16}{levels}{result['moved']:>9}  {programs or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Risk cutoff and factor threshold what-if simulator")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="build histograms from a Google Sheets CSV export")
+    build.add_argument('input', help="CSV export, or - for stdin")
+    build.add_argument('-o', '--output', default='histograms.json')
+
+    sweep = commands.add_parser('sweep', help="evaluate candidate cutoffs and thresholds")
+    sweep.add_argument('histograms', help="file written by the build command")
+    sweep.add_argument('--cutoffs', action='append', default=[], type=parse_cutoffs,
+                       help="explicit cutoffs such as 17,28,39 (repeatable); not with --low/--medium/--high")
+    sweep.add_argument('--low', help="range of Low band cutoffs, e.g. 15-19")
+    sweep.add_argument('--medium', help="range of Medium band cutoffs")
+    sweep.add_argument('--high', help="range of High band cutoffs")
+    sweep.add_argument('--threshold', action='append', default=[],
+                       help="factor threshold or range, e.g. 1=6 or 8=3-5 (factor keys as in segment_thresholds)")
+    sweep.add_argument('--json', action='store_true', help="print one JSON object per candidate")
+    args = parser.parse_args()
+
+    if args.command == 'sweep' and args.cutoffs and (args.low or args.medium or args.high):
+        sweep.error("--cutoffs cannot be combined with --low, --medium or --high")
+
+    logging.disable(logging.WARNING)
+
+    if args.command == 'build':
+        infile = sys.stdin if args.input == '-' else open(args.input, newline='', encoding='utf-8-sig')
+        start = time.perf_counter()
+        try:
+            histograms, skipped = ScoreHistograms.from_csv(infile)
+        finally:
+            if infile is not sys.stdin:
+                infile.close()
+        with open(args.output, 'w') as f:
+            json.dump(histograms.to_json(), f)
+        print(f"{histograms.clients} assessments ({skipped} unreadable rows skipped) reduced to histograms "
+              f"in {time.perf_counter() - start:.1f}s -> {args.output}", file=sys.stderr)
+        return
+
+    with open(args.histograms) as f:
+        histograms = ScoreHistograms.from_json(json.load(f))
+
+    start = time.perf_counter()
+    evaluated = 0
+    if not args.json:
+        levels = ''.join(f"{level.split(' Risk')[0]:>11}" for level in app_module.risk_levels)
+        print(f"{'cutoffs':<12}{'thresholds':<16}{levels}{'moved':>9}  program changes")
+    for cutoffs, thresholds in candidates(args):
+        result = histograms.evaluate(cutoffs, thresholds)
+        evaluated += 1
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_result(result)
+    elapsed = time.perf_counter() - start
+    print(f"{evaluated} candidate(s) over {histograms.clients} assessments in {elapsed * 1000:.1f} ms",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()